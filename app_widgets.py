@@ -0,0 +1,107 @@
+import streamlit as st
+from result_store import count_rows, fetch_page
+
+# -------------------------------------
+# Streamlit widgets shared by the apps
+# -------------------------------------
+
+
+def paged_table(session, table, key, order_by, page_size=100, reset=False):
+    """
+    Show `table` one page at a time. Only the visible page is fetched, with
+    LIMIT / OFFSET sorted by `order_by` (a total order, see
+    result_store.stable_order). Pass reset=True after rewriting the table.
+    """
+    state_key = f"pager_{key}"
+    state = st.session_state.get(state_key)
+    if state is None or state["table"] != table or reset:
+        state = {
+            "table": table,
+            "page": 0,
+            "total": count_rows(session, table),
+        }
+        st.session_state[state_key] = state
+
+    n_pages = max((state["total"] + page_size - 1) // page_size, 1)
+    c1, c2, c3 = st.columns([1, 2, 1])
+    with c1:
+        if st.button("Previous", key=f"{state_key}_prev", disabled=state["page"] == 0):
+            state["page"] -= 1
+    with c3:
+        if st.button("Next", key=f"{state_key}_next", disabled=state["page"] >= n_pages - 1):
+            state["page"] += 1
+    with c2:
+        st.caption(f"Page {state['page'] + 1} of {n_pages} ({state['total']:,} rows in {table})")
+
+    st.dataframe(fetch_page(session, table, state["page"], page_size, order_by))
+
+
+def show_chunk_progress(bar, status, progress):
+    """Progress callback for classify_engine.ChunkedRun: bar + rows/s + ETA."""
+    bar.progress(progress["done"] / progress["chunks"] if progress["chunks"] else 1.0)
+    eta = progress["eta_seconds"]
+    status.markdown(
+        f"Chunks {progress['done']}/{progress['chunks']} done, "
+        f"{progress['running']} running, {progress['failed']} failed | "
+        f"{progress['rows_done']:,}/{progress['total_rows']:,} rows | "
+        f"{progress['rows_per_sec']:,.1f} rows/s | "
+        f"ETA {'-' if eta is None else f'{eta:,.0f}s'}"
+    )
+
+
+def show_cascade_summary(stats, reasons):
+    """
+    Metrics for a cascade.run_cascade summary. `reasons` are the escalation
+    reasons to break down (cascade.ESCALATION_REASONS).
+    """
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("Tier 1 hit rate", f"{stats['TIER1_HIT_RATE']:.0%}")
+    c2.metric("Escalated rows", f"{stats['TIER2_ROWS']:,} / {stats['ROWS_TOTAL']:,}")
+    c3.metric("Tier 1 time", f"{stats['TIER1_SECONDS']:,.1f}s")
+    c4.metric("Tier 2 time", f"{stats['TIER2_SECONDS']:,.1f}s")
+    c5.metric("Unanswered", f"{stats['UNANSWERED']:,}")
+    st.write(
+        "Escalation reasons: "
+        + ", ".join([f"{r}: {stats[r.upper()]:,}" for r in reasons])
+        + f" | tokens tier 1: {stats['TIER1_TOKENS'] or 0:,}, tier 2: {stats['TIER2_TOKENS'] or 0:,}"
+    )
+
+
+def query_profiler_panel(session):
+    """
+    Collapsible sidebar panel with the queries recorded by a
+    query_profiler.ProfiledSession. Streamlit renders it before the rest of
+    the script runs, so it shows everything up to the previous interaction.
+    """
+    profiler = session.profiler
+    with st.sidebar.expander("Query profiler"):
+        records = profiler.records()
+        total_ms = sum(r["wall_ms"] or 0 for r in records)
+        st.caption(f"{len(records)} queries recorded, {total_ms / 1000:,.1f}s client wall time")
+        if not records:
+            return
+        st.dataframe(profiler.summary(), hide_index=True)
+        st.dataframe(
+            [
+                {k: r.get(k) for k in ("label", "wall_ms", "rows", "approx_bytes", "execution_ms", "est_credits", "query_id")}
+                for r in reversed(records)
+            ],
+            hide_index=True
+        )
+        c1, c2 = st.columns(2)
+        with c1:
+            if st.button("Add QUERY_HISTORY", key="profiler_enrich"):
+                try:
+                    st.caption(f"Enriched {profiler.enrich(session.session)} queries")
+                except Exception as e:
+                    st.warning(f"QUERY_HISTORY lookup failed: {str(e)}")
+        with c2:
+            if st.button("Clear", key="profiler_clear"):
+                profiler.clear()
+        st.download_button(
+            "Export JSON",
+            profiler.to_json(),
+            file_name="query_profile.json",
+            mime="application/json",
+            key="profiler_export"
+        )
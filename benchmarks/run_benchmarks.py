@@ -0,0 +1,262 @@
+"""
+Offline benchmarks for the shared helper modules.
+
+Runs against fake_session.FakeSession, so no Snowflake account is
+needed. Each case reports wall time, throughput and the tracemalloc peak.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes-mb 1 10 100 1000 --latency-ms 50
+    python benchmarks/run_benchmarks.py --only ingest --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_session import FakeSession  # noqa: E402
+
+
+class LocalUpload:
+    """Local file with the .name / .size of a Streamlit UploadedFile."""
+
+    def __init__(self, path):
+        self._f = open(path, "rb")
+        self.name = os.path.basename(path)
+        self.size = os.path.getsize(path)
+
+    def read(self, *args):
+        return self._f.read(*args)
+
+    def readline(self, *args):
+        return self._f.readline(*args)
+
+    def seek(self, *args):
+        return self._f.seek(*args)
+
+    def tell(self):
+        return self._f.tell()
+
+    def __iter__(self):
+        return iter(self._f)
+
+    def close(self):
+        self._f.close()
+
+
+def measure(name, fn, units=None, unit="items", **params):
+    """Run `fn` once under tracemalloc; returns a result dict."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    extra = fn() or {}
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "case": name,
+        **params,
+        "seconds": round(seconds, 4),
+        "throughput": round(units / seconds, 2) if units and seconds else None,
+        "unit": f"{unit}/s",
+        "peak_mb": round(peak / (1024 * 1024), 2),
+        **extra,
+    }
+    print(json.dumps(result))
+    return result
+
+
+def write_csv(path, size_mb, n_cols=12):
+    """Synthetic CSV of about `size_mb` MB with messy headers and mixed types."""
+    header = ",".join([f"Col {i} (value)" for i in range(n_cols)]) + "\n"
+    target = size_mb * 1024 * 1024
+    rows = []
+    for i in range(2000):
+        rows.append(",".join([
+            str(i), f"{i * 1.5:.2f}", "true" if i % 2 else "false", "2024-01-15",
+            f"\"text, with comma {i}\"", f"id{i:06d}"
+        ] * (n_cols // 6)) + "\n")
+    block = "".join(rows).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(header.encode("utf-8"))
+        written = len(header)
+        while written < target:
+            f.write(block)
+            written += len(block)
+    return written
+
+
+# -------------------------------------
+# Cases
+# -------------------------------------
+def bench_metadata(args):
+    from metadata_catalog import MetadataCatalog
+
+    session = FakeSession(latency_ms=args.latency_ms)
+    session.add(r"^SHOW DATABASES", [{"name": f"DB_{i}"} for i in range(50)])
+    session.add(r"^SHOW SCHEMAS", [{"name": f"SCHEMA_{i}"} for i in range(20)])
+    session.add(r"^SHOW TABLES", [{"name": f"TABLE_{i}"} for i in range(500)])
+    session.add(r"^SHOW COLUMNS", [{"column_name": f"COL_{i}"} for i in range(40)])
+    catalog = MetadataCatalog(session)
+
+    def browse():
+        # One user walking db -> schema -> table -> columns, with reruns
+        for _ in range(args.reruns):
+            for db in catalog.databases()[:5]:
+                for schema in catalog.schemas(db)[:3]:
+                    catalog.columns(db, schema, catalog.tables(db, schema)[0])
+        return {"queries": len(session.log), **catalog.stats()}
+
+    lookups = args.reruns * 5 * (1 + 3 * 2) + args.reruns
+    return [measure("metadata_browse", browse, units=lookups, unit="lookups",
+                    latency_ms=args.latency_ms, reruns=args.reruns)]
+
+
+def bench_csv_clean(args):
+    import pandas as pd
+    from csv_ingest import process_df, clean_name
+    from schema_inference import infer_schema
+
+    results = []
+    headers = [f"Customer Name #{i} (USD) / 2024" for i in range(200)]
+    results.append(measure(
+        "clean_name", lambda: {"names": len([clean_name(h) for h in headers * 50])},
+        units=len(headers) * 50, unit="names"
+    ))
+    for n_rows in (1000, 10000):
+        df = pd.DataFrame({h: [str(i) for i in range(n_rows)] for h in headers[:20]})
+        results.append(measure(
+            "process_df+infer_schema",
+            lambda: {"columns": len(infer_schema(process_df(df.copy())))},
+            units=n_rows * 20, unit="cells", rows=n_rows
+        ))
+    return results
+
+
+def bench_ingest(args):
+    from csv_ingest import read_sample, upload_files_parallel
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes_mb:
+            path = os.path.join(tmp, f"input_{size_mb}mb.csv")
+            n_bytes = write_csv(path, size_mb)
+            session = FakeSession(latency_ms=args.latency_ms, bytes_per_sec=args.bandwidth_mb * 1024 * 1024)
+
+            upload = LocalUpload(path)
+            results.append(measure(
+                "read_sample", lambda: {"columns": len(read_sample(upload, dtype=str).columns)},
+                units=1, unit="samples", size_mb=size_mb
+            ))
+            for split in (False, True):
+                def run():
+                    staged = upload_files_parallel(
+                        session, [upload], "@BENCH/upload",
+                        split_bytes=(16 * 1024 * 1024 if split else None),
+                        part_bytes=16 * 1024 * 1024,
+                        compress=True,
+                        max_workers=args.workers
+                    )
+                    return {"staged_files": len(staged)}
+                results.append(measure(
+                    "upload_split" if split else "upload_whole", run,
+                    units=n_bytes / (1024 * 1024), unit="MB", size_mb=size_mb
+                ))
+            upload.close()
+    return results
+
+
+def _chunked_session(args, total_rows):
+    session = FakeSession(latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 2)
+    session.add(r"SELECT COUNT\(\*\)", [{"N": total_rows}])
+    # Each chunk INSERT reports its inserted rows; cost grows with chunk size
+    per_row_ms = args.row_ms
+
+    def insert(sql, params):
+        rows = total_rows // args.chunks
+        time.sleep(rows * per_row_ms / 1000)
+        return [{"number of rows inserted": rows}]
+    session.add(r"^\s*INSERT INTO", insert)
+    return session
+
+
+def bench_classify(args):
+    from classify_engine import ChunkedRun, plan_hash_chunks, chunk_insert_sql
+
+    results = []
+    for parallel in (1, args.workers):
+        session = _chunked_session(args, args.rows)
+
+        def run():
+            chunks = plan_hash_chunks(session, "T", ["TEXT"], args.chunks)
+            progress = ChunkedRun(
+                session, chunks,
+                chunk_sql=lambda c: chunk_insert_sql("R", "T", ["TEXT"], ["a", "b"], {}, c),
+                max_parallel=parallel
+            ).run(poll_interval=0.01)
+            return {"rows_done": progress["rows_done"], "failed": progress["failed"]}
+        results.append(measure("classify_chunked", run, units=args.rows, unit="rows",
+                               chunks=args.chunks, max_parallel=parallel))
+        session.close()
+    return results
+
+
+def bench_complete_batch(args):
+    from complete_batch import start_batch
+
+    results = []
+    for parallel in (1, args.workers):
+        session = _chunked_session(args, args.rows)
+
+        def run():
+            batch = start_batch(
+                session, "T", "R", ["TEXT"], "llama3.1-8b", "Summarize: {TEXT}",
+                "OBJECT_CONSTRUCT()", n_chunks=args.chunks, max_parallel=parallel
+            )
+            progress = batch.run(poll_interval=0.01)
+            return {"rows_done": progress["rows_done"], "failed": progress["failed"]}
+        results.append(measure("complete_batch", run, units=args.rows, unit="rows",
+                               chunks=args.chunks, max_parallel=parallel))
+        session.close()
+    return results
+
+
+CASES = {
+    "metadata": bench_metadata,
+    "csv_clean": bench_csv_clean,
+    "ingest": bench_ingest,
+    "classify": bench_classify,
+    "complete_batch": bench_complete_batch,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", choices=list(CASES), help="cases to run (default: all)")
+    parser.add_argument("--sizes-mb", nargs="*", type=int, default=[1, 10, 100], help="CSV sizes for ingest")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake latency per statement")
+    parser.add_argument("--bandwidth-mb", type=float, default=200.0, help="fake stage bandwidth (MB/s)")
+    parser.add_argument("--row-ms", type=float, default=0.05, help="fake Cortex cost per row (ms)")
+    parser.add_argument("--rows", type=int, default=100000, help="rows for classify / complete")
+    parser.add_argument("--chunks", type=int, default=16, help="chunks for classify / complete")
+    parser.add_argument("--workers", type=int, default=4, help="parallel uploads / chunks")
+    parser.add_argument("--reruns", type=int, default=20, help="widget reruns for metadata")
+    parser.add_argument("--json", help="also write all results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.only or list(CASES):
+        try:
+            results.extend(CASES[name](args))
+        except ImportError as e:
+            print(json.dumps({"case": name, "skipped": f"missing dependency: {e.name}"}))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
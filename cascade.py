@@ -0,0 +1,200 @@
+import json
+import time
+
+from classify_engine import concat_expr, classify_text_expr
+from complete_batch import template_to_sql
+from sql_utils import q, sql_escape
+
+# -------------------------------------
+# Model cascade: small model first, escalate only the rows it cannot settle
+# -------------------------------------
+# Tier 1 asks a small model for a JSON answer {"answer", "confidence"} using
+# the response_format option, for every row in one set-based statement. A row
+# is escalated when the call failed, the JSON is malformed, the answer is not
+# one of the allowed labels, or the confidence is below the threshold. Tier 2
+# (a larger model, or AI_CLASSIFY for classification) then runs only on those
+# rows via an UPDATE. The escalation reason stays in the results table.
+
+CASCADE_SMALL_MODELS = ["llama3.1-8b", "mistral-7b", "llama3-8b", "mixtral-8x7b", "llama4-scout"]
+CASCADE_LARGE_MODELS = ["llama3.3-70b", "llama3.1-70b", "mistral-large2", "llama3.1-405b", "claude-3-5-sonnet"]
+
+# Tier 2 for classification can be the full AI_CLASSIFY call
+AI_CLASSIFY_TIER = "AI_CLASSIFY"
+
+JSON_INSTRUCTIONS = (
+    "\n\nReply only with JSON of the form "
+    '{"answer": <your answer>, "confidence": <number between 0 and 1>}.'
+)
+
+ESCALATION_REASONS = ["failed", "malformed", "out_of_category", "low_confidence"]
+
+# Default max_tokens of a JSON answer in either tier
+CASCADE_MAX_TOKENS = 256
+
+
+def response_schema(labels=None):
+    answer = {"type": "string"}
+    if labels:
+        answer["enum"] = list(labels)
+    return {
+        "type": "object",
+        "properties": {"answer": answer, "confidence": {"type": "number"}},
+        "required": ["answer", "confidence"],
+    }
+
+
+def json_options_sql(temperature, max_tokens, labels=None):
+    response_format = {"type": "json", "schema": response_schema(labels)}
+    return f"""OBJECT_CONSTRUCT(
+                'temperature', {temperature},
+                'max_tokens', {int(max_tokens)},
+                'response_format', PARSE_JSON('{sql_escape(json.dumps(response_format))}')
+            )"""
+
+
+def category_labels(categories):
+    """AI_CLASSIFY categories (strings or {"label", "description"} dicts) -> labels."""
+    return [c["label"] if isinstance(c, dict) else c for c in categories]
+
+
+def classify_prompt_sql(input_cols, categories):
+    """Tier-1 prompt for classification: pick one label for the row's text."""
+    lines = [
+        f"- {c['label']}: {c['description']}" if isinstance(c, dict) and c.get("description")
+        else f"- {category_labels([c])[0]}"
+        for c in categories
+    ]
+    intro = (
+        "Classify the text below into exactly one of these categories:\n"
+        + "\n".join(lines)
+        + JSON_INSTRUCTIONS + "\n\nTEXT:\n"
+    )
+    return f"'{sql_escape(intro)}' || {concat_expr(input_cols)}"
+
+
+def template_prompt_sql(template):
+    """Tier-1 prompt for batch prompts: the row's template plus JSON instructions."""
+    return f"{template_to_sql(template)} || '{sql_escape(JSON_INSTRUCTIONS)}'"
+
+
+def _complete_sql(model, prompt_sql, options_sql):
+    return f"""SNOWFLAKE.CORTEX.TRY_COMPLETE(
+                '{model}',
+                ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', {prompt_sql})),
+                {options_sql}
+            )"""
+
+
+def _parsed(raw):
+    # With response_format the JSON arrives in structured_output; fall back to the text
+    return f"COALESCE({raw}:structured_output[0]:raw_message, TRY_PARSE_JSON({raw}:choices[0]:messages::STRING))"
+
+
+def _labels_array(labels):
+    return "ARRAY_CONSTRUCT(" + ", ".join([f"'{sql_escape(l)}'" for l in labels]) + ")"
+
+
+def tier1_sql(results_table, table, columns, model, prompt_sql, options_sql, threshold, labels=None):
+    out_of_category = (
+        f"WHEN NOT ARRAY_CONTAINS(P:answer, {_labels_array(labels)}) THEN 'out_of_category'"
+        if labels else ""
+    )
+    return f"""
+        CREATE OR REPLACE TABLE {results_table} AS
+        SELECT
+            {', '.join([q(c) for c in columns])},
+            T1_RAW,
+            CASE
+                WHEN T1_RAW IS NULL THEN 'failed'
+                WHEN P IS NULL OR P:answer IS NULL THEN 'malformed'
+                {out_of_category}
+                WHEN COALESCE(TRY_TO_DOUBLE(P:confidence::STRING), 0) < {float(threshold)} THEN 'low_confidence'
+            END AS ESCALATION_REASON,
+            IFF(ESCALATION_REASON IS NULL, P:answer::STRING, NULL) AS ANSWER,
+            IFF(ESCALATION_REASON IS NULL, TRY_TO_DOUBLE(P:confidence::STRING), NULL) AS CONFIDENCE,
+            IFF(ESCALATION_REASON IS NULL, 1, NULL)::NUMBER AS TIER,
+            NULL::VARIANT AS T2_RAW
+        FROM (
+            SELECT *, {_parsed('T1_RAW')} AS P
+            FROM (
+                SELECT
+                    {', '.join([q(c) for c in columns])},
+                    {_complete_sql(model, prompt_sql, options_sql)} AS T1_RAW
+                FROM {table}
+            )
+        )
+    """
+
+
+def tier2_sql(results_table, model, prompt_sql, options_sql, input_cols=None, categories=None, config_object=None):
+    if model == AI_CLASSIFY_TIER:
+        call = classify_text_expr(concat_expr(input_cols), categories, config_object or {})
+    else:
+        call = _complete_sql(model, prompt_sql, options_sql)
+    return f"""
+        UPDATE {results_table}
+        SET T2_RAW = {call}
+        WHERE ESCALATION_REASON IS NOT NULL
+    """
+
+
+def finalize_sql(results_table, model):
+    if model == AI_CLASSIFY_TIER:
+        answer, confidence = "T2_RAW:labels[0]::STRING", "NULL"
+    else:
+        answer = f"{_parsed('T2_RAW')}:answer::STRING"
+        confidence = f"TRY_TO_DOUBLE({_parsed('T2_RAW')}:confidence::STRING)"
+    return f"""
+        UPDATE {results_table}
+        SET ANSWER = {answer}, CONFIDENCE = {confidence}, TIER = 2
+        WHERE ESCALATION_REASON IS NOT NULL
+    """
+
+
+def cascade_summary(session, results_table):
+    reasons = ",\n            ".join([f"COUNT_IF(ESCALATION_REASON = '{r}') AS {r.upper()}" for r in ESCALATION_REASONS])
+    row = session.sql(f"""
+        SELECT
+            COUNT(*) AS ROWS_TOTAL,
+            COUNT_IF(TIER = 1) AS TIER1_ROWS,
+            COUNT_IF(TIER = 2) AS TIER2_ROWS,
+            COUNT_IF(ANSWER IS NULL) AS UNANSWERED,
+            {reasons},
+            SUM(T1_RAW:usage:total_tokens) AS TIER1_TOKENS,
+            SUM(T2_RAW:usage:total_tokens) AS TIER2_TOKENS
+        FROM {results_table}
+    """).collect()[0]
+    return row.as_dict()
+
+
+def run_cascade(session, table, results_table, columns, prompt_sql, tier1_model, tier2_model,
+                threshold, temperature=0, max_tokens=CASCADE_MAX_TOKENS, labels=None,
+                input_cols=None, categories=None, config_object=None):
+    """
+    Run both tiers and return the summary counters plus the wall time of
+    each tier and the statements that were executed. `input_cols`,
+    `categories` and `config_object` are only needed for an AI_CLASSIFY tier 2.
+    """
+    options = json_options_sql(temperature, max_tokens, labels)
+    statements = [tier1_sql(results_table, table, columns, tier1_model, prompt_sql, options, threshold, labels)]
+
+    started = time.perf_counter()
+    session.sql(statements[0]).collect()
+    tier1_seconds = time.perf_counter() - started
+
+    statements.append(tier2_sql(results_table, tier2_model, prompt_sql, options, input_cols, categories, config_object))
+    statements.append(finalize_sql(results_table, tier2_model))
+    started = time.perf_counter()
+    for sql in statements[1:]:
+        session.sql(sql).collect()
+    tier2_seconds = time.perf_counter() - started
+
+    summary = cascade_summary(session, results_table)
+    total = summary["ROWS_TOTAL"] or 0
+    summary.update({
+        "TIER1_HIT_RATE": round(summary["TIER1_ROWS"] / total, 3) if total else 0.0,
+        "TIER1_SECONDS": round(tier1_seconds, 2),
+        "TIER2_SECONDS": round(tier2_seconds, 2),
+        "SQL": statements,
+    })
+    return summary
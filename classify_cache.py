@@ -0,0 +1,109 @@
+import hashlib
+import json
+
+from classify_engine import concat_expr, classify_text_expr
+from sql_utils import q
+
+# -------------------------------------
+# Content-hash deduplication + persistent AI_CLASSIFY result cache
+# -------------------------------------
+# Rows are keyed by SHA2 of the concatenated input expression. Only distinct
+# hashes that are not yet in the cache table (for the same categories and
+# config) are sent to AI_CLASSIFY; the results are then joined back to every
+# row of the source table.
+
+
+def json_hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def input_hash_expr(input_cols, alias=None):
+    return f"SHA2({concat_expr(input_cols, alias)}, 256)"
+
+
+def ensure_cache_table(session, cache_table):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {cache_table} (
+            INPUT_HASH VARCHAR,
+            CATEGORIES_HASH VARCHAR,
+            CONFIG_HASH VARCHAR,
+            CLASSIFICATION VARIANT,
+            CREATED_AT TIMESTAMP_LTZ
+        )
+    """).collect()
+
+
+def cache_match(alias, hash_sql, categories_hash, config_hash):
+    return (
+        f"{alias}.INPUT_HASH = {hash_sql}"
+        f" AND {alias}.CATEGORIES_HASH = '{categories_hash}'"
+        f" AND {alias}.CONFIG_HASH = '{config_hash}'"
+    )
+
+
+def fill_cache_sql(table, input_cols, categories, config_object, cache_table):
+    categories_hash = json_hash(categories)
+    config_hash = json_hash(config_object)
+    return f"""
+        INSERT INTO {cache_table}
+        SELECT
+            S.INPUT_HASH,
+            '{categories_hash}',
+            '{config_hash}',
+            {classify_text_expr("S.INPUT_TEXT", categories, config_object)},
+            CURRENT_TIMESTAMP()
+        FROM (
+            SELECT
+                {input_hash_expr(input_cols)} AS INPUT_HASH,
+                ANY_VALUE({concat_expr(input_cols)}) AS INPUT_TEXT
+            FROM {table}
+            GROUP BY 1
+        ) S
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {cache_table} C
+            WHERE {cache_match("C", "S.INPUT_HASH", categories_hash, config_hash)}
+        )
+    """
+
+
+def build_cached_classify_query(table, input_cols, categories, config_object, cache_table):
+    """SELECT of every source row joined to its cached classification."""
+    return f"""
+        SELECT
+            {', '.join([f'T.{q(c)}' for c in input_cols])},
+            C.CLASSIFICATION
+        FROM {table} T
+        LEFT JOIN (
+            SELECT INPUT_HASH, CLASSIFICATION
+            FROM {cache_table}
+            WHERE CATEGORIES_HASH = '{json_hash(categories)}'
+              AND CONFIG_HASH = '{json_hash(config_object)}'
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY INPUT_HASH ORDER BY CREATED_AT DESC) = 1
+        ) C
+            ON C.INPUT_HASH = {input_hash_expr(input_cols, "T")}
+    """
+
+
+def fill_classify_cache(session, table, input_cols, categories, config_object, cache_table):
+    """
+    Classify the distinct inputs that are missing from `cache_table`.
+    Returns counters showing how many AI_CLASSIFY calls were avoided.
+    """
+    ensure_cache_table(session, cache_table)
+    counts = session.sql(f"""
+        SELECT COUNT(*) AS TOTAL_ROWS, COUNT(DISTINCT {input_hash_expr(input_cols)}) AS DISTINCT_INPUTS
+        FROM {table}
+    """).collect()[0]
+    result = session.sql(
+        fill_cache_sql(table, input_cols, categories, config_object, cache_table)
+    ).collect()
+    new_calls = result[0][0] if result else 0
+    total_rows = counts["TOTAL_ROWS"]
+    distinct_inputs = counts["DISTINCT_INPUTS"]
+    return {
+        "total_rows": total_rows,
+        "distinct_inputs": distinct_inputs,
+        "cache_hits": distinct_inputs - new_calls,
+        "new_calls": new_calls,
+        "calls_avoided": total_rows - new_calls,
+    }
@@ -0,0 +1,241 @@
+import json
+import time
+
+from sql_utils import q
+
+# -------------------------------------
+# AI_CLASSIFY query building and chunked execution
+# -------------------------------------
+# The interactive app sends a single SELECT over the whole table. For large
+# tables the work is split into chunks that run as concurrent async Snowpark
+# jobs, each INSERTing its rows into a results table as soon as it finishes,
+# so a failure only costs the chunk that failed.
+
+
+def to_snowflake_json(obj):
+    """Python object -> Snowflake object literal (single quotes)."""
+    return json.dumps(obj).replace('"', "'")
+
+
+def concat_expr(input_cols, alias=None):
+    prefix = f"{alias}." if alias else ""
+    return " || ' ' || ".join([f"COALESCE({prefix}{q(c)}, '')" for c in input_cols])
+
+
+def classify_text_expr(text_expr, categories, config_object):
+    return f"""SNOWFLAKE.CORTEX.AI_CLASSIFY(
+                {text_expr},
+                {to_snowflake_json(categories)},
+                {to_snowflake_json(config_object)}
+            )"""
+
+
+def classify_expr(input_cols, categories, config_object):
+    return classify_text_expr(concat_expr(input_cols), categories, config_object)
+
+
+def build_classify_query(table, input_cols, categories, config_object, where=None):
+    where_sql = f"\n        WHERE {where}" if where else ""
+    return f"""
+        SELECT
+            {', '.join([q(c) for c in input_cols])},
+            {classify_expr(input_cols, categories, config_object)}
+        FROM {table}{where_sql}
+    """
+
+
+# -------------------------------------
+# Chunk planning
+# -------------------------------------
+def sql_literal(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def plan_key_chunks(session, table, key_col, n_chunks):
+    """
+    Split `table` into contiguous ranges of `key_col` of roughly equal size.
+    Returns a list of {"id", "predicate", "rows"} dicts; rows with a NULL key
+    get a chunk of their own.
+    """
+    key = q(key_col)
+    bounds = session.sql(f"""
+        SELECT BUCKET, MIN(K) AS LO, COUNT(*) AS N
+        FROM (
+            SELECT {key} AS K, NTILE({int(n_chunks)}) OVER (ORDER BY {key}) AS BUCKET
+            FROM {table}
+            WHERE {key} IS NOT NULL
+        )
+        GROUP BY BUCKET
+        ORDER BY BUCKET
+    """).collect()
+
+    # Merge buckets that start on the same key value so ranges never overlap
+    starts = []
+    for row in bounds:
+        if starts and starts[-1][0] == row["LO"]:
+            starts[-1][1] += row["N"]
+        else:
+            starts.append([row["LO"], row["N"]])
+
+    chunks = []
+    for i, (lo, n) in enumerate(starts):
+        predicate = f"{key} >= {sql_literal(lo)}"
+        if i + 1 < len(starts):
+            predicate += f" AND {key} < {sql_literal(starts[i + 1][0])}"
+        chunks.append({"id": i, "predicate": predicate, "rows": n})
+
+    null_rows = session.sql(
+        f"SELECT COUNT(*) FROM {table} WHERE {key} IS NULL"
+    ).collect()[0][0]
+    if null_rows:
+        chunks.append({"id": len(chunks), "predicate": f"{key} IS NULL", "rows": null_rows})
+    return chunks
+
+
+def plan_hash_chunks(session, table, input_cols, n_chunks):
+    """
+    Split `table` into `n_chunks` buckets by hashing the input columns. Used
+    when the table has no usable key; bucket sizes are estimated evenly.
+    """
+    total = session.sql(f"SELECT COUNT(*) FROM {table}").collect()[0][0]
+    cols = ", ".join([q(c) for c in input_cols])
+    n = int(n_chunks)
+    return [
+        {
+            "id": i,
+            "predicate": f"MOD(ABS(HASH({cols})), {n}) = {i}",
+            "rows": total // n + (1 if i < total % n else 0),
+        }
+        for i in range(n)
+    ]
+
+
+# -------------------------------------
+# Results table
+# -------------------------------------
+def create_results_table(session, results_table, table, input_cols, replace=True):
+    create = "CREATE OR REPLACE TABLE" if replace else "CREATE TABLE IF NOT EXISTS"
+    session.sql(f"""
+        {create} {results_table} AS
+        SELECT
+            0::NUMBER AS CHUNK_ID,
+            {', '.join([q(c) for c in input_cols])},
+            NULL::VARIANT AS CLASSIFICATION
+        FROM {table}
+        LIMIT 0
+    """).collect()
+
+
+def chunk_insert_sql(results_table, table, input_cols, categories, config_object, chunk):
+    return f"""
+        INSERT INTO {results_table}
+        SELECT
+            {chunk['id']} AS CHUNK_ID,
+            {', '.join([q(c) for c in input_cols])},
+            {classify_expr(input_cols, categories, config_object)}
+        FROM {table}
+        WHERE {chunk['predicate']}
+    """
+
+
+# -------------------------------------
+# Concurrent chunk runner
+# -------------------------------------
+class ChunkedRun:
+    """
+    Runs one INSERT per chunk as async jobs, at most `max_parallel` at a time.
+
+    `chunk_sql(chunk)` returns the statement for a chunk and
+    `cleanup_sql(chunk)` (optional) the statement that removes a chunk's
+    rows before it is retried. The object is kept in st.session_state so
+    failed chunks can be retried on a later rerun without touching the
+    chunks that already succeeded.
+    """
+
+    def __init__(self, session, chunks, chunk_sql, cleanup_sql=None, max_parallel=4):
+        self.session = session
+        self.chunks = {c["id"]: c for c in chunks}
+        self.chunk_sql = chunk_sql
+        self.cleanup_sql = cleanup_sql
+        self.max_parallel = max_parallel
+        self.status = {cid: "pending" for cid in self.chunks}
+        self.errors = {}
+        self.rows_done = 0
+        self.elapsed = 0.0
+        self._jobs = {}
+        self._attempted = set()
+
+    @property
+    def total_rows(self):
+        return sum(c["rows"] for c in self.chunks.values())
+
+    def _submit(self, cid):
+        chunk = self.chunks[cid]
+        if self.cleanup_sql and cid in self._attempted:
+            self.session.sql(self.cleanup_sql(chunk)).collect()
+        self._attempted.add(cid)
+        self._jobs[cid] = self.session.sql(self.chunk_sql(chunk)).collect_nowait()
+        self.status[cid] = "running"
+
+    def _poll(self):
+        for cid, job in list(self._jobs.items()):
+            if not job.is_done():
+                continue
+            del self._jobs[cid]
+            try:
+                result = job.result()
+                inserted = result[0][0] if result else self.chunks[cid]["rows"]
+                self.chunks[cid]["rows"] = inserted
+                self.rows_done += inserted
+                self.status[cid] = "done"
+                self.errors.pop(cid, None)
+            except Exception as e:
+                self.status[cid] = "failed"
+                self.errors[cid] = str(e)
+
+    def run(self, on_progress=None, poll_interval=1.0):
+        started = time.monotonic() - self.elapsed
+        pending = [cid for cid, s in self.status.items() if s == "pending"]
+        while pending or self._jobs:
+            while pending and len(self._jobs) < self.max_parallel:
+                cid = pending.pop(0)
+                try:
+                    self._submit(cid)
+                except Exception as e:
+                    self.status[cid] = "failed"
+                    self.errors[cid] = str(e)
+            self._poll()
+            self.elapsed = time.monotonic() - started
+            if on_progress:
+                on_progress(self.progress())
+            if self._jobs:
+                time.sleep(poll_interval)
+        return self.progress()
+
+    def retry_failed(self, on_progress=None, poll_interval=1.0):
+        for cid, s in self.status.items():
+            if s == "failed":
+                self.status[cid] = "pending"
+        return self.run(on_progress=on_progress, poll_interval=poll_interval)
+
+    def progress(self):
+        counts = {}
+        for s in self.status.values():
+            counts[s] = counts.get(s, 0) + 1
+        rows_per_sec = self.rows_done / self.elapsed if self.elapsed else 0.0
+        remaining = max(self.total_rows - self.rows_done, 0)
+        return {
+            "chunks": len(self.chunks),
+            "done": counts.get("done", 0),
+            "running": counts.get("running", 0),
+            "failed": counts.get("failed", 0),
+            "pending": counts.get("pending", 0),
+            "rows_done": self.rows_done,
+            "total_rows": self.total_rows,
+            "rows_per_sec": rows_per_sec,
+            "eta_seconds": remaining / rows_per_sec if rows_per_sec else None,
+        }
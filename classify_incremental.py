@@ -0,0 +1,124 @@
+from classify_engine import concat_expr, classify_text_expr
+from sql_utils import q
+from classify_cache import json_hash
+
+# -------------------------------------
+# Incremental AI_CLASSIFY: only new or changed rows
+# -------------------------------------
+# The results table keeps one row per source key together with a hash of the
+# row content, categories and config. Each run MERGEs only the rows whose hash
+# is missing or different, so an unchanged table costs no AI_CLASSIFY calls.
+# Rows with a NULL key cannot be matched to a result and are skipped (and
+# counted). An existing results table must have the columns this selection
+# produces; changing the input columns needs a new results table.
+
+
+def row_hash_expr(input_cols, categories, config_object, alias=None):
+    return (
+        f"SHA2({concat_expr(input_cols, alias)} || '|{json_hash(categories)}"
+        f"|{json_hash(config_object)}', 256)"
+    )
+
+
+def result_columns(key_col, input_cols):
+    return [key_col] + [c for c in input_cols if c != key_col]
+
+
+def expected_columns(key_col, input_cols):
+    return result_columns(key_col, input_cols) + ["ROW_HASH", "CLASSIFICATION", "CLASSIFIED_AT"]
+
+
+def check_results_columns(session, results_table, key_col, input_cols):
+    """Raise ValueError when `results_table` was created for other columns."""
+    existing = [row["name"] for row in session.sql(f"DESC TABLE {results_table}").collect()]
+    expected = expected_columns(key_col, input_cols)
+    if existing != expected:
+        raise ValueError(
+            f"{results_table} has columns {', '.join(existing)} but this selection needs "
+            f"{', '.join(expected)}. Choose another results table (or drop this one) "
+            "after changing the key or input columns."
+        )
+
+
+def create_incremental_table(session, results_table, table, key_col, input_cols):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {results_table} AS
+        SELECT
+            {', '.join([q(c) for c in result_columns(key_col, input_cols)])},
+            NULL::VARCHAR AS ROW_HASH,
+            NULL::VARIANT AS CLASSIFICATION,
+            NULL::TIMESTAMP_LTZ AS CLASSIFIED_AT
+        FROM {table}
+        LIMIT 0
+    """).collect()
+
+
+def build_incremental_merge(table, results_table, key_col, input_cols, categories, config_object):
+    cols = result_columns(key_col, input_cols)
+    key = q(key_col)
+    return f"""
+        MERGE INTO {results_table} R
+        USING (
+            SELECT
+                {', '.join([f'T.{q(c)}' for c in cols])},
+                D.ROW_HASH,
+                {classify_text_expr(concat_expr(input_cols, 'T'), categories, config_object)} AS CLASSIFICATION
+            FROM {table} T
+            JOIN (
+                SELECT S.{key}, {row_hash_expr(input_cols, categories, config_object, "S")} AS ROW_HASH
+                FROM {table} S
+                LEFT JOIN {results_table} P ON P.{key} = S.{key}
+                WHERE S.{key} IS NOT NULL
+                  AND (P.{key} IS NULL
+                       OR P.ROW_HASH IS DISTINCT FROM {row_hash_expr(input_cols, categories, config_object, "S")})
+            ) D ON D.{key} = T.{key}
+        ) N
+        ON R.{key} = N.{key}
+        WHEN MATCHED THEN UPDATE SET
+            {', '.join([f'{q(c)} = N.{q(c)}' for c in cols[1:]] + ['ROW_HASH = N.ROW_HASH'])},
+            CLASSIFICATION = N.CLASSIFICATION,
+            CLASSIFIED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT (
+            {', '.join([q(c) for c in cols])}, ROW_HASH, CLASSIFICATION, CLASSIFIED_AT
+        ) VALUES (
+            {', '.join([f'N.{q(c)}' for c in cols])}, N.ROW_HASH, N.CLASSIFICATION, CURRENT_TIMESTAMP()
+        )
+    """
+
+
+def run_incremental(session, table, results_table, key_col, input_cols,
+                    categories, config_object, delete_missing=False):
+    """
+    Classify rows of `table` that are new or changed since the last run.
+    `key_col` must uniquely identify a source row; rows where it is NULL
+    are skipped. Returns counts of inserted, updated, deleted, unchanged and
+    skipped rows. Raises ValueError when the results table has other columns.
+    """
+    create_incremental_table(session, results_table, table, key_col, input_cols)
+    check_results_columns(session, results_table, key_col, input_cols)
+    merge_sql = build_incremental_merge(
+        table, results_table, key_col, input_cols, categories, config_object
+    )
+    result = session.sql(merge_sql).collect()
+    inserted, updated = (result[0][0], result[0][1]) if result else (0, 0)
+
+    deleted = 0
+    if delete_missing:
+        key = q(key_col)
+        result = session.sql(f"""
+            DELETE FROM {results_table} R
+            WHERE NOT EXISTS (SELECT 1 FROM {table} T WHERE T.{key} = R.{key})
+        """).collect()
+        deleted = result[0][0] if result else 0
+
+    total, null_keys = session.sql(
+        f"SELECT COUNT(*), COUNT_IF({q(key_col)} IS NULL) FROM {table}"
+    ).collect()[0]
+    return {
+        "sql": merge_sql,
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "unchanged": total - null_keys - inserted - updated,
+        "skipped_null_keys": null_keys,
+    }
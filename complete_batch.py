@@ -0,0 +1,111 @@
+import re
+
+from classify_engine import ChunkedRun, plan_hash_chunks
+from sql_utils import q, sql_escape
+
+# -------------------------------------
+# Batch prompts: one prompt template applied to every row of a table
+# -------------------------------------
+# The template references columns as {COLUMN_NAME}. Rows are split into hash
+# buckets that run as concurrent async INSERTs (a single bucket is one
+# set-based statement). TRY_COMPLETE keeps a failing row from failing the
+# whole chunk and returns per-row token usage.
+
+PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+def template_columns(template):
+    """Column names referenced by the template, in order of first use."""
+    seen = []
+    for name in PLACEHOLDER.findall(template):
+        if name not in seen:
+            seen.append(name)
+    return seen
+
+
+def template_to_sql(template, alias=None):
+    """Prompt template -> SQL string expression concatenating literals and columns."""
+    prefix = f"{alias}." if alias else ""
+    parts = []
+    pos = 0
+    for m in PLACEHOLDER.finditer(template):
+        if m.start() > pos:
+            parts.append(f"'{sql_escape(template[pos:m.start()])}'")
+        parts.append(f"COALESCE({prefix}{q(m.group(1))}::STRING, '')")
+        pos = m.end()
+    if pos < len(template):
+        parts.append(f"'{sql_escape(template[pos:])}'")
+    return " || ".join(parts) if parts else "''"
+
+
+def create_batch_results_table(session, results_table, table, columns):
+    session.sql(f"""
+        CREATE OR REPLACE TABLE {results_table} AS
+        SELECT
+            0::NUMBER AS CHUNK_ID,
+            {', '.join([q(c) for c in columns])},
+            NULL::STRING AS RESPONSE,
+            NULL::NUMBER AS PROMPT_TOKENS,
+            NULL::NUMBER AS COMPLETION_TOKENS,
+            NULL::BOOLEAN AS FAILED,
+            NULL::TIMESTAMP_LTZ AS COMPLETED_AT
+        FROM {table}
+        LIMIT 0
+    """).collect()
+
+
+def batch_insert_sql(results_table, table, columns, model, template, model_params, chunk):
+    return f"""
+        INSERT INTO {results_table}
+        SELECT
+            {chunk['id']},
+            {', '.join([q(c) for c in columns])},
+            R:choices[0]:messages::STRING,
+            R:usage:prompt_tokens::NUMBER,
+            R:usage:completion_tokens::NUMBER,
+            R IS NULL,
+            CURRENT_TIMESTAMP()
+        FROM (
+            SELECT
+                {', '.join([f'T.{q(c)}' for c in columns])},
+                SNOWFLAKE.CORTEX.TRY_COMPLETE(
+                    '{model}',
+                    ARRAY_CONSTRUCT(OBJECT_CONSTRUCT('role', 'user', 'content', {template_to_sql(template, 'T')})),
+                    {model_params}
+                ) AS R
+            FROM {table} T
+            WHERE {chunk['predicate']}
+        )
+    """
+
+
+def start_batch(session, table, results_table, columns, model, template, model_params,
+                n_chunks=1, max_parallel=4):
+    """
+    Plan chunks, (re)create the results table and return a ChunkedRun that
+    has not started yet.
+    """
+    if not columns:
+        raise ValueError("The prompt template must reference at least one column, e.g. {TEXT}.")
+    chunks = plan_hash_chunks(session, table, columns, n_chunks)
+    create_batch_results_table(session, results_table, table, columns)
+    return ChunkedRun(
+        session,
+        chunks,
+        chunk_sql=lambda c: batch_insert_sql(results_table, table, columns, model, template, model_params, c),
+        cleanup_sql=lambda c: f"DELETE FROM {results_table} WHERE CHUNK_ID = {c['id']}",
+        max_parallel=max_parallel
+    )
+
+
+def batch_summary(session, results_table):
+    row = session.sql(f"""
+        SELECT
+            COUNT(*) AS ROWS_DONE,
+            COUNT_IF(FAILED) AS ERRORS,
+            SUM(PROMPT_TOKENS) AS PROMPT_TOKENS,
+            SUM(COMPLETION_TOKENS) AS COMPLETION_TOKENS,
+            AVG(PROMPT_TOKENS + COMPLETION_TOKENS) AS AVG_TOKENS_PER_ROW
+        FROM {results_table}
+    """).collect()[0]
+    return row.as_dict()
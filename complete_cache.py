@@ -0,0 +1,89 @@
+import hashlib
+import json
+
+from ttl_cache import TTLCache
+
+# -------------------------------------
+# AI_COMPLETE response cache: in-process LRU + persistent Snowflake table
+# -------------------------------------
+# Only deterministic requests (temperature 0) are cached. The key is a hash
+# of everything that shapes the response: model, prompt, document
+# fingerprint, completion mode and generation options.
+
+
+def is_cacheable(temperature):
+    return float(temperature) == 0.0
+
+
+def request_key(**parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-level cache. `get` returns (response, layer) where layer is
+    "memory" or "table", or (None, None) on a miss.
+    """
+
+    def __init__(self, session, table, maxsize=128, ttl=24 * 3600):
+        self.session = session
+        self.table = table
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._table_ready = False
+
+    def _ensure_table(self):
+        if self._table_ready:
+            return
+        self.session.sql(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                REQUEST_HASH VARCHAR,
+                MODEL VARCHAR,
+                RESPONSE VARCHAR,
+                CREATED_AT TIMESTAMP_LTZ
+            )
+        """).collect()
+        self._table_ready = True
+
+    def get(self, key, ttl):
+        response = self.memory.get(key)
+        if response is not None:
+            return response, "memory"
+        self._ensure_table()
+        rows = self.session.sql(
+            f"""
+            SELECT RESPONSE FROM {self.table}
+            WHERE REQUEST_HASH = ?
+              AND CREATED_AT >= DATEADD(second, -{int(ttl)}, CURRENT_TIMESTAMP())
+            ORDER BY CREATED_AT DESC
+            LIMIT 1
+            """,
+            params=[key]
+        ).collect()
+        if not rows:
+            return None, None
+        self.memory.put(key, rows[0][0], ttl=ttl)
+        return rows[0][0], "table"
+
+    def put(self, key, model, response, ttl):
+        self.memory.put(key, response, ttl=ttl)
+        self._ensure_table()
+        self.session.sql(
+            f"INSERT INTO {self.table} (REQUEST_HASH, MODEL, RESPONSE, CREATED_AT) "
+            "SELECT ?, ?, ?, CURRENT_TIMESTAMP()",
+            params=[key, model, response]
+        ).collect()
+
+    def purge_expired(self, ttl):
+        self._ensure_table()
+        self.session.sql(
+            f"DELETE FROM {self.table} WHERE CREATED_AT < DATEADD(second, -{int(ttl)}, CURRENT_TIMESTAMP())"
+        ).collect()
+
+
+def get_response_cache(session, state, table, key="complete_response_cache"):
+    """Return the cache kept in `state` (normally st.session_state) for `table`."""
+    cache = state.get(key)
+    if cache is None or cache.table != table:
+        cache = ResponseCache(session, table)
+        state[key] = cache
+    return cache
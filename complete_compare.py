@@ -0,0 +1,106 @@
+import time
+
+from complete_engine import document_pieces_cte
+
+# -------------------------------------
+# Side-by-side model comparison for one prompt + document
+# -------------------------------------
+# The same single-call request is submitted once per model as concurrent async
+# queries. COMPLETE with an options object returns usage, so each model's
+# latency, output tokens and tokens per second can be reported as soon as
+# its query finishes. Latency is measured at the client from submission to
+# the poll that sees the query done.
+
+
+def compare_sql(model, parsed_source, model_params):
+    """Single call over the whole document with usage. Binds one parameter: the prompt."""
+    return f"""
+        WITH {document_pieces_cte(parsed_source)}
+        SELECT
+            R:choices[0]:messages::STRING AS RESPONSE,
+            R:usage:prompt_tokens::NUMBER AS PROMPT_TOKENS,
+            R:usage:completion_tokens::NUMBER AS COMPLETION_TOKENS
+        FROM (
+            SELECT SNOWFLAKE.CORTEX.COMPLETE(
+                '{model}',
+                ARRAY_CONSTRUCT(OBJECT_CONSTRUCT(
+                    'role', 'user',
+                    'content', ? || LISTAGG(PIECE_TEXT, '\\n\\n') WITHIN GROUP (ORDER BY PAGE_NO)
+                )),
+                {model_params}
+            ) AS R
+            FROM PIECES
+        )
+    """
+
+
+class ModelComparison:
+    """
+    One async query per model. `poll()` returns the models that finished
+    since the previous poll; `results` holds a dict per finished model.
+    """
+
+    def __init__(self, session, models, sql_for_model, params):
+        self.session = session
+        self.models = list(models)
+        self.sql_for_model = sql_for_model
+        self.params = params
+        self.results = {}
+        self._jobs = {}
+        self._started = {}
+
+    def start(self):
+        for model in self.models:
+            self._started[model] = time.perf_counter()
+            try:
+                self._jobs[model] = self.session.sql(self.sql_for_model(model), params=self.params).collect_nowait()
+            except Exception as e:
+                self._finish(model, error=str(e))
+
+    @property
+    def done(self):
+        return not self._jobs
+
+    def _finish(self, model, row=None, error=None):
+        latency = time.perf_counter() - self._started[model]
+        completion_tokens = (row or {}).get("COMPLETION_TOKENS") or 0
+        self.results[model] = {
+            "model": model,
+            "response": (row or {}).get("RESPONSE"),
+            "latency_s": round(latency, 2),
+            "prompt_tokens": (row or {}).get("PROMPT_TOKENS"),
+            "output_tokens": completion_tokens,
+            "tokens_per_second": round(completion_tokens / latency, 1) if latency else 0.0,
+            "error": error,
+        }
+
+    def poll(self):
+        finished = []
+        for model, job in list(self._jobs.items()):
+            if not job.is_done():
+                continue
+            del self._jobs[model]
+            try:
+                rows = job.result()
+                self._finish(model, row=rows[0].as_dict() if rows else None)
+            except Exception as e:
+                self._finish(model, error=str(e))
+            finished.append(model)
+        return finished
+
+    def run(self, on_finished=None, poll_interval=0.25):
+        self.start()
+        for model in self.results:
+            if on_finished:
+                on_finished(self.results[model])
+        while self._jobs:
+            time.sleep(poll_interval)
+            for model in self.poll():
+                if on_finished:
+                    on_finished(self.results[model])
+        return self.summary()
+
+    def summary(self):
+        """Finished models, fastest first, without the response text."""
+        rows = [{k: v for k, v in r.items() if k != "response"} for r in self.results.values()]
+        return sorted(rows, key=lambda r: (r["error"] is not None, r["latency_s"]))
@@ -0,0 +1,123 @@
+# -------------------------------------
+# AI_COMPLETE query builders for parsed documents
+# -------------------------------------
+# A parsed document is referenced by a "parsed source": the table holding its
+# PARSED_TEXT column plus a WHERE clause that selects the document's row, e.g.
+# {"table": "DB.SCHEMA.PARSED_X", "where": "TRUE"}. Builders read the text
+# inside Snowflake instead of inlining it into the SQL string.
+
+CHARS_PER_TOKEN = 4
+
+MAP_INSTRUCTIONS = (
+    "\n\nThe text below is one part of a longer document. Answer using only "
+    "this part. If it contains nothing relevant, reply exactly: NO RELEVANT CONTENT."
+    "\n\nDOCUMENT PART:\n"
+)
+
+REDUCE_INSTRUCTIONS = (
+    "\n\nBelow are partial answers, each produced from one consecutive part of "
+    "the same document. Ignore parts marked NO RELEVANT CONTENT and combine the "
+    "rest into a single final answer.\n\nPARTIAL ANSWERS:\n"
+)
+
+
+def model_params_sql(temperature, top_p, max_tokens):
+    return f"""OBJECT_CONSTRUCT(
+                'temperature', {temperature},
+                'top_p', {top_p},
+                'max_tokens', {max_tokens}
+                                )"""
+
+
+def document_pieces_cte(parsed_source):
+    """
+    One row per page when the document was parsed with page_split, otherwise
+    a single row holding the whole content.
+    """
+    return f"""DOC AS (
+            SELECT PARSED_TEXT AS P
+            FROM {parsed_source['table']}
+            WHERE {parsed_source['where']}
+            LIMIT 1
+        ),
+        PIECES AS (
+            SELECT
+                COALESCE(F.INDEX, 0) AS PAGE_NO,
+                COALESCE(F.VALUE:content, DOC.P:content)::STRING AS PIECE_TEXT
+            FROM DOC, LATERAL FLATTEN(input => DOC.P:pages, OUTER => TRUE) F
+        )"""
+
+
+# Output columns of both completion modes, so stored responses share one table
+RESULT_COLUMNS = ["LLM_SCORE", "CHUNKS"]
+
+
+def build_single_call_sql(model, parsed_source, model_params):
+    """
+    One AI_COMPLETE over the whole document, reading the text from the parsed
+    table. Binds one parameter: the prompt.
+    """
+    return f"""
+        WITH {document_pieces_cte(parsed_source)}
+        SELECT AI_COMPLETE(
+            '{model}',
+            ? || LISTAGG(PIECE_TEXT, '\\n\\n') WITHIN GROUP (ORDER BY PAGE_NO),
+            {model_params}
+            ) AS LLM_SCORE,
+            1 AS CHUNKS
+        FROM PIECES
+    """
+
+
+def single_call_params(prompt):
+    return [f"{prompt}\n\nDOCUMENT CONTENT:\n"]
+
+
+def build_map_reduce_sql(model, parsed_source, model_params, chunk_tokens, overlap_tokens=0):
+    """
+    Split the document into chunks of at most `chunk_tokens` (per page when
+    available), run AI_COMPLETE over all chunks in one set-based statement,
+    then combine the partial answers with a reduce prompt.
+
+    Binds two parameters: the map prompt and the reduce prompt. Raises
+    ValueError unless 0 <= overlap_tokens < chunk_tokens.
+    """
+    if not 0 <= int(overlap_tokens) < int(chunk_tokens):
+        raise ValueError(
+            f"Chunk overlap ({overlap_tokens} tokens) must be smaller than the chunk size ({chunk_tokens} tokens)"
+        )
+    chunk_chars = int(chunk_tokens) * CHARS_PER_TOKEN
+    overlap_chars = int(overlap_tokens) * CHARS_PER_TOKEN
+    return f"""
+        WITH {document_pieces_cte(parsed_source)},
+        CHUNKS AS (
+            SELECT PAGE_NO, C.INDEX AS CHUNK_NO, C.VALUE::STRING AS CHUNK_TEXT
+            FROM PIECES, LATERAL FLATTEN(
+                input => SNOWFLAKE.CORTEX.SPLIT_TEXT_RECURSIVE_CHARACTER(
+                    PIECE_TEXT, 'markdown', {chunk_chars}, {overlap_chars}
+                )
+            ) C
+        ),
+        MAPPED AS (
+            SELECT
+                PAGE_NO,
+                CHUNK_NO,
+                AI_COMPLETE('{model}', ? || CHUNK_TEXT, {model_params}) AS PARTIAL
+            FROM CHUNKS
+        )
+        SELECT
+            AI_COMPLETE(
+                '{model}',
+                ? || LISTAGG(
+                    'PART ' || (PAGE_NO + 1) || '.' || (CHUNK_NO + 1) || ':\\n' || PARTIAL,
+                    '\\n\\n---\\n\\n'
+                ) WITHIN GROUP (ORDER BY PAGE_NO, CHUNK_NO),
+                {model_params}
+            ) AS LLM_SCORE,
+            COUNT(*) AS CHUNKS
+        FROM MAPPED
+    """
+
+
+def map_reduce_params(prompt):
+    return [f"{prompt}{MAP_INSTRUCTIONS}", f"{prompt}{REDUCE_INSTRUCTIONS}"]
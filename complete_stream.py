@@ -0,0 +1,82 @@
+import time
+
+from complete_engine import CHARS_PER_TOKEN, document_pieces_cte
+from query_profiler import unwrap
+
+try:
+    # Streaming needs the Cortex Python API from snowflake-ml-python
+    from snowflake.cortex import complete as cortex_complete
+except ImportError:
+    cortex_complete = None
+
+# -------------------------------------
+# Streaming AI_COMPLETE responses
+# -------------------------------------
+# Tokens are yielded as they arrive (for st.write_stream) while time to first
+# token and throughput are recorded. The prompt has to be sent from the app,
+# so the document text is fetched once from the parsed table.
+
+
+def streaming_available():
+    return cortex_complete is not None
+
+
+def fetch_document_text(session, parsed_source):
+    rows = session.sql(f"""
+        WITH {document_pieces_cte(parsed_source)}
+        SELECT LISTAGG(PIECE_TEXT, '\\n\\n') WITHIN GROUP (ORDER BY PAGE_NO) FROM PIECES
+    """).collect()
+    return rows[0][0] if rows and rows[0][0] is not None else ""
+
+
+class StreamStats:
+    def __init__(self):
+        self.started = None
+        self.first_token_at = None
+        self.finished = None
+        self.chunks = 0
+        self.chars = 0
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    @property
+    def approx_tokens(self):
+        return max(self.chars // CHARS_PER_TOKEN, self.chunks)
+
+    @property
+    def tokens_per_second(self):
+        if self.first_token_at is None or self.finished is None:
+            return 0.0
+        elapsed = self.finished - self.first_token_at
+        return self.approx_tokens / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "time_to_first_token_s": self.time_to_first_token,
+            "total_time_s": (self.finished - self.started) if self.finished else None,
+            "approx_output_tokens": self.approx_tokens,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+def stream_complete(session, model, prompt, temperature, top_p, max_tokens, stats):
+    """Yield response text pieces as they are generated, filling `stats`."""
+    if cortex_complete is None:
+        raise RuntimeError("Streaming requires the snowflake-ml-python package (snowflake.cortex).")
+    options = {"temperature": temperature, "top_p": top_p, "max_tokens": int(max_tokens)}
+    stats.started = time.perf_counter()
+    try:
+        for piece in cortex_complete(model, prompt, options=options, session=unwrap(session), stream=True):
+            if not piece:
+                continue
+            if stats.first_token_at is None:
+                stats.first_token_at = time.perf_counter()
+            stats.chunks += 1
+            stats.chars += len(piece)
+            yield piece
+    finally:
+        stats.finished = time.perf_counter()
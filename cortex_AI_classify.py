@@ -1,39 +1,66 @@
 import streamlit as st
 from snowflake.snowpark.context import get_active_session
 import pandas as pd
-import json
+from metadata_catalog import get_catalog
+from classify_engine import (
+    build_classify_query, plan_key_chunks, plan_hash_chunks,
+    create_results_table, chunk_insert_sql, ChunkedRun
+)
+from classify_cache import fill_classify_cache, build_cached_classify_query
+from classify_incremental import run_incremental
+from result_store import materialize, stable_order
+from app_widgets import paged_table, show_chunk_progress, show_cascade_summary, query_profiler_panel
+from cost_guard import preflight_settings, preflight_gate, credits_per_million
+from cost_estimator import estimate_classify, estimate_batch_complete, estimate_cascade
+from cascade import (
+    CASCADE_SMALL_MODELS, CASCADE_LARGE_MODELS, AI_CLASSIFY_TIER, CASCADE_MAX_TOKENS, ESCALATION_REASONS,
+    category_labels, classify_prompt_sql, run_cascade
+)
+from query_profiler import get_profiled_session
+from sql_utils import q
 
 # -------------------------------
 # Setup Snowflake session
 # -------------------------------
-session = get_active_session()
+session = get_profiled_session(get_active_session(), st.session_state)
 
 st.title("Snowflake Classification")
 
 
-def q(name):
-    return f'"{name}"'
+# -------------------------------
+# Metadata catalog (cached per session)
+# -------------------------------
+catalog = get_catalog(session, st.session_state)
+
+with st.sidebar:
+    if st.button("Refresh metadata"):
+        catalog.refresh()
+    st.caption("Metadata cache: {hits} hits / {misses} misses".format(**catalog.stats()))
+query_profiler_panel(session)
+preflight = preflight_settings()
 
 # -------------------------------
 # Step 1-3: Database / Schema / Table
 # -------------------------------
-databases = [row["name"] for row in session.sql("SHOW DATABASES").collect()]
 demo_dbs = ["JBS_DATASETS", "PROJECT_DB"]
-database = st.selectbox("Select Database", demo_dbs)
+database = st.selectbox("Select Database", demo_dbs, index=None, placeholder="Choose a database")
+if not database:
+    st.stop()
 
-schemas = [row["name"] for row in session.sql(f"SHOW SCHEMAS IN {q(database)}").collect()]
-schema = st.selectbox("Select Schema", schemas)
+schema = st.selectbox("Select Schema", catalog.schemas(database), index=None, placeholder="Choose a schema")
+if not schema:
+    st.stop()
 
-tables = [row["name"] for row in session.sql(f"SHOW TABLES IN {q(database)}.{q(schema)}").collect()]
-table = st.selectbox("Select Table", tables)
+table = st.selectbox("Select Table", catalog.tables(database, schema), index=None, placeholder="Choose a table")
+if not table:
+    st.stop()
 
 full_table = f"{q(database)}.{q(schema)}.{q(table)}"
 
 # -------------------------------
 # Step 4: Columns
 # -------------------------------
-column_info = session.sql(f"SHOW COLUMNS IN {full_table}").collect()
-text_columns = [col["column_name"] for col in column_info]
+text_columns = catalog.columns(database, schema, table)
 
 if not text_columns:
     st.warning("No columns found in table.")
@@ -112,7 +139,7 @@ categories, config = build_ai_classify_params()
 # -------------------------------
 # Fully dynamic Cortex run
 # -------------------------------
-def run_cortex(table, input_cols, categories, config_object):
+def run_cortex(table, input_cols, categories, config_object, target_table=None, cache_table=None):
     if not input_cols:
         st.warning("No input columns selected.")
         return
@@ -120,34 +147,244 @@ def run_cortex(table, input_cols, categories, config_object):
         st.warning("No categories provided.")
         return
 
-    # Concatenate multiple columns
-    #concat_expr = " || ' ' || ".join([f'"{col}"' for col in input_cols])
-    concat_expr = " || ' ' || ".join([f'COALESCE("{c}", \'\')' for c in input_cols])
-    # Convert Python objects to Snowflake-compatible JSON (single quotes)
-    def to_snowflake_json(obj):
-        return json.dumps(obj).replace('"', "'")
-
-    categories_json = to_snowflake_json(categories)
-    config_json = to_snowflake_json(config_object)
-
     # Build SQL
-    query = f"""
-        SELECT 
-            {', '.join([f'"{c}"' for c in input_cols])},
-            SNOWFLAKE.CORTEX.AI_CLASSIFY(
-                {concat_expr},
-                {categories_json},
-                {config_json}
-            )
-        FROM {table}
-    """
+    if cache_table:
+        # Classify each distinct input once and reuse cached results
+        with st.spinner("Classifying new distinct inputs..."):
+            stats = fill_classify_cache(session, table, input_cols, categories, config_object, cache_table)
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Rows", f"{stats['total_rows']:,}")
+        c2.metric("Distinct inputs", f"{stats['distinct_inputs']:,}")
+        c3.metric("AI_CLASSIFY calls", f"{stats['new_calls']:,}")
+        c4.metric("Calls avoided", f"{stats['calls_avoided']:,}")
+        query = build_cached_classify_query(table, input_cols, categories, config_object, cache_table)
+    else:
+        query = build_classify_query(table, input_cols, categories, config_object)
 
     st.markdown("### Generated SQL")
     st.code(query)
 
+    if target_table:
+        # Keep the results in Snowflake and only page through them
+        with st.spinner(f"Writing results to {target_table}..."):
+            n_rows = materialize(session, query, target_table)
+        st.success(f"{n_rows:,} rows written to {target_table}")
+        st.session_state.classify_results_table = target_table
+        st.session_state.classify_results_order = stable_order(*[q(c) for c in input_cols])
+        st.session_state.classify_results_reset = True
+        return
+
     df = session.sql(query).to_pandas()
     st.markdown("### Cortex Classification Results")
     st.dataframe(df)
 
-if st.button("Run Cortex Classification"):
-    run_cortex(full_table, selected_cols, categories, config)
+# -------------------------------
+# Batched (chunked) Cortex run
+# -------------------------------
+def run_cortex_batched(table, input_cols, categories, config_object,
+                       results_table, key_col, n_chunks, max_parallel):
+    if not input_cols:
+        st.warning("No input columns selected.")
+        return
+    if not categories:
+        st.warning("No categories provided.")
+        return
+
+    with st.spinner("Planning chunks..."):
+        if key_col:
+            chunks = plan_key_chunks(session, table, key_col, n_chunks)
+        else:
+            chunks = plan_hash_chunks(session, table, input_cols, n_chunks)
+        create_results_table(session, results_table, table, input_cols)
+
+    st.session_state.classify_run = ChunkedRun(
+        session,
+        chunks,
+        chunk_sql=lambda c: chunk_insert_sql(results_table, table, input_cols, categories, config_object, c),
+        cleanup_sql=lambda c: f"DELETE FROM {results_table} WHERE CHUNK_ID = {c['id']}",
+        max_parallel=max_parallel
+    )
+    st.session_state.classify_results_table = results_table
+    st.session_state.classify_results_order = stable_order(*[q(c) for c in input_cols])
+    st.session_state.classify_results_reset = True
+
+    st.markdown("### Generated SQL (first chunk)")
+    st.code(chunk_insert_sql(results_table, table, input_cols, categories, config_object, chunks[0]) if chunks else "-- table is empty")
+
+    bar, status = st.progress(0.0), st.empty()
+    st.session_state.classify_run.run(on_progress=lambda p: show_chunk_progress(bar, status, p))
+
+
+def classify_preflight(mode, parallelism=1, estimate_fn=None, signature=()):
+    """
+    Pre-flight estimate for the current selection; True when the run may
+    start. `estimate_fn` replaces the AI_CLASSIFY estimate, and `signature`
+    adds the inputs it depends on.
+    """
+    if not selected_cols or not categories:
+        return True  # run_cortex* report the missing input
+    st.markdown("### Pre-flight estimate")
+    return preflight_gate(
+        f"classify_{mode}",
+        preflight,
+        (full_table, selected_cols, categories, parallelism) + tuple(signature),
+        estimate_fn or (lambda: estimate_classify(
+            session, full_table, selected_cols, categories,
+            credits_per_million(preflight, "ai_classify"),
+            preflight["tokens_per_second"],
+            parallelism
+        ))
+    )
+
+
+execution_mode = st.radio(
+    "Execution mode",
+    ["Single query", "Batched (chunked)", "Incremental (new/changed rows)", "Cascade (small model first)"],
+    horizontal=True
+)
+
+if execution_mode == "Single query":
+    dedupe = st.checkbox("Deduplicate inputs and reuse cached classifications")
+    cache_table = None
+    if dedupe:
+        cache_name = st.text_input("Cache table", "AI_CLASSIFY_CACHE")
+        cache_table = f"{q(database)}.{q(schema)}.{q(cache_name)}"
+    write_to_table = st.checkbox("Write results to a table in Snowflake (paged preview)")
+    target_table = None
+    if write_to_table:
+        target_name = st.text_input("Target table", f"{table}_AI_CLASSIFY_RESULTS")
+        target_table = f"{q(database)}.{q(schema)}.{q(target_name)}"
+    # With dedupe on this is an upper bound: cached inputs are not sent again
+    run_allowed = classify_preflight("single")
+    if st.button("Run Cortex Classification", disabled=not run_allowed):
+        run_cortex(full_table, selected_cols, categories, config, target_table, cache_table)
+elif execution_mode == "Cascade (small model first)":
+    st.caption(
+        "A small model labels every row with a JSON answer and confidence; only rows that fail, "
+        "return malformed JSON, pick an unknown category or are not confident enough go to tier 2."
+    )
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        tier1_model = st.selectbox("Tier 1 model", CASCADE_SMALL_MODELS)
+    with c2:
+        tier2_model = st.selectbox("Escalate to", [AI_CLASSIFY_TIER] + CASCADE_LARGE_MODELS)
+    with c3:
+        threshold = st.slider("Min. confidence to accept", min_value=0.0, max_value=1.0, value=0.8, step=0.05)
+    results_name = st.text_input("Results table", f"{table}_AI_CLASSIFY_CASCADE")
+    results_table = f"{q(database)}.{q(schema)}.{q(results_name)}"
+
+    # Worst case: tier 1 runs on every row and every row is escalated to tier 2
+    def estimate_tier(model):
+        if model == AI_CLASSIFY_TIER:
+            return estimate_classify(
+                session, full_table, selected_cols, categories,
+                credits_per_million(preflight, "ai_classify"),
+                preflight["tokens_per_second"]
+            )
+        return estimate_batch_complete(
+            session, full_table, classify_prompt_sql(selected_cols, categories), model, CASCADE_MAX_TOKENS,
+            credits_per_million(preflight, model),
+            preflight["tokens_per_second"]
+        )
+
+    run_allowed = classify_preflight(
+        "cascade",
+        estimate_fn=lambda: estimate_cascade(estimate_tier(tier1_model), estimate_tier(tier2_model)),
+        signature=(tier1_model, tier2_model)
+    )
+    if st.button("Run Cortex Classification", disabled=not run_allowed):
+        if not selected_cols:
+            st.warning("No input columns selected.")
+        elif not categories:
+            st.warning("No categories provided.")
+        else:
+            labels = category_labels(categories)
+            with st.spinner(f"Tier 1 ({tier1_model}), then escalating to {tier2_model}..."):
+                stats = run_cascade(
+                    session, full_table, results_table, selected_cols,
+                    classify_prompt_sql(selected_cols, categories),
+                    tier1_model, tier2_model, threshold,
+                    labels=labels, input_cols=selected_cols, categories=categories, config_object=config
+                )
+            st.markdown("### Generated SQL")
+            st.code("\n".join(stats["SQL"]))
+            show_cascade_summary(stats, ESCALATION_REASONS)
+            st.session_state.classify_results_table = results_table
+            st.session_state.classify_results_order = stable_order(*[q(c) for c in selected_cols])
+            st.session_state.classify_results_reset = True
+elif execution_mode == "Incremental (new/changed rows)":
+    key_col = st.selectbox("Unique key column", text_columns)
+    results_name = st.text_input("Results table", f"{table}_AI_CLASSIFY_LATEST")
+    results_table = f"{q(database)}.{q(schema)}.{q(results_name)}"
+    delete_missing = st.checkbox("Remove results for rows deleted from the source")
+
+    # Upper bound: only new or changed rows are actually sent to AI_CLASSIFY
+    run_allowed = classify_preflight("incremental")
+    if st.button("Run Cortex Classification", disabled=not run_allowed):
+        if not selected_cols:
+            st.warning("No input columns selected.")
+        elif not categories:
+            st.warning("No categories provided.")
+        else:
+            try:
+                with st.spinner("Classifying new and changed rows..."):
+                    stats = run_incremental(session, full_table, results_table, key_col, selected_cols,
+                                            categories, config, delete_missing)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            st.markdown("### Generated SQL")
+            st.code(stats["sql"])
+            c1, c2, c3, c4, c5 = st.columns(5)
+            c1.metric("Inserted", f"{stats['inserted']:,}")
+            c2.metric("Updated", f"{stats['updated']:,}")
+            c3.metric("Deleted", f"{stats['deleted']:,}")
+            c4.metric("Unchanged (skipped)", f"{stats['unchanged']:,}")
+            c5.metric("NULL key (skipped)", f"{stats['skipped_null_keys']:,}")
+            if stats["skipped_null_keys"]:
+                st.warning(f"{stats['skipped_null_keys']:,} row(s) have a NULL {key_col} and were not classified.")
+            st.session_state.classify_results_table = results_table
+            st.session_state.classify_results_order = stable_order(q(key_col))
+            st.session_state.classify_results_reset = True
+else:
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        key_col = st.selectbox("Chunk key column", ["(none - hash buckets)"] + text_columns)
+        key_col = None if key_col.startswith("(none") else key_col
+    with c2:
+        n_chunks = st.number_input("Number of chunks", min_value=1, max_value=1000, value=16)
+    with c3:
+        max_parallel = st.number_input("Max parallel jobs", min_value=1, max_value=32, value=4)
+    results_name = st.text_input("Results table", f"{table}_AI_CLASSIFY_RESULTS")
+    results_table = f"{q(database)}.{q(schema)}.{q(results_name)}"
+
+    run_allowed = classify_preflight("batched", max_parallel)
+    if st.button("Run Cortex Classification", disabled=not run_allowed):
+        run_cortex_batched(full_table, selected_cols, categories, config,
+                           results_table, key_col, n_chunks, max_parallel)
+
+    run = st.session_state.get("classify_run")
+    if run is not None:
+        progress = run.progress()
+        if progress["failed"]:
+            st.error(f"{progress['failed']} chunk(s) failed")
+            st.json({str(cid): err for cid, err in run.errors.items()})
+            if st.button("Retry failed chunks"):
+                bar, status = st.progress(0.0), st.empty()
+                run.retry_failed(on_progress=lambda p: show_chunk_progress(bar, status, p))
+                st.rerun()
+        elif progress["done"] == progress["chunks"]:
+            st.success(
+                f"{progress['rows_done']:,} rows written to "
+                f"{st.session_state.classify_results_table}"
+            )
+
+if st.session_state.get("classify_results_table"):
+    st.markdown("### Cortex Classification Results")
+    paged_table(
+        session,
+        st.session_state.classify_results_table,
+        key="classify_results",
+        order_by=st.session_state.classify_results_order,
+        reset=st.session_state.pop("classify_results_reset", False)
+    )
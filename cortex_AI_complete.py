@@ -3,36 +3,296 @@ from snowflake.snowpark.context import get_active_session
 import pandas as pd
 import json
 import re
+import time
+from metadata_catalog import get_catalog
+from document_parsing import build_parse_sql, batch_parse
+import parse_cache
+from complete_engine import (
+    model_params_sql, build_single_call_sql, single_call_params,
+    build_map_reduce_sql, map_reduce_params, RESULT_COLUMNS
+)
+from complete_stream import streaming_available, fetch_document_text, StreamStats, stream_complete
+from complete_batch import template_columns, template_to_sql, start_batch, batch_summary
+from complete_cache import is_cacheable, request_key, get_response_cache
+from result_store import materialize, stable_order
+from app_widgets import paged_table, show_chunk_progress, show_cascade_summary, query_profiler_panel
+from cost_guard import preflight_settings, preflight_gate, credits_per_million
+from cost_estimator import estimate_batch_complete, estimate_cascade, estimate_document_complete
+from cascade import CASCADE_SMALL_MODELS, ESCALATION_REASONS, template_prompt_sql, run_cascade
+from complete_compare import compare_sql, ModelComparison
+from query_profiler import get_profiled_session
+from sql_utils import q, stage_relative_path
 
 
 # -------------------------------
 # Setup Snowflake session
 # -------------------------------
-session = get_active_session()
+session = get_profiled_session(get_active_session(), st.session_state)
 
 st.title("Snowflake Cortex Complete")
 
-def q(name):
-    return f'"{name}"'
+# -------------------------------
+# Cortex models
+# -------------------------------
+core_models = [
+    "claude-4-opus",
+    "claude-4-sonnet",
+    "claude-3-7-sonnet",
+    "claude-3-5-sonnet",
+    "deepseek-r1",
+    "llama3-8b",
+    "llama3-70b",
+    "llama3.1-8b",
+    "llama3.1-70b",
+    "llama3.1-405b",
+    "llama3.3-70b",
+    "llama4-maverick",
+    "llama4-scout",
+    "mistral-large",
+    "mistral-large2",
+    "mistral-7b",
+    "mixtral-8x7b",
+    "openai-gpt-4.1",
+    "openai-o4-mini",
+    "snowflake-arctic",
+    "snowflake-llama-3.1-405b",
+    "snowflake-llama-3.3-70b"
+]
+
+# -------------------------------
+# Metadata catalog (cached per session)
+# -------------------------------
+catalog = get_catalog(session, st.session_state)
+
+with st.sidebar:
+    if st.button("Refresh metadata"):
+        catalog.refresh()
+    st.caption("Metadata cache: {hits} hits / {misses} misses".format(**catalog.stats()))
+query_profiler_panel(session)
+preflight = preflight_settings()
 
 # -------------------------------
 # Step 1-3: Database / Schema / Stage / File
 # -------------------------------
+database = st.selectbox("Select Database", catalog.databases(), index=None, placeholder="Choose a database")
+if not database:
+    st.stop()
+
+schema = st.selectbox("Select Schema", catalog.schemas(database), index=None, placeholder="Choose a schema")
+if not schema:
+    st.stop()
+
+# -------------------------------
+# Batch prompts: one template over every row of a table
+# -------------------------------
+app_mode = st.sidebar.radio("Mode", ["Single document", "Batch prompts over a table"])
+
+if app_mode == "Batch prompts over a table":
+    st.subheader("Batch Prompts")
+    batch_table = st.selectbox("Source table", catalog.tables(database, schema), index=None, placeholder="Choose a table")
+    if not batch_table:
+        st.stop()
+    batch_source = f"{q(database)}.{q(schema)}.{q(batch_table)}"
+    source_columns = catalog.columns(database, schema, batch_table)
+    st.caption("Columns: " + ", ".join(source_columns))
+
+    template = st.text_area(
+        "Prompt template",
+        placeholder="Summarize this support ticket in one sentence: {TICKET_BODY}",
+        help="Reference columns as {COLUMN_NAME}; they are substituted per row inside Snowflake."
+    )
+    batch_model = st.selectbox("Select LLM Model", core_models, key="batch_model")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        batch_temperature = st.slider("Temperature", 0, 10, 0, key="batch_temperature") / 10
+    with c2:
+        batch_top_p = st.slider("Top_p", 0, 10, 0, key="batch_top_p") / 10
+    with c3:
+        batch_max_tokens = st.slider("max_tokens", 0, 8192, 1024, step=256, key="batch_max_tokens")
+    c1, c2 = st.columns(2)
+    with c1:
+        batch_chunks = st.number_input("Number of chunks (1 = one set-based statement)", min_value=1, max_value=1000, value=1)
+    with c2:
+        batch_parallel = st.number_input("Max parallel jobs", min_value=1, max_value=32, value=4)
+    use_cascade = st.checkbox(
+        "Cascade: answer with a small model first, escalate only uncertain rows to the model above",
+        help="Responses become JSON {answer, confidence}. Rows whose call fails, whose JSON is malformed, "
+             "whose answer is not an allowed value or whose confidence is too low go to the larger model."
+    )
+    if use_cascade:
+        c1, c2 = st.columns(2)
+        with c1:
+            tier1_model = st.selectbox("Tier 1 model", CASCADE_SMALL_MODELS, key="batch_tier1_model")
+        with c2:
+            cascade_threshold = st.slider("Min. confidence to accept", min_value=0.0, max_value=1.0,
+                                          value=0.8, step=0.05, key="batch_cascade_threshold")
+        allowed_answers = st.text_input("Allowed answers (comma separated, optional)", key="batch_allowed_answers")
+        allowed_answers = [a.strip() for a in allowed_answers.split(",") if a.strip()]
+    batch_results_name = st.text_input(
+        "Results table",
+        f"{batch_table}_AI_COMPLETE_{'CASCADE' if use_cascade else 'RESULTS'}"
+    )
+    batch_results_table = f"{q(database)}.{q(schema)}.{q(batch_results_name)}"
+
+    batch_columns = template_columns(template)
+    run_allowed = True
+    if batch_columns and all(c in source_columns for c in batch_columns):
+        st.markdown("### Pre-flight estimate")
+        def estimate_batch():
+            if not use_cascade:
+                return estimate_batch_complete(
+                    session, batch_source, template_to_sql(template), batch_model, batch_max_tokens,
+                    credits_per_million(preflight, batch_model),
+                    preflight["tokens_per_second"],
+                    batch_parallel
+                )
+            # Worst case: tier 1 on every row, then every row escalated to the model above
+            return estimate_cascade(*[
+                estimate_batch_complete(
+                    session, batch_source, template_prompt_sql(template), model, batch_max_tokens,
+                    credits_per_million(preflight, model),
+                    preflight["tokens_per_second"]
+                )
+                for model in (tier1_model, batch_model)
+            ])
+
+        run_allowed = preflight_gate(
+            "batch_complete",
+            preflight,
+            (batch_source, template, batch_model, batch_max_tokens, batch_parallel,
+             use_cascade and tier1_model),
+            estimate_batch
+        )
+
+    if st.button("Run Batch", disabled=not run_allowed):
+        columns = batch_columns
+        unknown = [c for c in columns if c not in source_columns]
+        if not columns:
+            st.warning("Reference at least one column in the template, e.g. {TEXT}.")
+        elif unknown:
+            st.warning(f"Unknown column(s) in template: {', '.join(unknown)}")
+        elif use_cascade:
+            with st.spinner(f"Tier 1 ({tier1_model}), then escalating to {batch_model}..."):
+                st.session_state.batch_cascade = run_cascade(
+                    session, batch_source, batch_results_table, columns,
+                    template_prompt_sql(template),
+                    tier1_model, batch_model, cascade_threshold,
+                    temperature=batch_temperature,
+                    max_tokens=batch_max_tokens,
+                    labels=allowed_answers or None
+                )
+            st.session_state.batch_run = None
+            st.session_state.batch_results_table = batch_results_table
+            st.session_state.batch_results_order = stable_order(*[q(c) for c in columns])
+            st.session_state.batch_results_reset = True
+        else:
+            st.session_state.batch_cascade = None
+            with st.spinner("Planning chunks..."):
+                st.session_state.batch_run = start_batch(
+                    session,
+                    batch_source,
+                    batch_results_table,
+                    columns,
+                    batch_model,
+                    template,
+                    model_params_sql(batch_temperature, batch_top_p, batch_max_tokens),
+                    n_chunks=batch_chunks,
+                    max_parallel=batch_parallel
+                )
+            st.session_state.batch_results_table = batch_results_table
+            st.session_state.batch_results_order = stable_order(*[q(c) for c in columns])
+            st.session_state.batch_results_reset = True
+            bar, status = st.progress(0.0), st.empty()
+            st.session_state.batch_run.run(on_progress=lambda p: show_chunk_progress(bar, status, p))
 
+    cascade_stats = st.session_state.get("batch_cascade")
+    if cascade_stats is not None:
+        show_cascade_summary(cascade_stats, ESCALATION_REASONS)
+        st.markdown("### Cascade Results")
+        paged_table(
+            session,
+            st.session_state.batch_results_table,
+            key="batch_results",
+            order_by=st.session_state.batch_results_order,
+            reset=st.session_state.pop("batch_results_reset", False)
+        )
 
+    batch_run = st.session_state.get("batch_run")
+    if batch_run is not None:
+        progress = batch_run.progress()
+        if progress["failed"]:
+            st.error(f"{progress['failed']} chunk(s) failed")
+            st.json({str(cid): err for cid, err in batch_run.errors.items()})
+            if st.button("Retry failed chunks"):
+                bar, status = st.progress(0.0), st.empty()
+                batch_run.retry_failed(on_progress=lambda p: show_chunk_progress(bar, status, p))
+                st.rerun()
 
-databases = [row["name"] for row in session.sql("SHOW DATABASES").collect()]
+        summary = batch_summary(session, st.session_state.batch_results_table)
+        c1, c2, c3, c4, c5 = st.columns(5)
+        c1.metric("Rows", f"{summary['ROWS_DONE']:,}")
+        c2.metric("Rows / second", f"{progress['rows_per_sec']:,.1f}")
+        c3.metric("Row errors", f"{summary['ERRORS']:,}")
+        c4.metric("Prompt tokens", f"{summary['PROMPT_TOKENS'] or 0:,}")
+        c5.metric("Completion tokens", f"{summary['COMPLETION_TOKENS'] or 0:,}")
 
-database = st.selectbox("Select Database", databases)
+        st.markdown("### Batch Results")
+        paged_table(
+            session,
+            st.session_state.batch_results_table,
+            key="batch_results",
+            order_by=st.session_state.batch_results_order,
+            reset=st.session_state.pop("batch_results_reset", False)
+        )
+    st.stop()
 
-schemas = [row["name"] for row in session.sql(f"SHOW SCHEMAS IN {q(database)}").collect()]
-schema = st.selectbox("Select Schema", schemas)
+stage = st.selectbox("Select Stage", catalog.stages(database, schema), index=None, placeholder="Choose a stage")
+if not stage:
+    st.stop()
 
-stages = [row["name"] for row in session.sql(f"SHOW STAGES IN {q(database)}.{q(schema)}").collect()]
-stage = st.selectbox("Select Stage", stages)
+# -------------------------------
+# Batch parse: many stage files into one PARSED_DOCUMENTS table
+# -------------------------------
+with st.expander("Batch Parse Documents"):
+    stage_ref = f"{database}.{schema}.{stage}"
+    batch_scope = st.radio("Files", ["All files in stage", "Glob pattern", "Select files"], horizontal=True)
+    batch_glob, batch_paths = None, None
+    if batch_scope == "Glob pattern":
+        batch_glob = st.text_input("Pattern (e.g. invoices/*.pdf)", "*.pdf")
+    elif batch_scope == "Select files":
+        batch_paths = st.multiselect(
+            "Files to parse",
+            [stage_relative_path(f) for f in catalog.stage_files(database, schema, stage)]
+        )
+    c1, c2 = st.columns(2)
+    with c1:
+        batch_mode = st.selectbox("Mode", ['OCR', 'LAYOUT'], key="batch_mode")
+    with c2:
+        batch_split = st.selectbox("Page Split", ['FALSE', 'TRUE'], key="batch_split")
+    parsed_documents_table = f"{database}.{schema}.PARSED_DOCUMENTS"
+
+    if st.button("Parse Batch"):
+        with st.spinner("Parsing new and changed documents..."):
+            try:
+                stats = batch_parse(
+                    session,
+                    stage_ref,
+                    parsed_documents_table,
+                    {'mode': batch_mode, 'page_split': batch_split == 'TRUE'},
+                    glob=batch_glob,
+                    paths=batch_paths
+                )
+                st.code(stats["sql"])
+                c1, c2, c3 = st.columns(3)
+                c1.metric("Selected files", f"{stats['selected']:,}")
+                c2.metric("Parsed", f"{stats['parsed']:,}")
+                c3.metric("Skipped (unchanged)", f"{stats['skipped']:,}")
+            except Exception as e:
+                st.error(f"Batch parse failed: {str(e)}")
 
-files = [row["name"] for row in session.sql(f"ls @{q(database)}.{q(schema)}.{q(stage)}").collect()]
-file = st.selectbox("Select pdf File", files)
+file = st.selectbox("Select pdf File", catalog.stage_files(database, schema, stage), index=None, placeholder="Choose a file")
+if not file:
+    st.stop()
 
 full_filepath = f"{q(database)}.{q(schema)}.{q(file)}"
 
@@ -63,61 +323,64 @@ options = {'mode': mode, 'page_split': split}
 
 
 
-sql = f"""
-CREATE OR REPLACE TABLE {full_tablename} AS
-SELECT
-    *,
-        SNOWFLAKE.CORTEX.PARSE_DOCUMENT(
-            '@{database}.{schema}.{stage}',
-            '{clean_filename}',
-            {options}
-            ) AS parsed_text
-FROM DIRECTORY(@{database}.{schema}.{stage})
-WHERE RELATIVE_PATH = '{clean_filename}'
-"""
+sql = build_parse_sql(database, schema, stage, clean_filename, options, full_tablename)
+
+use_parse_cache = st.checkbox("Use parse cache", value=True)
+if use_parse_cache:
+    c1, c2 = st.columns(2)
+    with c1:
+        cache_max_age_days = st.number_input("Cache max age (days)", min_value=1, max_value=365, value=30)
+    with c2:
+        cache_max_mb = st.number_input("Cache max size (MB of text)", min_value=1, max_value=100000, value=1024)
+    parse_cache_table = f"{database}.{schema}.PARSE_CACHE"
 
 st.subheader("Parse Document")
 st.code(sql)
 if st.button("Parse Document"):
     with st.spinner("Parsing Document"):
-        session.sql(sql).collect()
-        st.success("PDF parsed and table created")
-    
-        df = session.sql(f"SELECT * FROM {full_tablename}").to_pandas()
+        cached, file_key = False, None
+        if use_parse_cache:
+            parse_cache.ensure_parse_cache_table(session, parse_cache_table)
+            file_key = parse_cache.stage_file_key(session, f"{database}.{schema}.{stage}", clean_filename)
+            if file_key:
+                cached = parse_cache.lookup(session, parse_cache_table, file_key, options)
+
+        if cached:
+            st.success("Parsed text loaded from cache (PARSE_DOCUMENT skipped)")
+            st.session_state.parsed_source = parse_cache.source(parse_cache_table, file_key, options)
+        else:
+            session.sql(sql).collect()
+            st.success("PDF parsed and table created")
+            st.session_state.parsed_source = {"table": full_tablename, "where": "TRUE"}
+
+            if use_parse_cache and file_key:
+                parse_cache.store(session, parse_cache_table, file_key, options, clean_filename, full_tablename)
+                # The entry just stored is the one this session is about to read
+                parse_cache.evict(
+                    session, parse_cache_table, cache_max_age_days, cache_max_mb * 1024 * 1024,
+                    keep=[(file_key, options)]
+                )
+
+        # Preview only a bounded slice; the full text stays in Snowflake
+        parsed_source = st.session_state.parsed_source
+        df = session.sql(f"""
+            SELECT LENGTH(TO_VARCHAR(PARSED_TEXT)) AS PARSED_CHARS,
+                   SHA2(TO_VARCHAR(PARSED_TEXT), 256) AS FINGERPRINT,
+                   LEFT(TO_VARCHAR(PARSED_TEXT), 2000) AS PARSED_PREVIEW
+            FROM {parsed_source['table']}
+            WHERE {parsed_source['where']}
+            LIMIT 1
+        """).to_pandas()
         st.dataframe(df)
-        st.session_state.parsed_text = df.iloc[0, 6]
+        parsed_source["fingerprint"] = df["FINGERPRINT"].iloc[0] if len(df) else None
 
-if 'parsed_text' in st.session_state:
+if 'parsed_source' in st.session_state:
 
 # -------------------------------
 # Step 5: AI_COMPLETE Parameter Builder
 # -------------------------------
-    core_models = [
-        "claude-4-opus",
-        "claude-4-sonnet",
-        "claude-3-7-sonnet",
-        "claude-3-5-sonnet",
-        "deepseek-r1",
-        "llama3-8b",
-        "llama3-70b",
-        "llama3.1-8b",
-        "llama3.1-70b",
-        "llama3.1-405b",
-        "llama3.3-70b",
-        "llama4-maverick",
-        "llama4-scout",
-        "mistral-large",
-        "mistral-large2",
-        "mistral-7b",
-        "mixtral-8x7b",
-        "openai-gpt-4.1",
-        "openai-o4-mini",
-        "snowflake-arctic",
-        "snowflake-llama-3.1-405b",
-        "snowflake-llama-3.3-70b"
-    ]
     
-    finetuned_models = [row["name"] for row in session.sql(f"SHOW MODELS IN ACCOUNT").collect()]
+    finetuned_models = catalog.models()
     all_models = core_models + finetuned_models
     model = st.selectbox("Select LLM Model", core_models)
     
@@ -138,18 +401,6 @@ if 'parsed_text' in st.session_state:
     #     {'role': 'user', 'content': user_prompt}
     #  ]
     
-    #full_prompt_dev = f"{prompt} {st.session_state.parsed_text}"     #Makes a string for input into the sql
-    
-    
-    def sql_escape(s):
-        return s.replace("'", "''")
-    
-    full_prompt_dev = sql_escape(
-        f"{prompt}\n\nDOCUMENT CONTENT:\n{st.session_state.parsed_text}"
-    )
-    
-    st.markdown(type(full_prompt_dev))
-    
     temperature = st.slider("Temperature (Increases the randomness of the output of the language model.)", min_value=0, max_value=10, value=0, step=1)
     temperature = temperature / 10
     
@@ -166,26 +417,195 @@ if 'parsed_text' in st.session_state:
     # -------------------------------
     
     
-    sql = f"""
-        SELECT AI_COMPLETE(
-            '{model}',
-            '{full_prompt_dev}',
-            OBJECT_CONSTRUCT(
-                'temperature', {temperature},
-                'top_p', {top_p},
-                'max_tokens', {max_tokens}
-                                )
-            ) AS LLM_SCORE
-            
-        """
+    completion_mode = st.radio("Completion mode", ["Single call", "Map-reduce (long documents)"], horizontal=True)
+
+    if completion_mode == "Single call":
+        # The document is read from the parsed table; only the prompt is bound
+        sql = build_single_call_sql(
+            model,
+            st.session_state.parsed_source,
+            model_params_sql(temperature, top_p, max_tokens)
+        )
+        sql_params = single_call_params(prompt)
+    else:
+        chunk_tokens = st.slider("Chunk size (tokens per map call)", min_value=256, max_value=16000, value=2000, step=256)
+        # Overlap stays well below the chunk size
+        overlap_tokens = st.slider("Chunk overlap (tokens)", min_value=0, max_value=min(1000, chunk_tokens // 2),
+                                   value=100, step=50)
+        sql = build_map_reduce_sql(
+            model,
+            st.session_state.parsed_source,
+            model_params_sql(temperature, top_p, max_tokens),
+            chunk_tokens,
+            overlap_tokens
+        )
+        sql_params = map_reduce_params(prompt)
     st.code(sql)
-    if st.button("Run Cortex Complete"):
-        with st.spinner("Running Cortex Complete"):
-            res = session.sql(sql).to_pandas()
-            st.dataframe(res)
-            cell_value = res["LLM_SCORE"].iloc[0]  # row 0
+
+    write_to_table = st.checkbox("Write responses to a table in Snowflake (paged preview)")
+    if write_to_table:
+        target_name = st.text_input("Target table", "AI_COMPLETE_RESULTS")
+        target_table = f"{q(database)}.{q(schema)}.{q(target_name)}"
+
+    stream_response = False
+    if completion_mode == "Single call" and not write_to_table:
+        stream_response = st.checkbox(
+            "Stream response",
+            disabled=not streaming_available(),
+            help="Show tokens as they are generated (needs snowflake-ml-python)."
+        )
+
+    # Response cache (deterministic requests only)
+    response_cache, cache_key = None, None
+    if not write_to_table:
+        use_response_cache = st.checkbox(
+            "Use response cache",
+            value=True,
+            disabled=not is_cacheable(temperature),
+            help="Only requests with temperature 0 are cached."
+        )
+        if use_response_cache and is_cacheable(temperature):
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                cache_ttl = st.number_input("Cache TTL (hours)", min_value=1, max_value=720, value=24) * 3600
+            with c2:
+                bypass_cache = st.checkbox("Bypass cache (force a fresh call)")
+            response_cache = get_response_cache(session, st.session_state, f"{database}.{schema}.AI_COMPLETE_CACHE")
+            with c3:
+                if st.button("Purge expired entries"):
+                    response_cache.purge_expired(cache_ttl)
+            cache_key = request_key(
+                sql=sql,
+                params=sql_params,
+                document=st.session_state.parsed_source.get("fingerprint")
+            )
+
+    st.markdown("### Pre-flight estimate")
+    map_reduce = completion_mode != "Single call"
+    run_allowed = preflight_gate(
+        "complete",
+        preflight,
+        (
+            st.session_state.parsed_source, model, prompt, max_tokens,
+            chunk_tokens if map_reduce else None, overlap_tokens if map_reduce else 0
+        ),
+        lambda: estimate_document_complete(
+            session, st.session_state.parsed_source, model, prompt, max_tokens,
+            credits_per_million(preflight, model),
+            preflight["tokens_per_second"],
+            chunk_tokens=chunk_tokens if map_reduce else None,
+            overlap_tokens=overlap_tokens if map_reduce else 0
+        )
+    )
+
+    if st.button("Run Cortex Complete", disabled=not run_allowed):
+        response_text, cached_response = None, None
+        if response_cache is not None and not bypass_cache:
+            lookup_started = time.perf_counter()
+            cached_response, cache_layer = response_cache.get(cache_key, cache_ttl)
+            lookup_ms = (time.perf_counter() - lookup_started) * 1000
+
+        if cached_response is not None:
+            st.success(f"Served from {cache_layer} cache in {lookup_ms:.0f} ms")
+            st.markdown("### Response")
+            st.markdown(cached_response)
+        elif stream_response:
+            with st.spinner("Fetching document text"):
+                document_text = fetch_document_text(session, st.session_state.parsed_source)
+            stream_stats = StreamStats()
             st.markdown("### Response")
-            st.markdown(cell_value)
+            response_text = st.write_stream(stream_complete(
+                session,
+                model,
+                single_call_params(prompt)[0] + document_text,
+                temperature,
+                top_p,
+                max_tokens,
+                stream_stats
+            ))
+            timings = stream_stats.as_dict()
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Time to first token", f"{timings['time_to_first_token_s'] or 0:.2f}s")
+            c2.metric("Tokens / second", f"{timings['tokens_per_second']:.1f}")
+            c3.metric("Total time", f"{timings['total_time_s'] or 0:.2f}s")
+        else:
+            with st.spinner("Running Cortex Complete"):
+                if write_to_table:
+                    materialize(
+                        session,
+                        f"SELECT CURRENT_TIMESTAMP() AS CREATED_AT, '{model}' AS MODEL, * FROM ({sql})",
+                        target_table,
+                        mode="append",
+                        params=sql_params,
+                        columns=["CREATED_AT", "MODEL"] + RESULT_COLUMNS
+                    )
+                    st.success(f"Response appended to {target_table}")
+                    st.session_state.complete_results_table = target_table
+                    st.session_state.complete_results_reset = True
+                else:
+                    res = session.sql(sql, params=sql_params).to_pandas()
+                    st.dataframe(res)
+                    cell_value = res["LLM_SCORE"].iloc[0]  # row 0
+                    st.markdown("### Response")
+                    st.markdown(cell_value)
+                    response_text = cell_value
+
+        if response_cache is not None and isinstance(response_text, str) and response_text:
+            response_cache.put(cache_key, model, response_text, cache_ttl)
+
+    if st.session_state.get("complete_results_table"):
+        st.markdown("### Stored Responses")
+        paged_table(
+            session,
+            st.session_state.complete_results_table,
+            key="complete_results",
+            page_size=20,
+            order_by=stable_order("CREATED_AT DESC"),
+            reset=st.session_state.pop("complete_results_reset", False)
+        )
+
+    # -------------------------------
+    # Compare models: same prompt and document, concurrent async queries
+    # -------------------------------
+    with st.expander("Compare models"):
+        compare_models = st.multiselect(
+            "Models to compare",
+            all_models,
+            default=[model],
+            help="Each model runs as its own async query; results appear as each one finishes."
+        )
+        if st.button("Run comparison", disabled=len(compare_models) < 2 or not prompt):
+            compare_params = model_params_sql(temperature, top_p, max_tokens)
+            comparison = ModelComparison(
+                session,
+                compare_models,
+                lambda m: compare_sql(m, st.session_state.parsed_source, compare_params),
+                single_call_params(prompt)
+            )
+            per_row = min(len(compare_models), 3)
+            slots = {}
+            for i in range(0, len(compare_models), per_row):
+                for m, col in zip(compare_models[i:i + per_row], st.columns(per_row)):
+                    with col:
+                        st.markdown(f"**{m}**")
+                        slots[m] = st.empty()
+                        slots[m].caption("Running...")
+
+            def show_result(r):
+                with slots[r["model"]].container():
+                    if r["error"]:
+                        st.error(r["error"])
+                    else:
+                        st.caption(
+                            f"{r['latency_s']:.1f}s | {r['output_tokens']:,} output tokens | "
+                            f"{r['tokens_per_second']:.1f} tokens/s"
+                        )
+                        st.markdown(r["response"] or "")
+
+            st.session_state.model_comparison = comparison.run(on_finished=show_result)
+        if st.session_state.get("model_comparison"):
+            st.markdown("### Comparison summary (fastest first)")
+            st.dataframe(st.session_state.model_comparison, hide_index=True)
     
     
 
@@ -0,0 +1,211 @@
+import math
+
+from classify_engine import concat_expr, to_snowflake_json
+from complete_engine import CHARS_PER_TOKEN, document_pieces_cte
+
+# -------------------------------------
+# Pre-flight token, cost and runtime estimates for Cortex jobs
+# -------------------------------------
+# A small sample of the input is token-counted inside Snowflake with
+# COUNT_TOKENS (falling back to characters / CHARS_PER_TOKEN when the model is
+# not supported) and extrapolated to the whole job. Output tokens use the
+# max_tokens setting, so completion estimates are upper bounds. Rates are
+# approximate list prices in credits per million tokens; override them in the
+# app to match the account's consumption table.
+
+SAMPLE_ROWS = 200
+
+DEFAULT_CREDITS_PER_MILLION_TOKENS = {
+    "ai_classify": 1.39,
+    "claude-4-opus": 12.0,
+    "claude-4-sonnet": 2.55,
+    "claude-3-7-sonnet": 2.55,
+    "claude-3-5-sonnet": 2.55,
+    "deepseek-r1": 1.03,
+    "llama3-8b": 0.19,
+    "llama3-70b": 1.21,
+    "llama3.1-8b": 0.19,
+    "llama3.1-70b": 1.21,
+    "llama3.1-405b": 3.0,
+    "llama3.3-70b": 1.21,
+    "llama4-maverick": 0.25,
+    "llama4-scout": 0.14,
+    "mistral-large": 5.1,
+    "mistral-large2": 1.95,
+    "mistral-7b": 0.12,
+    "mixtral-8x7b": 0.22,
+    "snowflake-arctic": 0.84,
+    "snowflake-llama-3.1-405b": 0.96,
+    "snowflake-llama-3.3-70b": 0.29,
+}
+
+# Rough aggregate processing speed of one running statement, used for the
+# runtime estimate; override it from observed runs
+DEFAULT_TOKENS_PER_SECOND = 2000
+
+# AI_CLASSIFY returns a label, not free text
+CLASSIFY_OUTPUT_TOKENS = 5
+
+
+def approx_tokens(text):
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _count_tokens_sql(model, text_expr, categories=None):
+    if categories is not None:
+        return f"SNOWFLAKE.CORTEX.COUNT_TOKENS('{model}', {text_expr}, {to_snowflake_json(categories)})"
+    return f"SNOWFLAKE.CORTEX.COUNT_TOKENS('{model}', {text_expr})"
+
+
+def sample_tokens(session, table, text_expr, model, categories=None, where=None, sample_rows=SAMPLE_ROWS):
+    """
+    Average input tokens per row of `text_expr` over a row sample of `table`,
+    plus the table's row count. Returns total_rows, sampled_rows,
+    avg_input_tokens and method ("COUNT_TOKENS" or "chars/4").
+    """
+    where_sql = f" WHERE {where}" if where else ""
+    total_rows = session.sql(f"SELECT COUNT(*) FROM {table}{where_sql}").collect()[0][0]
+    sample_sql = f"SELECT {text_expr} AS TXT FROM {table} SAMPLE ({int(sample_rows)} ROWS){where_sql}"
+    try:
+        row = session.sql(f"""
+            SELECT COUNT(*), AVG({_count_tokens_sql(model, 'TXT', categories)})
+            FROM ({sample_sql})
+        """).collect()[0]
+        method = "COUNT_TOKENS"
+    except Exception:
+        extra = f" + {len(to_snowflake_json(categories))}" if categories is not None else ""
+        row = session.sql(f"""
+            SELECT COUNT(*), AVG(LENGTH(TXT){extra}) / {CHARS_PER_TOKEN}
+            FROM ({sample_sql})
+        """).collect()[0]
+        method = f"chars/{CHARS_PER_TOKEN}"
+    return {
+        "total_rows": total_rows,
+        "sampled_rows": row[0],
+        "avg_input_tokens": float(row[1] or 0),
+        "method": method,
+    }
+
+
+def document_tokens(session, parsed_source, model):
+    """Tokens in a parsed document (all pages)."""
+    text_sql = "LISTAGG(PIECE_TEXT, '\\n\\n') WITHIN GROUP (ORDER BY PAGE_NO)"
+    try:
+        tokens = session.sql(f"""
+            WITH {document_pieces_cte(parsed_source)}
+            SELECT {_count_tokens_sql(model, text_sql)} FROM PIECES
+        """).collect()[0][0]
+        method = "COUNT_TOKENS"
+    except Exception:
+        chars = session.sql(f"""
+            WITH {document_pieces_cte(parsed_source)}
+            SELECT SUM(LENGTH(PIECE_TEXT)) FROM PIECES
+        """).collect()[0][0]
+        tokens = math.ceil((chars or 0) / CHARS_PER_TOKEN)
+        method = f"chars/{CHARS_PER_TOKEN}"
+    return {"doc_tokens": int(tokens or 0), "method": method}
+
+
+def estimate_job(calls, input_tokens, output_tokens, credits_per_million,
+                 tokens_per_second=DEFAULT_TOKENS_PER_SECOND, parallelism=1, **details):
+    total = input_tokens + output_tokens
+    return {
+        "calls": int(calls),
+        "input_tokens": int(input_tokens),
+        "output_tokens": int(output_tokens),
+        "total_tokens": int(total),
+        "credits": round(total / 1_000_000 * credits_per_million, 4),
+        "runtime_seconds": round(total / (tokens_per_second * max(int(parallelism), 1)), 1),
+        **details,
+    }
+
+
+def estimate_classify(session, table, input_cols, categories, credits_per_million,
+                      tokens_per_second=DEFAULT_TOKENS_PER_SECOND, parallelism=1, where=None):
+    """Upper bound: every row is classified (no cache or incremental skips)."""
+    sample = sample_tokens(session, table, concat_expr(input_cols), "ai_classify", categories, where)
+    rows = sample["total_rows"]
+    return estimate_job(
+        rows,
+        rows * sample["avg_input_tokens"],
+        rows * CLASSIFY_OUTPUT_TOKENS,
+        credits_per_million,
+        tokens_per_second,
+        parallelism,
+        **sample
+    )
+
+
+def estimate_batch_complete(session, table, text_expr, model, max_tokens, credits_per_million,
+                            tokens_per_second=DEFAULT_TOKENS_PER_SECOND, parallelism=1):
+    """One call per row; output assumes max_tokens per response."""
+    sample = sample_tokens(session, table, text_expr, model)
+    rows = sample["total_rows"]
+    return estimate_job(
+        rows,
+        rows * sample["avg_input_tokens"],
+        rows * int(max_tokens),
+        credits_per_million,
+        tokens_per_second,
+        parallelism,
+        **sample
+    )
+
+
+def estimate_document_complete(session, parsed_source, model, prompt, max_tokens, credits_per_million,
+                               tokens_per_second=DEFAULT_TOKENS_PER_SECOND,
+                               chunk_tokens=None, overlap_tokens=0):
+    """
+    Single call (chunk_tokens=None) or map-reduce over chunks of
+    `chunk_tokens`: every map call repeats the prompt, and the reduce call
+    reads all partial answers.
+    """
+    doc = document_tokens(session, parsed_source, model)
+    prompt_tokens = approx_tokens(prompt)
+    if not chunk_tokens:
+        return estimate_job(1, doc["doc_tokens"] + prompt_tokens, max_tokens, credits_per_million,
+                            tokens_per_second, 1, **doc)
+    step = max(int(chunk_tokens) - int(overlap_tokens), 1)
+    chunks = max(math.ceil(doc["doc_tokens"] / step), 1)
+    map_input = doc["doc_tokens"] + chunks * (prompt_tokens + int(overlap_tokens))
+    reduce_input = prompt_tokens + chunks * int(max_tokens)
+    return estimate_job(
+        chunks + 1,
+        map_input + reduce_input,
+        (chunks + 1) * int(max_tokens),
+        credits_per_million,
+        tokens_per_second,
+        # Conservative: map calls may run concurrently inside the statement
+        1,
+        chunks=chunks,
+        **doc
+    )
+
+
+def estimate_cascade(tier1, tier2):
+    """
+    Worst case of a model cascade from the two tiers' estimates over all
+    rows: tier 1 answers every row and every row is then escalated to tier
+    2. The tiers run one after the other, so their runtimes add up.
+    """
+    combined = {k: tier1[k] + tier2[k] for k in ("calls", "input_tokens", "output_tokens", "total_tokens")}
+    return {
+        **tier1,
+        **combined,
+        "credits": round(tier1["credits"] + tier2["credits"], 4),
+        "runtime_seconds": round(tier1["runtime_seconds"] + tier2["runtime_seconds"], 1),
+        "tier1_credits": tier1["credits"],
+        "tier2_credits": tier2["credits"],
+    }
+
+
+def check_budget(estimate, max_credits=None, max_tokens=None, max_runtime_seconds=None):
+    """Human-readable list of exceeded budgets (empty when within budget)."""
+    exceeded = []
+    if max_credits and estimate["credits"] > max_credits:
+        exceeded.append(f"~{estimate['credits']:,.2f} credits > budget {max_credits:,.2f}")
+    if max_tokens and estimate["total_tokens"] > max_tokens:
+        exceeded.append(f"~{estimate['total_tokens']:,} tokens > budget {max_tokens:,}")
+    if max_runtime_seconds and estimate["runtime_seconds"] > max_runtime_seconds:
+        exceeded.append(f"~{estimate['runtime_seconds']:,.0f}s runtime > budget {max_runtime_seconds:,.0f}s")
+    return exceeded
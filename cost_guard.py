@@ -0,0 +1,93 @@
+import hashlib
+
+import streamlit as st
+from cost_estimator import DEFAULT_CREDITS_PER_MILLION_TOKENS, DEFAULT_TOKENS_PER_SECOND, check_budget
+
+# -------------------------------------
+# Pre-flight cost guard widgets for the Cortex apps
+# -------------------------------------
+
+
+def preflight_settings():
+    """
+    Sidebar budget settings for Cortex jobs. Returns a dict for
+    preflight_gate / credits_per_million.
+    """
+    with st.sidebar.expander("Cost guard"):
+        enabled = st.checkbox("Estimate tokens and cost before running", value=True, key="preflight_enabled")
+        max_credits = st.number_input("Credit budget per job (0 = none)", min_value=0.0, value=5.0, step=1.0,
+                                      key="preflight_max_credits")
+        max_tokens = st.number_input("Token budget per job (0 = none)", min_value=0, value=0, step=1_000_000,
+                                     key="preflight_max_tokens")
+        max_minutes = st.number_input("Runtime budget per job, minutes (0 = none)", min_value=0, value=30,
+                                      key="preflight_max_minutes")
+        on_exceed = st.radio("Over budget", ["Ask for confirmation", "Block"], key="preflight_on_exceed")
+        rate_override = st.number_input("Credits per 1M tokens (0 = built-in rate for the model)",
+                                        min_value=0.0, value=0.0, step=0.1, key="preflight_rate")
+        tokens_per_second = st.number_input("Assumed tokens/s per statement", min_value=1,
+                                            value=DEFAULT_TOKENS_PER_SECOND, key="preflight_tps")
+    return {
+        "enabled": enabled,
+        "max_credits": max_credits,
+        "max_tokens": max_tokens,
+        "max_runtime_seconds": max_minutes * 60,
+        "block": on_exceed == "Block",
+        "rate_override": rate_override,
+        "tokens_per_second": tokens_per_second,
+    }
+
+
+def credits_per_million(settings, model):
+    if settings["rate_override"]:
+        return settings["rate_override"]
+    return DEFAULT_CREDITS_PER_MILLION_TOKENS.get(model, 0.0)
+
+
+def preflight_gate(key, settings, signature, estimate_fn):
+    """
+    Show the pre-flight estimate for a job and return True when it may run.
+    The estimate is recomputed only when `signature` (the job's inputs)
+    changes. Over budget, the job is blocked or needs an explicit
+    confirmation, depending on the settings.
+    """
+    if not settings["enabled"]:
+        return True
+    signature = hashlib.sha256(repr((signature, settings)).encode("utf-8")).hexdigest()[:16]
+    state_key = f"preflight_{key}"
+    state = st.session_state.get(state_key)
+    if state is None or state["signature"] != signature:
+        with st.spinner("Estimating tokens and cost..."):
+            try:
+                state = {"signature": signature, "estimate": estimate_fn(), "error": None}
+            except Exception as e:
+                state = {"signature": signature, "estimate": None, "error": str(e)}
+        st.session_state[state_key] = state
+
+    estimate = state["estimate"]
+    if estimate is None:
+        st.warning(f"Could not estimate this job: {state['error']}")
+        exceeded = ["no estimate available"]
+    else:
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Cortex calls", f"{estimate['calls']:,}")
+        c2.metric("Tokens (in + max out)", f"{estimate['total_tokens']:,}")
+        c3.metric("Est. credits", f"{estimate['credits']:,.2f}")
+        c4.metric("Est. runtime", f"{estimate['runtime_seconds'] / 60:,.1f} min")
+        st.caption(
+            f"Input tokens {estimate['input_tokens']:,} ({estimate.get('method', '')}"
+            + (f", {estimate['sampled_rows']:,} sampled rows" if "sampled_rows" in estimate else "")
+            + f"), output tokens up to {estimate['output_tokens']:,}"
+        )
+        exceeded = check_budget(
+            estimate,
+            settings["max_credits"],
+            settings["max_tokens"],
+            settings["max_runtime_seconds"]
+        )
+    if not exceeded:
+        return True
+    if settings["block"]:
+        st.error("Over budget, run blocked: " + "; ".join(exceeded))
+        return False
+    st.warning("Over budget: " + "; ".join(exceeded))
+    return st.checkbox("Run anyway", key=f"{state_key}_confirm_{signature}")
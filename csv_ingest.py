@@ -0,0 +1,169 @@
+import re
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import pandas as pd
+
+# -------------------------------------
+# Streaming CSV ingestion helpers
+# -------------------------------------
+# Files are uploaded to the stage without a full in-memory copy (optionally
+# gzip-compressed through a spooled temporary file) and column names are
+# inferred from a sample chunk only, so peak memory stays bounded by the
+# chunk and spool sizes rather than the file size.
+
+READ_CHUNK_BYTES = 8 * 1024 * 1024
+SAMPLE_ROWS = 1000
+PART_BYTES = 150 * 1024 * 1024
+SPOOL_BYTES = 32 * 1024 * 1024
+
+
+def gzip_to_spool(fileobj, chunk_bytes=READ_CHUNK_BYTES, spool_bytes=SPOOL_BYTES, level=6):
+    """
+    Gzip-compress `fileobj` in `chunk_bytes` pieces into a SpooledTemporaryFile
+    (in memory up to `spool_bytes`, then on local disk), rewound to the start.
+    put_stream hashes the stream and seeks back before uploading, so the
+    compressed data has to be seekable. The caller closes it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    # wbits=31 -> gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    while True:
+        data = fileobj.read(chunk_bytes)
+        if not data:
+            break
+        spool.write(compressor.compress(data))
+    spool.write(compressor.flush())
+    spool.seek(0)
+    return spool
+
+
+def upload_stream(session, fileobj, stage_path, compress=False):
+    """
+    Upload `fileobj` to `stage_path` without copying it into a new buffer.
+    With compress=True the data is gzip-compressed into a spooled temporary
+    file first and ".gz" is appended to the path. Returns the staged path.
+    """
+    fileobj.seek(0)
+    if not compress:
+        session.file.put_stream(fileobj, stage_path, auto_compress=False, overwrite=True)
+        return stage_path
+    stage_path = f"{stage_path}.gz"
+    with gzip_to_spool(fileobj) as stream:
+        session.file.put_stream(stream, stage_path, auto_compress=False, overwrite=True)
+    return stage_path
+
+
+def clean_name(s):
+    s = re.sub(r"[^\w]+", "_", s)       # replace non-alphanum with underscore
+    return re.sub(r'_+', '_', s).strip('_').upper()
+
+
+def process_df(df):
+    """Normalize column names into Snowflake-friendly upper-case identifiers."""
+    df.columns = [clean_name(c) for c in df.columns]
+    return df
+
+
+def read_sample(fileobj, sample_rows=SAMPLE_ROWS, **read_csv_kwargs):
+    """Header plus the first `sample_rows` rows, read with a chunked reader."""
+    fileobj.seek(0)
+    with pd.read_csv(fileobj, chunksize=sample_rows, **read_csv_kwargs) as reader:
+        sample = next(iter(reader), None)
+    fileobj.seek(0)
+    if sample is None:
+        # Header only: no data chunk, but the column names are still needed
+        sample = pd.read_csv(fileobj, nrows=0, **read_csv_kwargs)
+        fileobj.seek(0)
+    return sample
+
+
+# -------------------------------------
+# Split large CSVs into gzip parts and upload in parallel
+# -------------------------------------
+# COPY INTO loads the files under a stage path in parallel, so one big CSV is
+# cut into ~PART_BYTES gzip parts (each repeating the header row). Parts are
+# spooled to temporary files and uploaded from a thread pool; at most
+# `max_workers` parts exist at any time.
+
+
+def iter_gzip_parts(fileobj, part_bytes=PART_BYTES):
+    """
+    Yield (part_no, temp_file) with gzip-compressed CSV parts of about
+    `part_bytes` compressed bytes. Parts are only cut between records, so a
+    quoted field containing newlines is never split.
+    """
+    fileobj.seek(0)
+    header = fileobj.readline()
+    part_no, part, compressor, in_quotes = 0, None, None, False
+    for line in fileobj:
+        if part is None:
+            part = tempfile.TemporaryFile()
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            part.write(compressor.compress(header))
+        part.write(compressor.compress(line))
+        if line.count(b'"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes and part.tell() >= part_bytes:
+            part.write(compressor.flush())
+            yield part_no, part
+            part_no, part = part_no + 1, None
+    if part is not None:
+        part.write(compressor.flush())
+        yield part_no, part
+
+
+def _put_part(session, part, stage_path):
+    try:
+        part.seek(0)
+        session.file.put_stream(part, stage_path, auto_compress=False, overwrite=True)
+        return stage_path
+    finally:
+        part.close()
+
+
+def _put_file(session, fileobj, stage_path, compress):
+    return upload_stream(session, fileobj, stage_path, compress=compress)
+
+
+def upload_files_parallel(session, files, stage_prefix, split_bytes=None,
+                          part_bytes=PART_BYTES, compress=True, max_workers=4,
+                          on_uploaded=None):
+    """
+    Upload `files` (file objects with a `.name`) under `stage_prefix`.
+
+    CSVs larger than `split_bytes` are split into gzip parts; other files are
+    streamed whole (gzip-compressed when `compress`). Uploads run on a pool
+    of `max_workers` threads. Returns the staged paths.
+    """
+    staged = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = set()
+
+        def submit(fn, *args):
+            # Bound the number of parts held in temp files / in flight
+            while len(in_flight) >= max_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    staged.append(future.result())
+                    if on_uploaded:
+                        on_uploaded(staged[-1])
+            in_flight.add(pool.submit(fn, *args))
+
+        for f in files:
+            size = getattr(f, "size", None)
+            is_csv = f.name.lower().endswith(".csv")
+            if split_bytes and is_csv and size is not None and size > split_bytes:
+                stem = f.name[:-len(".csv")]
+                for part_no, part in iter_gzip_parts(f, part_bytes):
+                    submit(_put_part, session, part, f"{stage_prefix}/{stem}_part{part_no:05d}.csv.gz")
+            else:
+                submit(_put_file, session, f, f"{stage_prefix}/{f.name}", compress)
+
+        for future in in_flight:
+            staged.append(future.result())
+            if on_uploaded:
+                on_uploaded(staged[-1])
+    return staged
@@ -2,26 +2,18 @@ import streamlit as st
 from snowflake.snowpark.context import get_active_session
 import pandas as pd
 import json
-import os
-import io
-import re
 import time
+import hashlib
+from csv_ingest import read_sample, upload_files_parallel, clean_name, process_df
+from schema_inference import TYPES, infer_schema, build_create_table_sql
+from table_loader import LOAD_MODES, load_table, preview
+from query_profiler import get_profiled_session
+from app_widgets import query_profiler_panel
 
 # -------------------------------
 # Setup Snowflake session
 # -------------------------------
-session = get_active_session()
-
-def clean_name(s):
-    s = re.sub(r"[^\w]+", "_", s)       # replace non-alphanum with underscore
-    return re.sub(r'_+', '_', s).strip('_').upper()
-
-
-def process_df(df):
-    df.columns = [clean_name(c) for c in df.columns]
-    #df.to_csv(path, index=False)
-    return df
-
+session = get_profiled_session(get_active_session(), st.session_state)
 
     
 # -------------------------------------
@@ -36,6 +28,7 @@ def csv_uploader():
     stage_name_no_at = "core"
     
     stage_name = f"@{stage_name_no_at}"
+    query_profiler_panel(session)
 
     
     # -------------------------
@@ -44,57 +37,154 @@ def csv_uploader():
     st.header("File Upload")
     st.write(f"Upload files to Snowflake App stage {stage_name_no_at}")
 
-    uploaded_file = st.file_uploader("Choose a file")
+    uploaded_files = st.file_uploader("Choose CSV file(s)", accept_multiple_files=True)
+    compress = st.checkbox("Compress (gzip) while uploading", value=True)
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        split_mb = st.number_input("Split CSVs larger than (MB, 0 = never)", min_value=0, value=250)
+    with c2:
+        part_mb = st.number_input("Part size (MB, gzip)", min_value=16, max_value=1024, value=150)
+    with c3:
+        max_workers = st.number_input("Parallel uploads", min_value=1, max_value=16, value=4)
+
+    if uploaded_files:
+        # Same files -> same stage prefix, so a rerun does not upload them again.
+        # file_id is new for every file picked, even with the same name and size.
+        upload_key = hashlib.sha256(
+            repr([f.file_id for f in uploaded_files] + [compress, split_mb, part_mb]).encode("utf-8")
+        ).hexdigest()[:12]
+        upload_prefix = f"upload_{upload_key}"
 
-    if uploaded_file:
         with st.spinner("Staging..."): 
-            file_extension = os.path.splitext(uploaded_file.name)[1].lower()
             try:
-                # Create file stream using BytesIO and upload
-                file_stream = io.BytesIO(uploaded_file.getvalue())
-                session.file.put_stream(
-                    file_stream,
-                    f"{stage_name}/{uploaded_file.name}",
-                    auto_compress=False,
-                    overwrite=True
+                if st.session_state.get("staged_upload_prefix") != upload_prefix:
+                    status = st.empty()
+                    uploaded = []
+
+                    def on_uploaded(path):
+                        uploaded.append(path)
+                        status.caption(f"Uploaded {len(uploaded)} file(s)/part(s), latest: {path}")
+
+                    staged_paths = upload_files_parallel(
+                        session,
+                        uploaded_files,
+                        f"{stage_name}/{upload_prefix}",
+                        split_bytes=split_mb * 1024 * 1024,
+                        part_bytes=part_mb * 1024 * 1024,
+                        compress=compress,
+                        max_workers=max_workers,
+                        on_uploaded=on_uploaded
+                    )
+                    st.session_state.staged_upload_prefix = upload_prefix
+                    st.session_state.staged_upload_paths = staged_paths
+                st.success(
+                    f"{len(st.session_state.staged_upload_paths)} file(s) staged under "
+                    f"{stage_name}/{upload_prefix}/"
                 )
-                st.success(f"File '{uploaded_file.name}' staging Successful")
     
                 try:
-                    uploaded_file_pd = pd.read_csv(uploaded_file)
+                    # Only the header and a sample chunk are read for the table layout
+                    uploaded_file_pd = read_sample(uploaded_files[0], dtype=str)
     
                 except Exception as e:
                     st.warning(f"Error occurred while reading the file: {str(e)}")
+                    return
             except Exception as e:
                 st.error(f"Error occurred while uploading file: {str(e)}")
-        with st.spinner("Cleaning data and creating table..."):
+                st.stop()
+        with st.spinner("Cleaning data and inferring column types..."):
             try:
                 clean_upload_pd = process_df(uploaded_file_pd)
                 st.success("Data cleaning Successful")
-                table_cols = ",\n    ".join([f'"{c}" VARCHAR' for c in clean_upload_pd.columns])
-                create_table_sql = f"CREATE OR REPLACE TABLE INPUT_AI_CLASSIFY_APP (\n    {table_cols}\n);"
-                st.success("CREATE TABLE Successful")
             except Exception as e:
-                st.code(create_table_sql)
-                st.error(f"Failed to write to table: : {str(e)}")
-        with st.spinner("Copying data into table..."):
+                st.error(f"Failed to clean data: {str(e)}")
+                return
+
+        infer_types = st.checkbox("Infer column types (otherwise every column is VARCHAR)", value=True)
+        if infer_types:
+            threshold = st.slider("Type confidence threshold", min_value=0.5, max_value=1.0, value=0.95, step=0.01)
+            schema_df = infer_schema(clean_upload_pd, threshold)
+        else:
+            schema_df = pd.DataFrame({
+                "COLUMN": list(clean_upload_pd.columns),
+                "TYPE": "VARCHAR",
+                "SCALE": pd.Series([None] * len(clean_upload_pd.columns), dtype="Int64"),
+                "FORMAT": None,
+                "CONFIDENCE": 1.0
+            })
+
+        st.markdown("### Column types (review before creating the table)")
+        schema_df = st.data_editor(
+            schema_df,
+            column_config={
+                "TYPE": st.column_config.SelectboxColumn("TYPE", options=TYPES, required=True),
+                "SCALE": st.column_config.NumberColumn("SCALE", help="NUMBER only: digits after the decimal point", min_value=0, max_value=37, step=1),
+                "FORMAT": st.column_config.TextColumn("FORMAT", help="DATE / TIMESTAMP only: Snowflake format, empty = AUTO")
+            },
+            disabled=["COLUMN", "CONFIDENCE"],
+            hide_index=True,
+            key=f"schema_{upload_prefix}"
+        )
+        st.markdown("### Load settings")
+        c1, c2 = st.columns(2)
+        with c1:
+            target_table = clean_name(st.text_input("Target table", value="INPUT_AI_CLASSIFY_APP"))
+        with c2:
+            load_mode = st.selectbox("Load mode", LOAD_MODES)
+        key_cols = []
+        if load_mode == "Merge (upsert on key)":
+            key_cols = st.multiselect("Key column(s)", list(schema_df["COLUMN"]))
+        if load_mode != "Replace":
+            st.caption("Files already loaded into the target table are skipped, so reloading is safe.")
+
+        create_table_sql = build_create_table_sql(target_table, schema_df, replace=(load_mode == "Replace"))
+        st.markdown("### SQL CREATE TABLE TO EXECUTE:")
+        st.code(create_table_sql)
+
+        if not st.button("Approve and load"):
+            return
+        if load_mode == "Merge (upsert on key)" and not key_cols:
+            st.warning("Select at least one key column to merge on.")
+            return
+
+        with st.spinner(f"Loading data into {target_table} ({load_mode})..."):
             try:
-                copy_into_sql = f"""COPY INTO INPUT_AI_CLASSIFY_APP
-                FROM @{stage_name_no_at}/{uploaded_file.name}
-                FILE_FORMAT = (FORMAT_NAME = CSV_FORMAT)
-                ON_ERROR = 'CONTINUE';"""
-                session.sql(copy_into_sql).collect()
-                preview_upload = session.sql("SELECT * FROM INPUT_AI_CLASSIFY_APP").to_pandas()
-                st.success("COPY INTO Successful")
-                st.markdown("### SQL CREATE TABLE EXECUTED:")
-                st.code(create_table_sql)
-                st.markdown("### SQL COPY INTO EXECUTED:")
-                st.code(copy_into_sql)
-                st.markdown("### DATA Preview:")
-                st.dataframe(preview_upload.head())
+                # Typed columns are converted with TRY_TO_*; values that do not convert are counted below
+                stats = load_table(
+                    session,
+                    load_mode,
+                    target_table,
+                    schema_df,
+                    f"@{stage_name_no_at}/{upload_prefix}/",
+                    key_cols=key_cols
+                )
             except Exception as e:
-                st.code(copy_into_sql)
-                st.error(f"Failed to copy into table: : {str(e)}")
+                st.error(f"Failed to load table: {str(e)}")
+                return
+
+        st.success(
+            f"{stats['files_loaded']} file(s) loaded ({stats['rows_loaded']} rows), "
+            f"{stats['files_skipped']} already loaded and skipped, {stats['files_failed']} failed"
+        )
+        if "rows_inserted" in stats:
+            st.write(f"Merge: {stats['rows_inserted']} rows inserted, {stats['rows_updated']} rows updated")
+            if stats["rows_staged"] > stats["rows_loaded"]:
+                st.caption(f"Includes {stats['rows_staged'] - stats['rows_loaded']} staged row(s) left by an earlier load")
+        if stats["null_values"]:
+            st.warning(
+                f"{sum(stats['null_values'].values()):,} non-empty value(s) did not convert to the column type "
+                "and were loaded as NULL. Change those columns to VARCHAR (or fix the format/scale) and reload "
+                "in Replace mode to keep them."
+            )
+            st.dataframe(pd.DataFrame(
+                [{"COLUMN": col, "VALUES_NULLED": n} for col, n in stats["null_values"].items()]
+            ), hide_index=True)
+        if stats["errors_seen"]:
+            st.warning(f"{stats['errors_seen']} row(s) were rejected by COPY (ON_ERROR = CONTINUE)")
+        st.markdown("### SQL EXECUTED:")
+        st.code("\n\n".join(stats["sql"]))
+        st.markdown("### DATA Preview:")
+        st.dataframe(preview(session, target_table))
 
    
 # -------------------------------------
@@ -0,0 +1,136 @@
+import json
+
+from sql_utils import sql_escape
+
+# -------------------------------------
+# PARSE_DOCUMENT SQL builders
+# -------------------------------------
+# Single-file parsing writes one PARSED_<file> table. Batch parsing MERGEs any
+# number of stage files into one PARSED_DOCUMENTS table keyed by relative path,
+# and skips files whose ETag and parse options have not changed.
+
+
+def build_parse_sql(database, schema, stage, filename, options, full_tablename):
+    return f"""
+CREATE OR REPLACE TABLE {full_tablename} AS
+SELECT
+    *,
+        SNOWFLAKE.CORTEX.PARSE_DOCUMENT(
+            '@{database}.{schema}.{stage}',
+            '{filename}',
+            {options}
+            ) AS parsed_text
+FROM DIRECTORY(@{database}.{schema}.{stage})
+WHERE RELATIVE_PATH = '{filename}'
+"""
+
+
+def glob_to_like(pattern):
+    """Shell-style glob (*, ?) -> LIKE pattern with '^' as escape character."""
+    out = []
+    for ch in pattern:
+        if ch == "*":
+            out.append("%")
+        elif ch == "?":
+            out.append("_")
+        elif ch in ("%", "_", "^"):
+            out.append("^" + ch)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def file_filter_sql(glob=None, paths=None, alias="D"):
+    if paths:
+        in_list = ", ".join([f"'{sql_escape(p)}'" for p in paths])
+        return f"{alias}.RELATIVE_PATH IN ({in_list})"
+    if glob:
+        return f"{alias}.RELATIVE_PATH LIKE '{sql_escape(glob_to_like(glob))}' ESCAPE '^'"
+    return "TRUE"
+
+
+def ensure_parsed_documents_table(session, parsed_table):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {parsed_table} (
+            RELATIVE_PATH VARCHAR,
+            ETAG VARCHAR,
+            SIZE NUMBER,
+            LAST_MODIFIED TIMESTAMP_TZ,
+            OPTIONS VARIANT,
+            PARSED_TEXT VARIANT,
+            PARSED_AT TIMESTAMP_LTZ
+        )
+    """).collect()
+
+
+def pending_files_sql(stage_ref, parsed_table, options, file_filter):
+    """Directory rows that are new, changed (ETag) or parsed with other options."""
+    return f"""
+            SELECT D.RELATIVE_PATH, D.ETAG, D.SIZE, D.LAST_MODIFIED
+            FROM DIRECTORY(@{stage_ref}) D
+            LEFT JOIN {parsed_table} P
+                ON P.RELATIVE_PATH = D.RELATIVE_PATH
+               AND P.ETAG = D.ETAG
+               AND P.OPTIONS = PARSE_JSON('{sql_escape(json.dumps(options))}')
+            WHERE P.RELATIVE_PATH IS NULL
+              AND {file_filter}"""
+
+
+def build_batch_parse_merge(stage_ref, parsed_table, options, file_filter):
+    options_json = sql_escape(json.dumps(options))
+    return f"""
+        MERGE INTO {parsed_table} P
+        USING (
+            SELECT
+                F.RELATIVE_PATH,
+                F.ETAG,
+                F.SIZE,
+                F.LAST_MODIFIED,
+                PARSE_JSON('{options_json}') AS OPTIONS,
+                SNOWFLAKE.CORTEX.PARSE_DOCUMENT(
+                    '@{stage_ref}',
+                    F.RELATIVE_PATH,
+                    PARSE_JSON('{options_json}')
+                ) AS PARSED_TEXT
+            FROM ({pending_files_sql(stage_ref, parsed_table, options, file_filter)}
+            ) F
+        ) N
+        ON P.RELATIVE_PATH = N.RELATIVE_PATH
+        WHEN MATCHED THEN UPDATE SET
+            ETAG = N.ETAG,
+            SIZE = N.SIZE,
+            LAST_MODIFIED = N.LAST_MODIFIED,
+            OPTIONS = N.OPTIONS,
+            PARSED_TEXT = N.PARSED_TEXT,
+            PARSED_AT = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT
+            (RELATIVE_PATH, ETAG, SIZE, LAST_MODIFIED, OPTIONS, PARSED_TEXT, PARSED_AT)
+        VALUES
+            (N.RELATIVE_PATH, N.ETAG, N.SIZE, N.LAST_MODIFIED, N.OPTIONS, N.PARSED_TEXT, CURRENT_TIMESTAMP())
+    """
+
+
+def batch_parse(session, stage_ref, parsed_table, options, glob=None, paths=None,
+                refresh_directory=True):
+    """
+    Parse every matching stage file that is not already in `parsed_table`
+    with the same ETag and options, in one MERGE statement.
+    Returns counts of selected, parsed and skipped files.
+    """
+    if refresh_directory:
+        session.sql(f"ALTER STAGE {stage_ref} REFRESH").collect()
+    ensure_parsed_documents_table(session, parsed_table)
+    file_filter = file_filter_sql(glob=glob, paths=paths)
+
+    selected = session.sql(
+        f"SELECT COUNT(*) FROM DIRECTORY(@{stage_ref}) D WHERE {file_filter}"
+    ).collect()[0][0]
+    merge_sql = build_batch_parse_merge(stage_ref, parsed_table, options, file_filter)
+    result = session.sql(merge_sql).collect()
+    parsed = (result[0][0] + result[0][1]) if result else 0
+    return {
+        "sql": merge_sql,
+        "selected": selected,
+        "parsed": parsed,
+        "skipped": selected - parsed,
+    }
@@ -0,0 +1,214 @@
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------
+# Local stand-in for the Snowpark session
+# -------------------------------------
+# Replays recorded results: each statement is matched against a list of
+# (regex, rows) responses, first match wins. Rows may be a list of dicts or a
+# callable(sql, params) returning one. Every call sleeps for the configured
+# latency, and stage uploads/downloads for size / bandwidth, so the helper
+# modules can be benchmarked without an account.
+
+
+class FakeRow(dict):
+    """Row that supports row[0], row["NAME"], list(row) and row.as_dict() like Snowpark's Row."""
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.values())[key]
+        return super().__getitem__(key)
+
+    def __iter__(self):
+        # Snowpark rows are tuples: list(row) gives the values
+        return iter(self.values())
+
+    def as_dict(self):
+        return dict(self.items())
+
+
+class FakeAsyncJob:
+    def __init__(self, future, query_id):
+        self._future = future
+        self.query_id = query_id
+
+    def is_done(self):
+        return self._future.done()
+
+    def result(self):
+        return self._future.result()
+
+
+class FakeDataFrame:
+    def __init__(self, session, sql, params=None):
+        self._session = session
+        self._sql = sql
+        self._params = params
+
+    @property
+    def queries(self):
+        return {"queries": [self._sql]}
+
+    def _submit(self, fn):
+        query_id = uuid.uuid4().hex
+        return FakeAsyncJob(self._session._pool.submit(fn, query_id), query_id)
+
+    def _rows(self, query_id=None):
+        return self._session._execute(self._sql, self._params, query_id)
+
+    def _frame(self, query_id=None):
+        import pandas as pd
+        return pd.DataFrame([r.as_dict() for r in self._rows(query_id)])
+
+    def collect(self, block=True):
+        return self._rows() if block else self._submit(self._rows)
+
+    def collect_nowait(self):
+        return self._submit(self._rows)
+
+    def to_pandas(self, block=True):
+        return self._frame() if block else self._submit(self._frame)
+
+    # Chained builders keep the statement; enough for SELECT ... LIMIT previews
+    def select(self, *args, **kwargs):
+        return self
+
+    def limit(self, n):
+        return FakeDataFrame(self._session, f"{self._sql} LIMIT {int(n)}", self._params)
+
+
+class FakeFileOperation:
+    def __init__(self, session):
+        self._session = session
+        self.files = {}  # stage path -> size (contents are only kept with keep_files)
+
+    def put_stream(self, stream, stage_location, **kwargs):
+        # Like the connector: digest the stream, then rewind it for the upload,
+        # so forward-only streams fail here as they would against Snowflake
+        stream.tell()
+        digest = hashlib.sha256()
+        while True:
+            data = stream.read(8 * 1024 * 1024)
+            if not data:
+                break
+            digest.update(data)
+        stream.seek(0)
+        size = 0
+        kept = io.BytesIO() if self._session.keep_files else None
+        while True:
+            data = stream.read(8 * 1024 * 1024)
+            if not data:
+                break
+            size += len(data)
+            if kept is not None:
+                kept.write(data)
+        self._session._transfer(size)
+        with self._session._lock:
+            self.files[stage_location] = kept.getvalue() if kept is not None else size
+
+    def get_stream(self, stage_location, **kwargs):
+        content = self.files.get(stage_location, 0)
+        if isinstance(content, int):
+            content = b"x" * (content or self._session.default_file_bytes)
+        self._session._transfer(len(content))
+        return io.BytesIO(content)
+
+
+class _QueryRecord:
+    def __init__(self, query_id, sql_text):
+        self.query_id = query_id
+        self.sql_text = sql_text
+        self.thread_id = threading.get_ident()
+
+
+class _QueryHistory:
+    def __init__(self, session):
+        self._session = session
+        self.queries = []
+
+    def __enter__(self):
+        self._session._listeners.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        self._session._listeners.remove(self)
+
+
+class FakeSession:
+    """
+    latency_ms / jitter_ms: delay per statement; bytes_per_sec: stage
+    transfer bandwidth (None = unlimited).
+    """
+
+    def __init__(self, responses=None, latency_ms=0.0, jitter_ms=0.0, bytes_per_sec=None,
+                 keep_files=False, default_file_bytes=1024, max_async=64):
+        self.responses = []
+        for pattern, rows in responses or []:
+            self.add(pattern, rows)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bytes_per_sec = bytes_per_sec
+        self.keep_files = keep_files
+        self.default_file_bytes = default_file_bytes
+        self.log = []
+        self.file = FakeFileOperation(self)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_async)
+        self._calls = 0
+
+    @classmethod
+    def from_recording(cls, path, **kwargs):
+        """Load [{"match": regex, "rows": [...]}, ...] from a JSON file."""
+        with open(path, encoding="utf-8") as f:
+            recording = json.load(f)
+        return cls([(r["match"], r["rows"]) for r in recording], **kwargs)
+
+    def add(self, pattern, rows):
+        self.responses.append((re.compile(pattern, re.IGNORECASE | re.DOTALL), rows))
+
+    def _sleep(self):
+        if not (self.latency_ms or self.jitter_ms):
+            return
+        with self._lock:
+            self._calls += 1
+            # Deterministic jitter: a saw-tooth over consecutive calls
+            offset = (self._calls % 10) / 9 - 0.5 if self.jitter_ms else 0.0
+        time.sleep(max(self.latency_ms + offset * 2 * self.jitter_ms, 0) / 1000)
+
+    def _transfer(self, n_bytes):
+        self._sleep()
+        if self.bytes_per_sec:
+            time.sleep(n_bytes / self.bytes_per_sec)
+
+    def _execute(self, sql, params=None, query_id=None):
+        self._sleep()
+        query_id = query_id or uuid.uuid4().hex
+        with self._lock:
+            self.log.append(sql)
+            for listener in self._listeners:
+                listener.queries.append(_QueryRecord(query_id, sql))
+        for pattern, rows in self.responses:
+            if pattern.search(sql):
+                if callable(rows):
+                    rows = rows(sql, params)
+                return [FakeRow(r) for r in rows]
+        return []
+
+    def sql(self, query, params=None):
+        return FakeDataFrame(self, query, params)
+
+    def table(self, name):
+        return FakeDataFrame(self, f"SELECT * FROM {name}")
+
+    def query_history(self):
+        return _QueryHistory(self)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
@@ -1,15 +1,27 @@
 import os
-import io
-import pandas as pd
 import streamlit as st
 from snowflake.snowpark.context import get_active_session
+from csv_ingest import read_sample, upload_files_parallel
+from stage_browser import (
+    SORT_KEYS, get_listing, invalidate_listing, files_under, browse, sort_files, page, parent_prefix
+)
+from stage_download import (
+    MAX_DOWNLOAD_BYTES, download_to_spool, download_data, build_zip, file_size, presigned_url, stage_archive
+)
+from sql_utils import sql_escape
+from presigned_urls import get_url_cache, bulk_presigned_urls, refresh_directory, urls_to_json
+from app_widgets import query_profiler_panel
+from query_profiler import get_profiled_session
 
 # -------------------------------------
 # Get Snowflake session
 # -------------------------------------
-session = get_active_session()
-sessh = session.sql("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()").collect()
-st.markdown(sessh)
+session = get_profiled_session(get_active_session(), st.session_state)
+
+# Current database / schema: queried once per session, not on every rerun
+if "current_context" not in st.session_state:
+    st.session_state.current_context = session.sql("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()").collect()
+st.markdown(st.session_state.current_context)
 # -------------------------------------
 # Constants and settings
 # -------------------------------------
@@ -22,27 +34,105 @@ PREVIEWABLE_EXTENSIONS = ['.csv', '.txt', '.tsv']
 def ensure_stage_exists(stage_name_no_at: str):
     """
     Creates a stage if it doesn't exist. Does nothing if it already exists.
+    The outcome is remembered in st.session_state, so reruns issue no SQL.
     """
-    # try:
-    #     # Check if stage exists
-    #     session.sql(f"DESC STAGE {stage_name_no_at}").collect()
-    # except:
-        # Create stage if it doesn't exist
+    ensured = st.session_state.setdefault("ensured_stages", set())
+    if stage_name_no_at in ensured:
+        return
     try:
+        # Look the stage up first so an existing stage costs no DDL at all
+        schema_ref, _, name = stage_name_no_at.rpartition(".")
+        name = name.strip('"')
+        show_sql = f"SHOW STAGES LIKE '{sql_escape(name)}'"
+        if schema_ref:
+            show_sql += f" IN SCHEMA {schema_ref}"
+        # LIKE treats _ and % as wildcards: MY_STAGE also matches MYXSTAGE
+        if any(row["name"].upper() == name.upper() for row in session.sql(show_sql).collect()):
+            ensured.add(stage_name_no_at)
+            return
+
+        # IF NOT EXISTS: never replaces (and empties) a stage created meanwhile
         session.sql(f"""
-            CREATE OR REPLACE STAGE {stage_name_no_at}
+            CREATE STAGE IF NOT EXISTS {stage_name_no_at}
             ENCRYPTION = (TYPE = 'SNOWFLAKE_SSE')
+            DIRECTORY = (ENABLE = TRUE)
         """).collect()
+        ensured.add(stage_name_no_at)
         st.sidebar.success(f"Stage @{stage_name_no_at} has been created.")
     except Exception as e:
         st.sidebar.error(f"Failed to create stage: {str(e)}")
         st.stop()
 
+# -------------------------------------
+# Stage file browser
+# -------------------------------------
+def stage_file_browser(files, key, page_size=50, multi=False):
+    """
+    Browse a cached stage listing (see stage_browser.get_listing) one folder
+    and one page at a time. Returns the selected path, or a list of paths
+    with multi=True. The current folder is kept in
+    st.session_state[f"browser_{key}"]["prefix"]; a new "nav" counter on
+    every folder change gives the folder picker a fresh, empty widget.
+    """
+    state_key = f"browser_{key}"
+    state = st.session_state.setdefault(state_key, {"prefix": "", "page": 0, "nav": 0})
+
+    folders, direct = browse(files, state["prefix"])
+    c1, c2, c3 = st.columns([2, 1, 1])
+    with c1:
+        st.caption(f"Folder: /{state['prefix']}  ({len(direct):,} files, {len(folders):,} sub-folders)")
+        if state["prefix"] and st.button("Up one level", key=f"{state_key}_up"):
+            state["prefix"], state["page"], state["nav"] = parent_prefix(state["prefix"]), 0, state["nav"] + 1
+            st.rerun()
+    with c2:
+        sort_by = st.selectbox("Sort by", list(SORT_KEYS), key=f"{state_key}_sort")
+    with c3:
+        descending = st.checkbox("Descending", value=sort_by != "Name", key=f"{state_key}_desc")
+
+    if folders:
+        folder = st.selectbox(
+            "Open folder",
+            sorted(folders),
+            index=None,
+            format_func=lambda f: f"{f[len(state['prefix']):]} ({folders[f]:,} files)",
+            key=f"{state_key}_folder_{state['nav']}"
+        )
+        if folder:
+            state["prefix"], state["page"], state["nav"] = folder, 0, state["nav"] + 1
+            st.rerun()
+
+    direct = sort_files(direct, sort_by, descending)
+    n_pages = max((len(direct) + page_size - 1) // page_size, 1)
+    state["page"] = min(state["page"], n_pages - 1)
+    c1, c2, c3 = st.columns([1, 2, 1])
+    with c1:
+        if st.button("Previous", key=f"{state_key}_prev", disabled=state["page"] == 0):
+            state["page"] -= 1
+    with c3:
+        if st.button("Next", key=f"{state_key}_next", disabled=state["page"] >= n_pages - 1):
+            state["page"] += 1
+    with c2:
+        st.caption(f"Page {state['page'] + 1} of {n_pages}")
+
+    visible = page(direct, state["page"], page_size)
+    if not visible:
+        st.info("No files in this folder.")
+        return [] if multi else None
+    st.dataframe(
+        [{"path": f["path"], "size": f["size"], "last_modified": f["last_modified"]} for f in visible],
+        hide_index=True
+    )
+    paths = [f["path"] for f in visible]
+    if multi:
+        return st.multiselect("Select files", paths, key=f"{state_key}_select_{state['prefix']}_{state['page']}")
+    return st.selectbox("Select a file", paths, key=f"{state_key}_select_{state['prefix']}_{state['page']}")
+
 # -------------------------------------
 # Main Streamlit app
 # -------------------------------------
 def main():
     st.title("Snowflake File Management App")
+    query_profiler_panel(session)
 
     # -------------------------
     # Stage settings
@@ -57,6 +147,20 @@ def main():
     # Create stage if it doesn't exist
     ensure_stage_exists(stage_name_no_at)
 
+    # Stage listing: one cached LIST shared by the URL and download tabs
+    pattern = st.sidebar.text_input(
+        "Filter files (regular expression, e.g. .*\\.csv)",
+        "",
+        help="Passed to LIST ... PATTERN; matched against the full stage path"
+    )
+    refresh_listing = st.sidebar.button("Refresh file list")
+    try:
+        stage_listing = get_listing(session, st.session_state, stage_name, pattern, refresh=refresh_listing)
+    except Exception as e:
+        st.sidebar.error(f"Failed to list stage: {str(e)}")
+        stage_listing = []
+    st.sidebar.caption(f"{len(stage_listing):,} file(s) in {stage_name}")
+
     # -------------------------
     # Create tabs
     # -------------------------
@@ -73,39 +177,53 @@ def main():
         st.header("File Upload")
         st.write("Upload files to Snowflake stage.")
 
-        uploaded_file = st.file_uploader("Choose a file")
+        uploaded_files = st.file_uploader("Choose file(s)", accept_multiple_files=True)
+        c1, c2 = st.columns(2)
+        with c1:
+            compress = st.checkbox("Compress (gzip) while uploading", value=False)
+        with c2:
+            max_workers = st.number_input("Parallel uploads", min_value=1, max_value=16, value=4)
 
-        if uploaded_file:
-            file_extension = os.path.splitext(uploaded_file.name)[1].lower()
+        if uploaded_files:
             try:
-                # Create file stream using BytesIO and upload
-                file_stream = io.BytesIO(uploaded_file.getvalue())
-                session.file.put_stream(
-                    file_stream,
-                    f"{stage_name}/{uploaded_file.name}",
-                    auto_compress=False,
-                    overwrite=True
-                )
-                st.success(f"File '{uploaded_file.name}' has been uploaded successfully!")
+                # Upload all files concurrently, streaming each one. The same
+                # selection is not uploaded again on a rerun, so the cached
+                # listing only goes stale after a real upload. file_id is new
+                # for every file the user picks, even with the same name and size.
+                upload_key = (stage_name, compress, tuple(f.file_id for f in uploaded_files))
+                if st.session_state.get("staged_upload_key") != upload_key:
+                    st.session_state.staged_paths = upload_files_parallel(
+                        session,
+                        uploaded_files,
+                        stage_name,
+                        compress=compress,
+                        max_workers=max_workers
+                    )
+                    st.session_state.staged_upload_key = upload_key
+                    invalidate_listing(st.session_state, stage_name)
+                st.success(f"{len(st.session_state.staged_paths)} file(s) have been uploaded successfully!")
 
-                # Preview uploaded file
-                if file_extension in PREVIEWABLE_EXTENSIONS:
+                # Preview the first previewable file
+                uploaded_file = next(
+                    (f for f in uploaded_files
+                     if os.path.splitext(f.name)[1].lower() in PREVIEWABLE_EXTENSIONS),
+                    None
+                )
+                if uploaded_file is not None:
+                    file_extension = os.path.splitext(uploaded_file.name)[1].lower()
                     try:
-                        uploaded_file.seek(0)
                         if file_extension == '.csv':
                             try:
-                                df_preview = pd.read_csv(uploaded_file)
+                                df_preview = read_sample(uploaded_file, sample_rows=5)
                             except UnicodeDecodeError:
-                                uploaded_file.seek(0)
-                                df_preview = pd.read_csv(uploaded_file, encoding='shift-jis')
+                                df_preview = read_sample(uploaded_file, sample_rows=5, encoding='shift-jis')
                         else:  # .txt, .tsv, etc.
                             try:
-                                df_preview = pd.read_csv(uploaded_file, sep='\t')
+                                df_preview = read_sample(uploaded_file, sample_rows=5, sep='\t')
                             except UnicodeDecodeError:
-                                uploaded_file.seek(0)
-                                df_preview = pd.read_csv(uploaded_file, sep='\t', encoding='shift-jis')
+                                df_preview = read_sample(uploaded_file, sample_rows=5, sep='\t', encoding='shift-jis')
 
-                        st.write("Preview of uploaded data:")
+                        st.write(f"Preview of {uploaded_file.name}:")
                         st.dataframe(df_preview.head())
                     except Exception as e:
                         st.warning(f"Error occurred while displaying preview: {str(e)}")
@@ -119,46 +237,101 @@ def main():
         st.header("Generate Presigned URL")
         st.write("Generate presigned URLs for files in the stage.")
 
-        # Get list of files in stage
-        stage_files = session.sql(f"LIST {stage_name}").collect()
-        if stage_files:
-            file_names = [
-                row['name'].split('/', 1)[1] if '/' in row['name'] else row['name']
-                for row in stage_files
-            ]
-
-            with st.form("url_generation_form"):
-                selected_file = st.selectbox(
-                    "Select a file to generate URL",
-                    file_names
-                )
-                expiration_days = st.slider(
-                    "Select expiration period (days)",
-                    min_value=1,
-                    max_value=7,
-                    value=1,
-                    help="Choose between 1 to 7 days"
+        if stage_listing:
+            url_mode = st.radio("Generate for", ["Single file", "Many files (bulk)"], horizontal=True)
+
+            if url_mode == "Single file":
+                selected_file = stage_file_browser(stage_listing, key="url")
+
+                with st.form("url_generation_form"):
+                    st.write(f"File: {selected_file or '-'}")
+                    expiration_days = st.slider(
+                        "Select expiration period (days)",
+                        min_value=1,
+                        max_value=7,
+                        value=1,
+                        help="Choose between 1 to 7 days"
+                    )
+
+                    submitted = st.form_submit_button("Generate URL")
+                    if submitted and selected_file:
+                        try:
+                            expiration_seconds = expiration_days * 24 * 60 * 60
+                            url_statement = f"""
+                                SELECT GET_PRESIGNED_URL(
+                                    '@{stage_name_no_at}',
+                                    '{selected_file}',
+                                    {expiration_seconds}
+                                )
+                            """
+                            result = session.sql(url_statement).collect()
+                            signed_url = result[0][0]
+
+                            st.success("URL generated successfully!")
+                            st.write(f"Presigned URL (valid for {expiration_days} days):")
+                            st.code(signed_url)
+                        except Exception as e:
+                            st.error(f"An error occurred: {str(e)}")
+            else:
+                url_cache = get_url_cache(st.session_state)
+                bulk_files = stage_file_browser(stage_listing, key="url_bulk", multi=True)
+                prefix = st.session_state["browser_url_bulk"]["prefix"]
+                whole_folder = st.checkbox(
+                    f"All files under /{prefix} (including sub-folders)",
+                    value=not bulk_files,
+                    key="url_whole_folder"
                 )
+                url_paths = [f["path"] for f in files_under(stage_listing, prefix)] if whole_folder else bulk_files
+                c1, c2 = st.columns(2)
+                with c1:
+                    bulk_days = st.slider("Expiration period (days)", min_value=1, max_value=7, value=1, key="bulk_days")
+                with c2:
+                    refresh_dir = st.checkbox(
+                        "Refresh directory table first",
+                        value=False,
+                        help="Needed when files were PUT since the last refresh; otherwise they are not in DIRECTORY()"
+                    )
+                st.caption(f"{len(url_paths):,} file(s) selected; {len(url_cache):,} URL(s) cached in this session")
 
-                submitted = st.form_submit_button("Generate URL")
-                if submitted:
+                if st.button("Generate URLs", disabled=not url_paths):
                     try:
-                        expiration_seconds = expiration_days * 24 * 60 * 60
-                        url_statement = f"""
-                            SELECT GET_PRESIGNED_URL(
-                                '@{stage_name_no_at}',
-                                '{selected_file}',
-                                {expiration_seconds}
+                        if refresh_dir:
+                            refresh_directory(session, stage_name)
+                        urls_df, queried = bulk_presigned_urls(
+                            session, url_cache, stage_name, url_paths, bulk_days * 24 * 60 * 60,
+                            prefix=prefix if whole_folder else None
+                        )
+                        st.session_state.presigned_urls = urls_df
+                        st.success(
+                            f"{len(urls_df):,} URL(s): {int(urls_df['FROM_CACHE'].sum()):,} from cache, "
+                            f"{queried:,} generated in one statement"
+                        )
+                        if len(urls_df) < len(url_paths):
+                            st.warning(
+                                f"{len(url_paths) - len(urls_df):,} file(s) are not in the directory table yet; "
+                                "refresh it and try again (the stage needs DIRECTORY = (ENABLE = TRUE))."
                             )
-                        """
-                        result = session.sql(url_statement).collect()
-                        signed_url = result[0][0]
-
-                        st.success("URL generated successfully!")
-                        st.write(f"Presigned URL (valid for {expiration_days} days):")
-                        st.code(signed_url)
                     except Exception as e:
                         st.error(f"An error occurred: {str(e)}")
+
+                if "presigned_urls" in st.session_state:
+                    urls_df = st.session_state.presigned_urls
+                    st.dataframe(urls_df, hide_index=True)
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        st.download_button(
+                            "Export CSV",
+                            urls_df.drop(columns=["FROM_CACHE"]).to_csv(index=False),
+                            file_name="presigned_urls.csv",
+                            mime="text/csv"
+                        )
+                    with c2:
+                        st.download_button(
+                            "Export JSON",
+                            urls_to_json(urls_df),
+                            file_name="presigned_urls.json",
+                            mime="application/json"
+                        )
         else:
             st.warning("No files found in stage.")
 
@@ -169,30 +342,86 @@ def main():
         st.header("File Download")
         st.write("Download files from stage.")
 
-        # Get list of files in stage
-        stage_files = session.sql(f"LIST {stage_name}").collect()
-        if stage_files:
-            file_names = [
-                row['name'].split('/', 1)[1] if '/' in row['name'] else row['name']
-                for row in stage_files
-            ]
-            selected_file = st.selectbox(
-                "Select a file to download",
-                file_names
-            )
-
-            if st.button("Download"):
-                try:
-                    with session.file.get_stream(f"{stage_name}/{selected_file}") as file_stream:
-                        file_content = file_stream.read()
-                        st.download_button(
-                            label="Download File",
-                            data=file_content,
-                            file_name=selected_file,
-                            mime="application/octet-stream"
+        if stage_listing:
+            download_mode = st.radio("Download", ["Single file", "Zip export"], horizontal=True)
+
+            if download_mode == "Single file":
+                selected_file = stage_file_browser(stage_listing, key="download")
+
+                if st.button("Download", disabled=not selected_file):
+                    try:
+                        file_size_bytes = next(f["size"] for f in stage_listing if f["path"] == selected_file)
+                        if file_size_bytes > MAX_DOWNLOAD_BYTES:
+                            # Too large to hold in memory for download_button: serve it from the stage
+                            st.warning(
+                                f"{file_size_bytes / (1024 * 1024):,.0f} MB is over the "
+                                f"{MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB in-app download limit; "
+                                "use this link (valid for one hour) instead."
+                            )
+                            st.code(presigned_url(session, stage_name, selected_file))
+                        else:
+                            # Read in bounded chunks into a spooled temp file instead of one read()
+                            file_content = download_data(download_to_spool(session, f"{stage_name}/{selected_file}"))
+                            st.download_button(
+                                label="Download File",
+                                data=file_content,
+                                file_name=os.path.basename(selected_file),
+                                mime="application/octet-stream"
+                            )
+                    except Exception as e:
+                        st.error(f"An error occurred: {str(e)}")
+            else:
+                selected_files = stage_file_browser(stage_listing, key="zip", multi=True)
+                prefix = st.session_state["browser_zip"]["prefix"]
+                whole_folder = st.checkbox(
+                    f"Export everything under /{prefix} (including sub-folders)",
+                    value=not selected_files
+                )
+                export_files = files_under(stage_listing, prefix) if whole_folder else [
+                    f for f in stage_listing if f["path"] in set(selected_files)
+                ]
+                total_mb = sum(f["size"] for f in export_files) / (1024 * 1024)
+                st.caption(f"{len(export_files):,} file(s), {total_mb:,.1f} MB before compression")
+                zip_workers = st.number_input("Parallel downloads", min_value=1, max_value=16, value=4)
+
+                if st.button("Build zip", disabled=not export_files):
+                    bar = st.progress(0.0)
+                    status = st.empty()
+
+                    def on_file(path, done, total):
+                        bar.progress(done / total)
+                        status.caption(f"{done}/{total} added, latest: {path}")
+
+                    try:
+                        # The archive is built in a temporary file on local disk
+                        archive = build_zip(
+                            session,
+                            stage_name,
+                            [f["path"] for f in export_files],
+                            max_workers=zip_workers,
+                            on_file=on_file
                         )
-                except Exception as e:
-                    st.error(f"An error occurred: {str(e)}")
+                        zip_name = (prefix.rstrip("/").replace("/", "_") or stage_name_no_at) + ".zip"
+                        archive_bytes = file_size(archive)
+                        if archive_bytes > MAX_DOWNLOAD_BYTES:
+                            # Too large to hold in memory for download_button: PUT it back to the stage
+                            zip_path = stage_archive(session, archive, stage_name, zip_name)
+                            invalidate_listing(st.session_state, stage_name)
+                            st.warning(
+                                f"The archive is {archive_bytes / (1024 * 1024):,.0f} MB, over the "
+                                f"{MAX_DOWNLOAD_BYTES // (1024 * 1024)} MB in-app download limit. It was saved "
+                                f"to {stage_name}/{zip_path}; use this link (valid for one hour) to download it."
+                            )
+                            st.code(presigned_url(session, stage_name, zip_path))
+                        else:
+                            st.download_button(
+                                label=f"Download {zip_name}",
+                                data=download_data(archive),
+                                file_name=zip_name,
+                                mime="application/zip"
+                            )
+                    except Exception as e:
+                        st.error(f"An error occurred: {str(e)}")
         else:
             st.warning("No files found in stage.")
 
@@ -0,0 +1,82 @@
+from sql_utils import q
+from ttl_cache import TTLCache
+
+# -------------------------------------
+# Shared metadata catalog for the database / schema / table / column pickers
+# -------------------------------------
+# Each level is only queried when the caller asks for it (i.e. once the parent
+# level has been selected) and the result is kept per Streamlit session, so a
+# widget rerun costs no SHOW round-trips until the TTL runs out.
+
+
+class MetadataCatalog:
+    """
+    Lazily loads and caches SHOW results for one Snowpark session.
+    """
+
+    def __init__(self, session, ttl=300, maxsize=256):
+        self.session = session
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def _names(self, key, sql, field="name"):
+        return self.cache.get_or_load(
+            key,
+            lambda: [row[field] for row in self.session.sql(sql).collect()]
+        )
+
+    def databases(self):
+        return self._names(("databases",), "SHOW DATABASES")
+
+    def schemas(self, database):
+        return self._names(("schemas", database), f"SHOW SCHEMAS IN {q(database)}")
+
+    def tables(self, database, schema):
+        return self._names(
+            ("tables", database, schema),
+            f"SHOW TABLES IN {q(database)}.{q(schema)}"
+        )
+
+    def columns(self, database, schema, table):
+        return self._names(
+            ("columns", database, schema, table),
+            f"SHOW COLUMNS IN {q(database)}.{q(schema)}.{q(table)}",
+            field="column_name"
+        )
+
+    def stages(self, database, schema):
+        return self._names(
+            ("stages", database, schema),
+            f"SHOW STAGES IN {q(database)}.{q(schema)}"
+        )
+
+    def stage_files(self, database, schema, stage):
+        return self._names(
+            ("stage_files", database, schema, stage),
+            f"ls @{q(database)}.{q(schema)}.{q(stage)}"
+        )
+
+    def models(self):
+        return self._names(("models",), "SHOW MODELS IN ACCOUNT")
+
+    def refresh(self, level=None):
+        """
+        Forget cached metadata. With `level` (e.g. "tables") only that level
+        is dropped; otherwise everything is reloaded on next access.
+        """
+        if level is None:
+            self.cache.invalidate()
+        else:
+            self.cache.invalidate(lambda key: key[0] == level)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def get_catalog(session, state, key="metadata_catalog", ttl=300, maxsize=256):
+    """
+    Return the catalog kept in `state` (normally st.session_state), creating
+    it on first use.
+    """
+    if key not in state:
+        state[key] = MetadataCatalog(session, ttl=ttl, maxsize=maxsize)
+    return state[key]
@@ -0,0 +1,132 @@
+import hashlib
+import json
+
+from sql_utils import sql_escape
+
+# -------------------------------------
+# Persistent PARSE_DOCUMENT cache keyed by stage file checksum + options
+# -------------------------------------
+# The file key is the MD5 (or ETag) from the stage directory table, so an
+# unchanged PDF parsed with the same options never goes through
+# PARSE_DOCUMENT twice. The directory is refreshed for the file first, so a
+# file overwritten in place does not keep its old checksum. Entries are
+# evicted by age and by total text size, except those used in the last
+# IN_USE_MINUTES (another session may still be reading them) and the keys the
+# caller is reading.
+
+IN_USE_MINUTES = 60
+
+
+def options_hash(options):
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def ensure_parse_cache_table(session, cache_table):
+    session.sql(f"""
+        CREATE TABLE IF NOT EXISTS {cache_table} (
+            FILE_KEY VARCHAR,
+            OPTIONS_HASH VARCHAR,
+            RELATIVE_PATH VARCHAR,
+            PARSED_TEXT VARIANT,
+            TEXT_BYTES NUMBER,
+            CREATED_AT TIMESTAMP_LTZ,
+            LAST_USED_AT TIMESTAMP_LTZ
+        )
+    """).collect()
+
+
+def stage_file_key(session, stage_ref, relative_path, refresh=True):
+    """
+    MD5 of the staged file (ETag, then size + last modified time when not
+    available), or None. With refresh=True the directory table is refreshed
+    for this path first.
+    """
+    if refresh:
+        session.sql(f"ALTER STAGE {stage_ref} REFRESH SUBPATH = '{sql_escape(relative_path)}'").collect()
+    rows = session.sql(
+        f"""
+        SELECT COALESCE(MD5, ETAG, SIZE || ':' || TO_VARCHAR(LAST_MODIFIED))
+        FROM DIRECTORY(@{stage_ref})
+        WHERE RELATIVE_PATH = ?
+        """,
+        params=[relative_path]
+    ).collect()
+    return rows[0][0] if rows else None
+
+
+def lookup(session, cache_table, file_key, options):
+    """
+    True when the file is cached with these options. The parsed text stays
+    in the cache table; LAST_USED_AT is touched on a hit.
+    """
+    key_params = [file_key, options_hash(options)]
+    rows = session.sql(
+        f"SELECT 1 FROM {cache_table} WHERE FILE_KEY = ? AND OPTIONS_HASH = ? LIMIT 1",
+        params=key_params
+    ).collect()
+    if not rows:
+        return False
+    session.sql(
+        f"UPDATE {cache_table} SET LAST_USED_AT = CURRENT_TIMESTAMP() WHERE FILE_KEY = ? AND OPTIONS_HASH = ?",
+        params=key_params
+    ).collect()
+    return True
+
+
+def source(cache_table, file_key, options):
+    """Parsed source (see complete_engine) pointing at a cache entry."""
+    return {
+        "table": cache_table,
+        "where": (
+            f"FILE_KEY = '{sql_escape(file_key)}'"
+            f" AND OPTIONS_HASH = '{options_hash(options)}'"
+        ),
+    }
+
+
+def store(session, cache_table, file_key, options, relative_path, parsed_table):
+    """Copy the parsed_text column of a freshly parsed table into the cache."""
+    session.sql(
+        f"""
+        INSERT INTO {cache_table}
+        SELECT ?, ?, ?, parsed_text, LENGTH(TO_VARCHAR(parsed_text)),
+               CURRENT_TIMESTAMP(), CURRENT_TIMESTAMP()
+        FROM {parsed_table}
+        LIMIT 1
+        """,
+        params=[file_key, options_hash(options), relative_path]
+    ).collect()
+
+
+def _not_protected_sql(keep, in_use_minutes, alias=""):
+    p = f"{alias}." if alias else ""
+    protected = [f"{p}LAST_USED_AT >= DATEADD(minute, -{int(in_use_minutes)}, CURRENT_TIMESTAMP())"]
+    protected += [
+        f"({p}FILE_KEY = '{sql_escape(file_key)}' AND {p}OPTIONS_HASH = '{options_hash(options)}')"
+        for file_key, options in keep or []
+    ]
+    return f"NOT ({' OR '.join(protected)})"
+
+
+def evict(session, cache_table, max_age_days, max_bytes, keep=None, in_use_minutes=IN_USE_MINUTES):
+    """
+    Drop entries older than `max_age_days`, then least recently used ones
+    above `max_bytes`. Entries used in the last `in_use_minutes` and the
+    (file_key, options) pairs in `keep` are never dropped.
+    """
+    session.sql(f"""
+        DELETE FROM {cache_table}
+        WHERE CREATED_AT < DATEADD(day, -{int(max_age_days)}, CURRENT_TIMESTAMP())
+          AND {_not_protected_sql(keep, in_use_minutes)}
+    """).collect()
+    session.sql(f"""
+        DELETE FROM {cache_table} C
+        USING (
+            SELECT FILE_KEY, OPTIONS_HASH
+            FROM {cache_table}
+            QUALIFY SUM(TEXT_BYTES) OVER (ORDER BY LAST_USED_AT DESC, CREATED_AT DESC
+                                          ROWS UNBOUNDED PRECEDING) > {int(max_bytes)}
+        ) X
+        WHERE C.FILE_KEY = X.FILE_KEY AND C.OPTIONS_HASH = X.OPTIONS_HASH
+          AND {_not_protected_sql(keep, in_use_minutes, "C")}
+    """).collect()
@@ -0,0 +1,111 @@
+import json
+import time
+
+import pandas as pd
+
+from ttl_cache import TTLCache
+
+# -------------------------------------
+# Bulk presigned URLs with expiry-aware caching
+# -------------------------------------
+# URLs for many files are generated by one set-based query over the stage's
+# directory table: selected files are bound as an IN list, a whole folder is
+# matched with one bound LIKE prefix. Each URL is kept in the session until
+# REFRESH_MARGIN before it expires, so asking again for the same files (and
+# expiry) only queries the ones that are missing or about to expire.
+
+# Cached URLs are dropped this long before their real expiry (10% of the
+# lifetime, at most one hour)
+REFRESH_MARGIN_SECONDS = 3600
+
+
+def _cache_ttl(expiration_seconds):
+    return expiration_seconds - min(REFRESH_MARGIN_SECONDS, expiration_seconds // 10)
+
+
+def like_prefix(prefix):
+    """LIKE pattern (escape character '^') matching every path under `prefix`."""
+    escaped = "".join(["^" + ch if ch in ("%", "_", "^") else ch for ch in prefix])
+    return f"{escaped}%"
+
+
+def presigned_urls_sql(stage_name, expiration_seconds, n_paths=None):
+    """
+    Binds `n_paths` relative paths, or with n_paths=None one LIKE pattern
+    (see like_prefix).
+    """
+    if n_paths is None:
+        predicate = "D.RELATIVE_PATH LIKE ? ESCAPE '^'"
+    else:
+        predicate = f"D.RELATIVE_PATH IN ({', '.join(['?'] * int(n_paths))})"
+    return f"""
+        SELECT
+            D.RELATIVE_PATH,
+            D.SIZE,
+            GET_PRESIGNED_URL({stage_name}, D.RELATIVE_PATH, {int(expiration_seconds)}) AS PRESIGNED_URL
+        FROM DIRECTORY({stage_name}) D
+        WHERE {predicate}
+    """
+
+
+def refresh_directory(session, stage_name):
+    """Sync the directory table with files PUT since the last refresh."""
+    session.sql(f"ALTER STAGE {stage_name[1:]} REFRESH").collect()
+
+
+def get_url_cache(state, key="presigned_url_cache", maxsize=20000):
+    cache = state.get(key)
+    if cache is None:
+        cache = TTLCache(maxsize=maxsize)
+        state[key] = cache
+    return cache
+
+
+def bulk_presigned_urls(session, cache, stage_name, paths, expiration_seconds, prefix=None):
+    """
+    Presigned URLs for `paths` (relative to `stage_name`, which includes the
+    '@'). With `prefix`, `paths` are the files known to be under it: when
+    any of them is not cached, the prefix is queried with a LIKE predicate
+    instead of an IN list, and only the rows for `paths` are kept (the
+    folder may hold files the listing filtered out). Returns (DataFrame with
+    RELATIVE_PATH, SIZE, PRESIGNED_URL, EXPIRES_AT, FROM_CACHE; number of
+    URLs generated by the query).
+    """
+    rows, missing, queried = [], [], 0
+    for path in paths:
+        cached = cache.get((stage_name, path, expiration_seconds))
+        if cached is None:
+            missing.append(path)
+        else:
+            rows.append({**cached, "FROM_CACHE": True})
+
+    if missing:
+        issued_at = time.time()
+        expires_at = pd.Timestamp(issued_at + expiration_seconds, unit="s", tz="UTC")
+        if prefix is None:
+            sql, params = presigned_urls_sql(stage_name, expiration_seconds, len(missing)), missing
+        else:
+            sql, params = presigned_urls_sql(stage_name, expiration_seconds), [like_prefix(prefix)]
+            # The query returns the whole folder, cached files included
+            rows = []
+        wanted = set(paths)
+        result = [r for r in session.sql(sql, params=params).collect() if r["RELATIVE_PATH"] in wanted]
+        queried = len(result)
+        for r in result:
+            entry = {
+                "RELATIVE_PATH": r["RELATIVE_PATH"],
+                "SIZE": r["SIZE"],
+                "PRESIGNED_URL": r["PRESIGNED_URL"],
+                "EXPIRES_AT": expires_at,
+            }
+            cache.put((stage_name, entry["RELATIVE_PATH"], expiration_seconds), entry, ttl=_cache_ttl(expiration_seconds))
+            rows.append({**entry, "FROM_CACHE": False})
+
+    columns = ["RELATIVE_PATH", "SIZE", "PRESIGNED_URL", "EXPIRES_AT", "FROM_CACHE"]
+    df = pd.DataFrame(rows, columns=columns).sort_values("RELATIVE_PATH", ignore_index=True)
+    return df, queried
+
+
+def urls_to_json(df):
+    records = df.drop(columns=["FROM_CACHE"]).assign(EXPIRES_AT=df["EXPIRES_AT"].astype(str))
+    return json.dumps(records.to_dict(orient="records"), indent=2)
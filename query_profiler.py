@@ -0,0 +1,257 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+
+# -------------------------------------
+# Query instrumentation for the Snowpark session
+# -------------------------------------
+# ProfiledSession wraps the active session: every DataFrame it hands out
+# (session.sql / session.table and anything chained off them) records client
+# wall time, query ID, rows returned and an approximate result size when it is
+# collected. The records live in a QueryProfiler kept in st.session_state and
+# can be enriched with compile / execution time and an estimated warehouse
+# cost from INFORMATION_SCHEMA.QUERY_HISTORY.
+
+# Functions worth calling out in the profile, matched in the SQL text
+HOT_FUNCTIONS = [
+    "AI_CLASSIFY", "AI_COMPLETE", "TRY_COMPLETE", "COMPLETE", "PARSE_DOCUMENT",
+    "SPLIT_TEXT_RECURSIVE_CHARACTER", "COUNT_TOKENS", "GET_PRESIGNED_URL",
+]
+HOT_FUNCTIONS_RE = re.compile(r"\b(" + "|".join(HOT_FUNCTIONS) + r")\s*\(", re.IGNORECASE)
+
+# Standard warehouse credits per hour, used for the cost estimate
+WAREHOUSE_CREDITS_PER_HOUR = {
+    "X-Small": 1, "Small": 2, "Medium": 4, "Large": 8, "X-Large": 16,
+    "2X-Large": 32, "3X-Large": 64, "4X-Large": 128, "5X-Large": 256, "6X-Large": 512,
+}
+
+
+def query_label(sql):
+    """First keyword plus any Cortex / stage functions, e.g. 'SELECT AI_CLASSIFY'."""
+    words = re.sub(r"--[^\n]*|/\*.*?\*/", " ", sql or "", flags=re.DOTALL).split()
+    keyword = words[0].upper() if words else "?"
+    functions = []
+    for name in HOT_FUNCTIONS_RE.findall(sql or ""):
+        if name.upper() not in functions:
+            functions.append(name.upper())
+    return " ".join([keyword] + functions)
+
+
+def _own_query_id(queries):
+    """
+    ID of the last statement this thread ran among query_history() records.
+    The listener is session-wide, so with worker threads it also sees their
+    statements; records carry thread_id on recent Snowpark versions.
+    """
+    thread_id = threading.get_ident()
+    for query in reversed(queries):
+        if getattr(query, "is_describe", False):
+            continue
+        if getattr(query, "thread_id", thread_id) == thread_id:
+            return query.query_id
+    return None
+
+
+def _approx_bytes(result):
+    if hasattr(result, "memory_usage"):
+        return int(result.memory_usage(deep=True).sum())
+    return sum(len(str(value)) for row in result for value in row)
+
+
+class QueryProfiler:
+    """Bounded log of query records; `records()` returns them oldest first."""
+
+    def __init__(self, maxlen=500):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self):
+        """Totals per label, slowest first."""
+        totals = {}
+        for r in self.records():
+            t = totals.setdefault(r["label"], {"label": r["label"], "queries": 0, "wall_ms": 0.0, "rows": 0})
+            t["queries"] += 1
+            t["wall_ms"] += r["wall_ms"] or 0.0
+            t["rows"] += r["rows"] or 0
+        return sorted(totals.values(), key=lambda t: t["wall_ms"], reverse=True)
+
+    def enrich(self, session):
+        """
+        Add compile / execution time, bytes scanned and an estimated credit
+        cost from QUERY_HISTORY. Queries from the last 7 days only; `session`
+        should be the raw (unwrapped) session.
+        """
+        pending = {r["query_id"]: r for r in self.records() if r["query_id"] and "execution_ms" not in r}
+        if not pending:
+            return 0
+        rows = session.sql(
+            """
+            SELECT QUERY_ID, COMPILATION_TIME, EXECUTION_TIME, BYTES_SCANNED,
+                   WAREHOUSE_SIZE, CREDITS_USED_CLOUD_SERVICES
+            FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION(RESULT_LIMIT => 10000))
+            WHERE ARRAY_CONTAINS(QUERY_ID::VARIANT, PARSE_JSON(?))
+            """,
+            params=[json.dumps(list(pending))]
+        ).collect()
+        for row in rows:
+            record = pending[row["QUERY_ID"]]
+            record["compile_ms"] = row["COMPILATION_TIME"]
+            record["execution_ms"] = row["EXECUTION_TIME"]
+            record["bytes_scanned"] = row["BYTES_SCANNED"]
+            record["warehouse_size"] = row["WAREHOUSE_SIZE"]
+            # Upper bound: assumes the query had the warehouse to itself
+            per_hour = WAREHOUSE_CREDITS_PER_HOUR.get(row["WAREHOUSE_SIZE"] or "", 0)
+            record["est_credits"] = round(
+                (row["EXECUTION_TIME"] or 0) / 3_600_000 * per_hour + float(row["CREDITS_USED_CLOUD_SERVICES"] or 0),
+                6
+            )
+        return len(rows)
+
+    def to_json(self):
+        return json.dumps(self.records(), indent=2, default=str)
+
+
+class ProfiledAsyncJob:
+    """AsyncJob wrapper: wall time runs from submission to result()."""
+
+    def __init__(self, job, record, started):
+        self._job = job
+        self._record = record
+        self._started = started
+
+    def result(self, *args, **kwargs):
+        result = self._job.result(*args, **kwargs)
+        self._record["wall_ms"] = round((time.perf_counter() - self._started) * 1000, 1)
+        if isinstance(result, list) or hasattr(result, "memory_usage"):
+            self._record["rows"] = len(result)
+            self._record["approx_bytes"] = _approx_bytes(result)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._job, name)
+
+
+class ProfiledDataFrame:
+    """Snowpark DataFrame wrapper that records its actions on the profiler."""
+
+    def __init__(self, df, profiler, session, sql=None):
+        self._df = df
+        self._profiler = profiler
+        self._session = session
+        self._sql = sql
+
+    def _sql_text(self):
+        if self._sql is not None:
+            return self._sql
+        try:
+            return self._df.queries["queries"][-1]
+        except Exception:
+            return ""
+
+    def _new_record(self, action):
+        sql = self._sql_text()
+        return {
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "label": query_label(sql),
+            "action": action,
+            "sql": sql.strip()[:2000],
+            "query_id": None,
+            "wall_ms": None,
+            "rows": None,
+            "approx_bytes": None,
+        }
+
+    def _run(self, action, *args, **kwargs):
+        if kwargs.get("block", True) is False:
+            return self._submit(action, *args, **kwargs)
+        record = self._new_record(action)
+        started = time.perf_counter()
+        try:
+            with self._session.query_history() as history:
+                result = getattr(self._df, action)(*args, **kwargs)
+        except Exception as e:
+            record["error"] = str(e)[:500]
+            raise
+        finally:
+            record["wall_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._profiler.add(record)
+        record["query_id"] = _own_query_id(history.queries)
+        record["rows"] = len(result)
+        record["approx_bytes"] = _approx_bytes(result)
+        return result
+
+    def collect(self, *args, **kwargs):
+        return self._run("collect", *args, **kwargs)
+
+    def to_pandas(self, *args, **kwargs):
+        return self._run("to_pandas", *args, **kwargs)
+
+    def _submit(self, action, *args, **kwargs):
+        # Async actions return an AsyncJob that knows its own query ID
+        record = self._new_record(action)
+        started = time.perf_counter()
+        job = getattr(self._df, action)(*args, **kwargs)
+        record["query_id"] = getattr(job, "query_id", None)
+        self._profiler.add(record)
+        return ProfiledAsyncJob(job, record, started)
+
+    def collect_nowait(self, *args, **kwargs):
+        return self._submit("collect_nowait", *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._df, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "collect_nowait"):
+                return ProfiledDataFrame(result, self._profiler, self._session)
+            return result
+        return chained
+
+
+class ProfiledSession:
+    """Drop-in stand-in for the Snowpark session used by the apps."""
+
+    def __init__(self, session, profiler):
+        self.session = session
+        self.profiler = profiler
+
+    def sql(self, query, *args, **kwargs):
+        return ProfiledDataFrame(self.session.sql(query, *args, **kwargs), self.profiler, self.session, sql=query)
+
+    def table(self, *args, **kwargs):
+        return ProfiledDataFrame(self.session.table(*args, **kwargs), self.profiler, self.session)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def unwrap(session):
+    """The underlying Snowpark session, for libraries that need the real one."""
+    return session.session if isinstance(session, ProfiledSession) else session
+
+
+def get_profiled_session(session, state, key="query_profiler"):
+    """Wrap `session` with the QueryProfiler kept in `state` (normally st.session_state)."""
+    profiler = state.get(key)
+    if profiler is None:
+        profiler = QueryProfiler()
+        state[key] = profiler
+    return ProfiledSession(session, profiler)
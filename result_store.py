@@ -0,0 +1,60 @@
+# -------------------------------------
+# Server-side result materialization and paged reads
+# -------------------------------------
+# Results are written with CREATE TABLE AS / INSERT INTO inside Snowflake and
+# only the page being looked at is fetched back into the app, so memory use
+# does not grow with the size of the result.
+
+
+def materialize(session, select_sql, target_table, mode="replace", params=None, columns=None):
+    """
+    Write the rows of `select_sql` into `target_table`.
+
+    mode="replace" recreates the table (CREATE OR REPLACE TABLE AS),
+    mode="append" creates it on first use and then INSERTs into it. Append
+    requires `columns`, the (unquoted) output column names of `select_sql`:
+    they are named in the INSERT so values land in the right columns.
+    `params` are bind values for the ? placeholders in `select_sql`.
+    Returns the number of rows written.
+    """
+    if mode == "replace":
+        session.sql(f"CREATE OR REPLACE TABLE {target_table} AS {select_sql}", params=params).collect()
+        return count_rows(session, target_table)
+    if mode == "append":
+        if not columns:
+            raise ValueError("Append needs the column names of the SELECT.")
+        column_list = ", ".join(columns)
+        session.sql(
+            f"CREATE TABLE IF NOT EXISTS {target_table} AS SELECT {column_list} FROM ({select_sql}) LIMIT 0",
+            params=params
+        ).collect()
+        result = session.sql(
+            f"INSERT INTO {target_table} ({column_list}) SELECT {column_list} FROM ({select_sql})",
+            params=params
+        ).collect()
+        return result[0][0] if result else 0
+    raise ValueError(f"Unknown materialize mode: {mode}")
+
+
+def count_rows(session, table):
+    return session.sql(f"SELECT COUNT(*) FROM {table}").collect()[0][0]
+
+
+def stable_order(*exprs):
+    """
+    ORDER BY list for paging: `exprs` (SQL, e.g. quoted column names), then a
+    hash of the whole row so ties still sort the same way on every page.
+    """
+    return ", ".join(list(exprs) + ["HASH(*)"])
+
+
+def fetch_page(session, table, page, page_size, order_by):
+    """
+    Fetch one page (0-based) with LIMIT / OFFSET. `order_by` must be a total
+    order (see stable_order); otherwise rows can repeat or go missing
+    between pages.
+    """
+    return session.sql(
+        f"SELECT * FROM {table} ORDER BY {order_by} "
+        f"LIMIT {int(page_size)} OFFSET {int(page) * int(page_size)}"
+    ).to_pandas()
@@ -0,0 +1,188 @@
+import re
+from datetime import datetime
+
+import pandas as pd
+
+# -------------------------------------
+# Sampling-based column type inference for uploaded CSVs
+# -------------------------------------
+# Each column of a sample is tested against NUMBER, FLOAT, BOOLEAN, DATE and
+# TIMESTAMP; the first type that at least `threshold` of the non-empty sample
+# values parse as wins, otherwise the column stays VARCHAR. NUMBER keeps the
+# largest scale seen in the sample, and DATE / TIMESTAMP only accept the
+# explicit formats below, which are passed to TRY_TO_DATE / TRY_TO_TIMESTAMP
+# so Snowflake parses exactly what was validated here. Values that still do
+# not convert load as NULL; null_counts_sql() counts them after the load.
+
+TYPES = ["NUMBER", "FLOAT", "BOOLEAN", "DATE", "TIMESTAMP", "VARCHAR"]
+
+# Leading zeros (ZIP codes, IDs) are kept as text
+DECIMAL_RE = re.compile(r"^[+-]?(0|[1-9]\d*)(\.(\d+))?$")
+FLOAT_RE = re.compile(r"^[+-]?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+BOOLEAN_VALUES = {"true", "false", "t", "f", "yes", "no", "y", "n"}
+MAX_PRECISION = 38
+
+# (Snowflake format, strptime format), most specific first
+DATE_FORMATS = [
+    ("YYYY-MM-DD", "%Y-%m-%d"),
+    ("MM/DD/YYYY", "%m/%d/%Y"),
+]
+TIMESTAMP_FORMATS = [
+    ("YYYY-MM-DD HH24:MI:SS.FF", "%Y-%m-%d %H:%M:%S.%f"),
+    ("YYYY-MM-DD HH24:MI:SS", "%Y-%m-%d %H:%M:%S"),
+    ("YYYY-MM-DD HH24:MI", "%Y-%m-%d %H:%M"),
+    ('YYYY-MM-DD"T"HH24:MI:SS.FF', "%Y-%m-%dT%H:%M:%S.%f"),
+    ('YYYY-MM-DD"T"HH24:MI:SS', "%Y-%m-%dT%H:%M:%S"),
+    ('YYYY-MM-DD"T"HH24:MI', "%Y-%m-%dT%H:%M"),
+]
+
+
+def _share(values, test):
+    return sum(1 for v in values if test(v)) / len(values)
+
+
+def _parses(value, fmt):
+    try:
+        datetime.strptime(value, fmt)
+        return True
+    except ValueError:
+        return False
+
+
+def _best_format(values, formats, threshold):
+    """(snowflake_format, confidence) of the first format matching `threshold` of the values."""
+    for sf_format, py_format in formats:
+        confidence = _share(values, lambda v: _parses(v, py_format))
+        if confidence >= threshold:
+            return sf_format, confidence
+    return None, 0.0
+
+
+def _decimal_scale(values):
+    """Largest number of fractional digits, or None if a value needs more than MAX_PRECISION digits."""
+    scale, int_digits = 0, 0
+    for v in values:
+        m = DECIMAL_RE.match(v)
+        if m:
+            scale = max(scale, len(m.group(3) or ""))
+            int_digits = max(int_digits, len(m.group(1)))
+    return scale if int_digits + scale <= MAX_PRECISION else None
+
+
+def infer_column_type(values, threshold=0.95):
+    """
+    Return (type, confidence, detail) for a list of raw string values.
+    `detail` is the scale for NUMBER, the Snowflake format for DATE and
+    TIMESTAMP, and None otherwise.
+    """
+    values = [v.strip() for v in values if isinstance(v, str) and v.strip()]
+    if not values:
+        return "VARCHAR", 0.0, None
+
+    confidence = _share(values, lambda v: bool(DECIMAL_RE.match(v)))
+    scale = _decimal_scale(values)
+    if confidence >= threshold and scale is not None:
+        return "NUMBER", confidence, scale
+
+    confidence = _share(values, lambda v: bool(FLOAT_RE.match(v)))
+    if confidence >= threshold:
+        return "FLOAT", confidence, None
+
+    confidence = _share(values, lambda v: v.lower() in BOOLEAN_VALUES)
+    if confidence >= threshold:
+        return "BOOLEAN", confidence, None
+
+    for type_name, formats in (("DATE", DATE_FORMATS), ("TIMESTAMP", TIMESTAMP_FORMATS)):
+        sf_format, confidence = _best_format(values, formats, threshold)
+        if sf_format:
+            return type_name, confidence, sf_format
+    return "VARCHAR", 1.0, None
+
+
+def infer_schema(sample_df, threshold=0.95):
+    """
+    Infer types for a cleaned sample (see csv_ingest.process_df) read with
+    dtype=str. Returns a DataFrame with COLUMN, TYPE, SCALE, FORMAT and
+    CONFIDENCE.
+    """
+    rows = []
+    for col in sample_df.columns:
+        type_name, confidence, detail = infer_column_type(sample_df[col].tolist(), threshold)
+        rows.append({
+            "COLUMN": col,
+            "TYPE": type_name,
+            "SCALE": detail if type_name == "NUMBER" else None,
+            "FORMAT": detail if type_name in ("DATE", "TIMESTAMP") else None,
+            "CONFIDENCE": round(confidence, 3),
+        })
+    schema_df = pd.DataFrame(rows, columns=["COLUMN", "TYPE", "SCALE", "FORMAT", "CONFIDENCE"])
+    schema_df["SCALE"] = schema_df["SCALE"].astype("Int64")
+    return schema_df
+
+
+def _detail(row, name):
+    # SCALE / FORMAT are optional (all-VARCHAR schemas do not have them)
+    value = getattr(row, name, None)
+    if value is None or pd.isna(value) or value == "":
+        return None
+    return value
+
+
+def column_type_sql(row):
+    scale = _detail(row, "SCALE")
+    if row.TYPE == "NUMBER" and scale is not None:
+        return f"NUMBER({MAX_PRECISION}, {int(scale)})"
+    return row.TYPE
+
+
+def load_expression(row, col):
+    """TRY_TO_* conversion of the raw field `col` for a schema row."""
+    scale, fmt = _detail(row, "SCALE"), _detail(row, "FORMAT")
+    if row.TYPE == "NUMBER":
+        # Without a scale TRY_TO_NUMBER rounds to an integer
+        return f"TRY_TO_NUMBER({col}, {MAX_PRECISION}, {int(scale or 0)})"
+    if row.TYPE == "FLOAT":
+        return f"TRY_TO_DOUBLE({col})"
+    if row.TYPE == "BOOLEAN":
+        return f"TRY_TO_BOOLEAN({col})"
+    if row.TYPE in ("DATE", "TIMESTAMP"):
+        function = "TRY_TO_DATE" if row.TYPE == "DATE" else "TRY_TO_TIMESTAMP"
+        return f"{function}({col}, '{fmt}')" if fmt else f"{function}({col})"
+    return col
+
+
+def build_create_table_sql(table_name, schema_df, replace=True, transient=False, extra_columns=None):
+    """`extra_columns` maps further column names to their types (appended last)."""
+    kind = "TRANSIENT TABLE" if transient else "TABLE"
+    create = f"CREATE OR REPLACE {kind}" if replace else f"CREATE {kind} IF NOT EXISTS"
+    columns = [f'"{r.COLUMN}" {column_type_sql(r)}' for r in schema_df.itertuples()]
+    columns += [f'"{name}" {type_sql}' for name, type_sql in (extra_columns or {}).items()]
+    table_cols = ",\n    ".join(columns)
+    return f"{create} {table_name} (\n    {table_cols}\n);"
+
+
+def build_copy_select(schema_df, source, extra_exprs=None):
+    """
+    SELECT used inside COPY INTO to convert the positional CSV fields.
+    `extra_exprs` (e.g. METADATA$FILENAME) are appended after the fields.
+    """
+    exprs = [load_expression(r, f"${i}") for i, r in enumerate(schema_df.itertuples(), start=1)]
+    exprs += list(extra_exprs or [])
+    return f"SELECT {', '.join(exprs)} FROM {source}"
+
+
+def null_counts_sql(schema_df, source, file_format="CSV_FORMAT"):
+    """
+    Per typed column, the number of non-empty raw values in the staged files
+    under `source` that the load conversion turns into NULL. None when every
+    column is VARCHAR.
+    """
+    counts = []
+    for i, r in enumerate(schema_df.itertuples(), start=1):
+        if r.TYPE == "VARCHAR":
+            continue
+        raw, name = f"${i}", f'"{r.COLUMN}"'
+        counts.append(f"COUNT_IF(NULLIF(TRIM({raw}), '') IS NOT NULL AND {load_expression(r, raw)} IS NULL) AS {name}")
+    if not counts:
+        return None
+    return f"SELECT {', '.join(counts)} FROM {source} (FILE_FORMAT => '{file_format}')"
@@ -0,0 +1,17 @@
+# -------------------------------------
+# SQL text helpers shared by the apps and the engine modules
+# -------------------------------------
+
+
+def q(name):
+    """Double-quoted (case-preserving) identifier."""
+    return f'"{name}"'
+
+
+def sql_escape(s):
+    return s.replace("'", "''")
+
+
+def stage_relative_path(listed_name):
+    """`LIST` / `ls` names start with the stage name; drop that first segment."""
+    return listed_name.split('/', 1)[1] if '/' in listed_name else listed_name
@@ -0,0 +1,105 @@
+from email.utils import parsedate_to_datetime
+
+from sql_utils import sql_escape, stage_relative_path
+from ttl_cache import TTLCache
+
+# -------------------------------------
+# Stage browser: one cached LIST, filtered, sorted and paged in memory
+# -------------------------------------
+# The stage is listed once per (stage, pattern) and kept in the session for
+# `ttl` seconds, so tabs and widget reruns share the same listing. Prefix
+# navigation, sorting and paging work on that list and never go back to
+# Snowflake; only the visible page is handed to a widget.
+
+SORT_KEYS = {
+    "Name": lambda f: f["path"],
+    "Size": lambda f: f["size"],
+    "Last modified": lambda f: f["last_modified"],
+}
+
+
+def _parse_modified(value):
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def list_stage(session, stage_name, pattern=None):
+    """
+    LIST `stage_name` (with its '@'), optionally filtered by a regular
+    expression. Returns dicts with path, size, last_modified and md5.
+    """
+    sql = f"LIST {stage_name}"
+    if pattern:
+        sql += f" PATTERN = '{sql_escape(pattern)}'"
+    files = []
+    for row in session.sql(sql).collect():
+        row = row.as_dict()
+        files.append({
+            "path": stage_relative_path(row["name"]),
+            "size": row["size"],
+            "last_modified": _parse_modified(row["last_modified"]),
+            "md5": row.get("md5"),
+        })
+    return files
+
+
+def get_listing(session, state, stage_name, pattern=None, key="stage_listing", ttl=60, refresh=False):
+    """Cached `list_stage` kept in `state` (normally st.session_state)."""
+    cache = state.get(key)
+    if cache is None:
+        cache = TTLCache(maxsize=16, ttl=ttl)
+        state[key] = cache
+    if refresh:
+        invalidate_listing(state, stage_name, key)
+    return cache.get_or_load((stage_name, pattern or ""), lambda: list_stage(session, stage_name, pattern))
+
+
+def invalidate_listing(state, stage_name, key="stage_listing"):
+    """Drop cached listings for `stage_name`, e.g. after an upload."""
+    cache = state.get(key)
+    if cache is not None:
+        cache.invalidate(lambda k: k[0] == stage_name)
+
+
+def browse(files, prefix=""):
+    """
+    Split the files under `prefix` into immediate sub-folders (with file
+    counts) and files directly in that folder.
+    """
+    folders, direct = {}, []
+    for f in files:
+        if not f["path"].startswith(prefix):
+            continue
+        rest = f["path"][len(prefix):]
+        if "/" in rest:
+            folder = prefix + rest.split("/", 1)[0] + "/"
+            folders[folder] = folders.get(folder, 0) + 1
+        else:
+            direct.append(f)
+    return folders, direct
+
+
+def files_under(files, prefix=""):
+    """All files below `prefix`, at any depth."""
+    return [f for f in files if f["path"].startswith(prefix)]
+
+
+def sort_files(files, by="Name", descending=False):
+    key = SORT_KEYS[by]
+    # Files without a parseable date sort last either way
+    present = [f for f in files if key(f) is not None]
+    missing = [f for f in files if key(f) is None]
+    return sorted(present, key=key, reverse=descending) + missing
+
+
+def page(files, page_no, page_size):
+    start = page_no * page_size
+    return files[start:start + page_size]
+
+
+def parent_prefix(prefix):
+    """'a/b/' -> 'a/', 'a/' -> ''."""
+    stripped = prefix.rstrip("/")
+    return stripped.rsplit("/", 1)[0] + "/" if "/" in stripped else ""
@@ -0,0 +1,150 @@
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# -------------------------------------
+# Chunked stage downloads and bulk zip export
+# -------------------------------------
+# Stage files are copied from the get_stream handle in CHUNK_BYTES pieces into
+# spooled temporary files: small files stay in memory, anything larger than
+# SPOOL_BYTES moves to local disk. A zip export downloads with a pool of
+# `max_workers` threads and writes finished files into the archive one at a
+# time, so building an archive keeps about max_workers * SPOOL_BYTES in memory
+# whatever the sizes. st.download_button only takes bytes (not temporary
+# files), so handing a file to it loads the whole file into memory: that is
+# done up to MAX_DOWNLOAD_BYTES. Larger files are served from the stage with a
+# presigned URL instead, and larger archives are PUT to EXPORT_DIR first.
+
+CHUNK_BYTES = 8 * 1024 * 1024
+SPOOL_BYTES = 32 * 1024 * 1024
+
+# Largest file or archive passed to st.download_button as bytes
+MAX_DOWNLOAD_BYTES = 100 * 1024 * 1024
+
+# Stage folder that oversized zip exports are written to
+EXPORT_DIR = "_exports"
+
+# Lifetime of the presigned URLs handed out for oversized downloads
+DOWNLOAD_URL_SECONDS = 60 * 60
+
+# Already-compressed formats are stored as-is instead of deflated again
+STORED_EXTENSIONS = {".gz", ".zip", ".bz2", ".xz", ".zst", ".parquet", ".png", ".jpg", ".jpeg", ".pdf"}
+
+
+def copy_stream(src, dst, chunk_bytes=CHUNK_BYTES):
+    """Copy `src` into `dst` in bounded chunks. Returns the number of bytes."""
+    copied = 0
+    while True:
+        data = src.read(chunk_bytes)
+        if not data:
+            return copied
+        dst.write(data)
+        copied += len(data)
+
+
+def download_to_spool(session, stage_path, chunk_bytes=CHUNK_BYTES, spool_bytes=SPOOL_BYTES):
+    """
+    Download `stage_path` (e.g. "@MY_STAGE/dir/file.csv") into a
+    SpooledTemporaryFile rewound to the start. The caller closes it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    try:
+        with session.file.get_stream(stage_path) as stream:
+            copy_stream(stream, spool, chunk_bytes)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _compress_type(path):
+    if os.path.splitext(path)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _add_to_zip(archive, path, spool, chunk_bytes):
+    try:
+        info = zipfile.ZipInfo(path)
+        info.compress_type = _compress_type(path)
+        with archive.open(info, "w", force_zip64=True) as entry:
+            copy_stream(spool, entry, chunk_bytes)
+    finally:
+        spool.close()
+
+
+def build_zip(session, stage_name, paths, max_workers=4, chunk_bytes=CHUNK_BYTES,
+              spool_bytes=SPOOL_BYTES, on_file=None):
+    """
+    Zip the stage files `paths` (relative to `stage_name`, which includes
+    the '@'). Returns a temporary file holding the archive, rewound to the
+    start; the caller closes it. `on_file(path, done, total)` is called as
+    each file is added.
+    """
+    archive_file = tempfile.TemporaryFile()
+    done = 0
+    with zipfile.ZipFile(archive_file, "w") as archive, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = {}
+
+        def drain(return_when):
+            nonlocal done
+            finished, _ = wait(in_flight, return_when=return_when)
+            for future in finished:
+                path = in_flight.pop(future)
+                _add_to_zip(archive, path, future.result(), chunk_bytes)
+                done += 1
+                if on_file:
+                    on_file(path, done, len(paths))
+
+        for path in paths:
+            # Bound the number of downloaded files waiting to be zipped
+            while len(in_flight) >= max_workers:
+                drain(FIRST_COMPLETED)
+            future = pool.submit(download_to_spool, session, f"{stage_name}/{path}", chunk_bytes, spool_bytes)
+            in_flight[future] = path
+        while in_flight:
+            drain(FIRST_COMPLETED)
+    archive_file.seek(0)
+    return archive_file
+
+
+def file_size(fileobj):
+    """Size of a seekable file in bytes; leaves it rewound to the start."""
+    size = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(0)
+    return size
+
+
+def download_data(fileobj, max_bytes=MAX_DOWNLOAD_BYTES):
+    """
+    Contents of a spooled / temporary file as bytes for st.download_button.
+    Closes it. Raises ValueError when it is larger than `max_bytes`.
+    """
+    with fileobj:
+        size = file_size(fileobj)
+        if size > max_bytes:
+            raise ValueError(f"{size:,} bytes is over the {max_bytes:,} byte download limit")
+        return fileobj.read()
+
+
+def presigned_url(session, stage_name, path, expiration_seconds=DOWNLOAD_URL_SECONDS):
+    """Presigned URL for `path` (relative to `stage_name`, which includes the '@')."""
+    return session.sql(
+        f"SELECT GET_PRESIGNED_URL({stage_name}, ?, {int(expiration_seconds)})",
+        params=[path]
+    ).collect()[0][0]
+
+
+def stage_archive(session, archive_file, stage_name, file_name):
+    """
+    PUT a built archive to EXPORT_DIR on the stage, streaming it from the
+    temporary file, and close it. Returns its path relative to the stage.
+    """
+    path = f"{EXPORT_DIR}/{file_name}"
+    with archive_file:
+        archive_file.seek(0)
+        session.file.put_stream(archive_file, f"{stage_name}/{path}", auto_compress=False, overwrite=True)
+    return path
@@ -0,0 +1,121 @@
+from sql_utils import q
+from schema_inference import build_create_table_sql, build_copy_select, null_counts_sql
+
+# -------------------------------------
+# Load modes for staged CSVs: replace, append, merge
+# -------------------------------------
+# Append and merge rely on COPY load metadata: a file that was already loaded
+# into the table (or its staging table) is skipped, so reloading the same
+# stage path only picks up new files. Merge copies into a transient staging
+# table first and upserts on the key columns. The MERGE runs whenever the
+# staging table holds rows (including rows left by an earlier failed merge,
+# whose files COPY now skips), and the staging rows are removed with DELETE
+# (not TRUNCATE, which would also forget the load history) in the same
+# transaction as the MERGE, so they are only dropped once merged.
+
+LOAD_MODES = ["Replace", "Append", "Merge (upsert on key)"]
+
+# Load-order columns on the merge staging table: for duplicate keys the last
+# row of the last file wins
+STAGE_ORDER_COLUMNS = {"_FILE_NAME": "VARCHAR", "_FILE_ROW_NUMBER": "NUMBER"}
+STAGE_ORDER_EXPRS = ["METADATA$FILENAME", "METADATA$FILE_ROW_NUMBER"]
+
+
+def copy_sql(table, schema_df, stage_path, file_format="CSV_FORMAT", extra_exprs=None):
+    return f"""COPY INTO {table}
+                FROM ({build_copy_select(schema_df, stage_path, extra_exprs)})
+                FILE_FORMAT = (FORMAT_NAME = {file_format})
+                ON_ERROR = 'CONTINUE';"""
+
+
+def run_copy(session, sql):
+    """Execute a COPY and summarize its per-file result rows."""
+    files = [row.as_dict() for row in session.sql(sql).collect()]
+    files = [f for f in files if f.get("file")]
+    return {
+        "files_loaded": sum(1 for f in files if f.get("status") in ("LOADED", "PARTIALLY_LOADED")),
+        "files_failed": sum(1 for f in files if f.get("status") == "LOAD_FAILED"),
+        "rows_loaded": sum(f.get("rows_loaded") or 0 for f in files),
+        "errors_seen": sum(f.get("errors_seen") or 0 for f in files),
+    }
+
+
+def merge_sql(table, stage_table, columns, key_cols):
+    on = " AND ".join([f"T.{q(k)} = S.{q(k)}" for k in key_cols])
+    updates = ", ".join([f"{q(c)} = S.{q(c)}" for c in columns if c not in key_cols])
+    partition = ", ".join([q(k) for k in key_cols])
+    order = ", ".join([f"{q(c)} DESC" for c in STAGE_ORDER_COLUMNS])
+    matched = f"WHEN MATCHED THEN UPDATE SET {updates}\n        " if updates else ""
+    return f"""MERGE INTO {table} T
+        USING (
+            SELECT * FROM {stage_table}
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY {order}) = 1
+        ) S
+        ON {on}
+        {matched}WHEN NOT MATCHED THEN INSERT ({', '.join([q(c) for c in columns])})
+        VALUES ({', '.join([f'S.{q(c)}' for c in columns])});"""
+
+
+def load_table(session, mode, table, schema_df, stage_path, key_cols=None):
+    """
+    Load the files under `stage_path` into `table` with the given mode.
+    Returns load counters and the list of statements that were executed.
+    """
+    executed = []
+
+    def run(sql):
+        executed.append(sql)
+        return session.sql(sql).collect()
+
+    staged_files = len(session.sql(f"LIST {stage_path}").collect())
+
+    if mode == "Replace":
+        run(build_create_table_sql(table, schema_df))
+        executed.append(copy_sql(table, schema_df, stage_path))
+        stats = run_copy(session, executed[-1])
+    elif mode == "Append":
+        run(build_create_table_sql(table, schema_df, replace=False))
+        executed.append(copy_sql(table, schema_df, stage_path))
+        stats = run_copy(session, executed[-1])
+    elif mode == "Merge (upsert on key)":
+        if not key_cols:
+            raise ValueError("Merge needs at least one key column.")
+        stage_table = f"{table}_STAGE"
+        run(build_create_table_sql(table, schema_df, replace=False))
+        run(build_create_table_sql(
+            stage_table, schema_df, replace=False, transient=True, extra_columns=STAGE_ORDER_COLUMNS
+        ))
+        executed.append(copy_sql(stage_table, schema_df, stage_path, extra_exprs=STAGE_ORDER_EXPRS))
+        stats = run_copy(session, executed[-1])
+        stats["rows_staged"] = run(f"SELECT COUNT(*) FROM {stage_table}")[0][0]
+        stats["rows_inserted"] = stats["rows_updated"] = 0
+        if stats["rows_staged"]:
+            run("BEGIN")
+            try:
+                result = run(merge_sql(table, stage_table, list(schema_df["COLUMN"]), key_cols))
+                run(f"DELETE FROM {stage_table};")
+                run("COMMIT")
+            except Exception:
+                session.sql("ROLLBACK").collect()
+                raise
+            counts = list(result[0]) if result else []
+            stats["rows_inserted"] = counts[0] if counts else 0
+            stats["rows_updated"] = counts[1] if len(counts) > 1 else 0
+    else:
+        raise ValueError(f"Unknown load mode: {mode}")
+
+    # Non-empty values the TRY_TO_* conversions turned into NULL, per column
+    stats["null_values"] = {}
+    null_sql = null_counts_sql(schema_df, stage_path)
+    if null_sql and stats["rows_loaded"]:
+        row = run(null_sql)[0].as_dict()
+        stats["null_values"] = {col: n for col, n in row.items() if n}
+
+    stats["files_staged"] = staged_files
+    stats["files_skipped"] = staged_files - stats["files_loaded"] - stats["files_failed"]
+    stats["sql"] = executed
+    return stats
+
+
+def preview(session, table, limit=5):
+    return session.sql(f"SELECT * FROM {table} LIMIT {int(limit)}").to_pandas()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The modules under test live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_session import FakeSession  # noqa: E402
+
+
+@pytest.fixture
+def make_session():
+    """FakeSession factory; every session it made is closed after the test."""
+    sessions = []
+
+    def make(**kwargs):
+        session = FakeSession(**kwargs)
+        sessions.append(session)
+        return session
+    yield make
+    for session in sessions:
+        session.close()
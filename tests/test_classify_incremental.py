@@ -0,0 +1,24 @@
+import pytest
+
+from classify_incremental import build_incremental_merge, expected_columns, run_incremental
+
+
+def _respond(session, result_columns):
+    session.add(r"^DESC TABLE", [{"name": c} for c in result_columns])
+    session.add(r"^\s*MERGE INTO", [{"number of rows inserted": 3, "number of rows updated": 1}])
+    session.add(r"COUNT_IF", [{"N": 10, "NULL_KEYS": 2}])
+    return session
+
+
+def test_null_keys_are_filtered_and_counted(make_session):
+    session = _respond(make_session(), expected_columns("ID", ["TEXT"]))
+    stats = run_incremental(session, "SRC", "RES", "ID", ["TEXT"], ["a", "b"], {})
+    assert (stats["inserted"], stats["updated"], stats["skipped_null_keys"], stats["unchanged"]) == (3, 1, 2, 4)
+    assert 'WHERE S."ID" IS NOT NULL' in build_incremental_merge("SRC", "RES", "ID", ["TEXT"], ["a"], {})
+
+
+def test_results_table_with_other_columns_is_rejected(make_session):
+    session = _respond(make_session(), expected_columns("ID", ["TEXT"]))
+    with pytest.raises(ValueError, match="Choose another results table"):
+        run_incremental(session, "SRC", "RES", "ID", ["TEXT", "TITLE"], ["a", "b"], {})
+    assert not any("MERGE INTO" in sql for sql in session.log)
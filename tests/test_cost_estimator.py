@@ -0,0 +1,12 @@
+from cost_estimator import estimate_cascade, estimate_job
+
+
+def test_cascade_estimate_is_both_tiers_over_all_rows():
+    tier1 = estimate_job(100, 10_000, 25_600, 0.19, 1000, method="COUNT_TOKENS", total_rows=100)
+    tier2 = estimate_job(100, 10_000, 25_600, 1.21, 1000, method="COUNT_TOKENS", total_rows=100)
+    estimate = estimate_cascade(tier1, tier2)
+    assert estimate["calls"] == 200
+    assert estimate["total_tokens"] == tier1["total_tokens"] + tier2["total_tokens"]
+    assert estimate["credits"] == round(tier1["credits"] + tier2["credits"], 4)
+    assert estimate["runtime_seconds"] == round(tier1["runtime_seconds"] + tier2["runtime_seconds"], 1)
+    assert estimate["total_rows"] == 100
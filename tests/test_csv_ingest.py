@@ -0,0 +1,50 @@
+import gzip
+import hashlib
+import io
+
+from csv_ingest import upload_files_parallel, upload_stream
+
+
+class Upload(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+# Hex digests so the gzip parts are not tiny
+CSV = b"id,name\n" + b"".join(b"%d,%s\n" % (i, hashlib.md5(b"%d" % i).hexdigest().encode()) for i in range(20000))
+
+
+def test_upload_stream_compressed_is_seekable_for_put_stream(make_session):
+    session = make_session(keep_files=True)
+    staged = upload_stream(session, io.BytesIO(CSV), "@S/upload/data.csv", compress=True)
+    assert staged == "@S/upload/data.csv.gz"
+    assert gzip.decompress(session.file.files[staged]) == CSV
+
+
+def test_upload_stream_uncompressed(make_session):
+    session = make_session(keep_files=True)
+    staged = upload_stream(session, io.BytesIO(CSV), "@S/upload/data.csv")
+    assert session.file.files[staged] == CSV
+
+
+def test_upload_files_parallel_default_compresses_whole_files(make_session):
+    session = make_session(keep_files=True)
+    staged = upload_files_parallel(session, [Upload("a.csv", CSV), Upload("b.csv", CSV[:100])], "@S/up", max_workers=2)
+    assert sorted(staged) == ["@S/up/a.csv.gz", "@S/up/b.csv.gz"]
+    assert gzip.decompress(session.file.files["@S/up/a.csv.gz"]) == CSV
+
+
+def test_upload_files_parallel_splits_large_csv_into_gzip_parts(make_session):
+    session = make_session(keep_files=True)
+    staged = upload_files_parallel(session, [Upload("a.csv", CSV)], "@S/up", split_bytes=64 * 1024, part_bytes=64 * 1024)
+    assert len(staged) > 1
+    header, rows = b"id,name\n", b""
+    for path in sorted(staged):
+        part = gzip.decompress(session.file.files[path])
+        assert part.startswith(header)
+        rows += part[len(header):]
+    assert header + rows == CSV
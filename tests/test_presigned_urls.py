@@ -0,0 +1,46 @@
+from presigned_urls import bulk_presigned_urls, like_prefix
+from ttl_cache import TTLCache
+
+
+def _respond(session, paths):
+    session.add(r"GET_PRESIGNED_URL", [
+        {"RELATIVE_PATH": p, "SIZE": 1, "PRESIGNED_URL": f"https://example/{p}"} for p in paths
+    ])
+    return session
+
+
+def test_whole_folder_binds_one_like_prefix(make_session):
+    paths = [f"docs/2024_%/f{i}.pdf" for i in range(5000)]
+    session = _respond(make_session(), paths)
+    calls = []
+    # Record the bound parameters
+    real_sql = session.sql
+    session.sql = lambda query, params=None: calls.append(params) or real_sql(query, params)
+    df, queried = bulk_presigned_urls(session, TTLCache(), "@S", paths, 3600, prefix="docs/2024_%/")
+    assert calls == [["docs/2024^_^%/%"]]
+    assert " IN (" not in session.log[-1]
+    assert (len(df), queried) == (5000, 5000)
+
+
+def test_whole_folder_keeps_only_listed_files(make_session):
+    # The folder also holds files the listing's PATTERN filtered out
+    session = _respond(make_session(), ["docs/a.csv", "docs/b.pdf", "docs/sub/c.csv"])
+    df, queried = bulk_presigned_urls(
+        session, TTLCache(), "@S", ["docs/a.csv", "docs/sub/c.csv"], 3600, prefix="docs/"
+    )
+    assert list(df["RELATIVE_PATH"]) == ["docs/a.csv", "docs/sub/c.csv"]
+    assert queried == 2
+
+
+def test_selected_files_are_bound_and_cached(make_session):
+    session = _respond(make_session(), ["a.pdf", "b.pdf"])
+    cache = TTLCache()
+    bulk_presigned_urls(session, cache, "@S", ["a.pdf", "b.pdf"], 3600)
+    df, queried = bulk_presigned_urls(session, cache, "@S", ["a.pdf", "b.pdf"], 3600)
+    assert "IN (?, ?)" in session.log[0]
+    assert (len(session.log), queried, int(df["FROM_CACHE"].sum())) == (1, 0, 2)
+
+
+def test_like_prefix_escapes_wildcards():
+    assert like_prefix("") == "%"
+    assert like_prefix("a_b%c^/") == "a^_b^%c^^/%"
@@ -0,0 +1,52 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from query_profiler import get_profiled_session
+
+
+def test_query_ids_match_their_statement_across_threads(make_session):
+    raw = make_session(latency_ms=5, jitter_ms=5)
+
+    def slow(sql, params):
+        # Runs after the statement is logged, so statements overlap
+        time.sleep(0.01)
+        return [{"N": 1}]
+    raw.add(r"^SELECT", slow)
+    session = get_profiled_session(raw, {})
+
+    def run(i):
+        df = session.sql(f"SELECT {i}")
+        return df.collect() if i % 2 else df.to_pandas()
+
+    with raw.query_history() as history:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(run, range(40)))
+
+    executed = {r.query_id: r.sql_text for r in history.queries}
+    records = session.profiler.records()
+    assert len(records) == 40
+    for record in records:
+        assert executed[record["query_id"]] == record["sql"]
+        assert record["rows"] == 1
+
+
+def test_blocking_actions_stay_blocking(make_session):
+    raw = make_session()
+    threads = []
+
+    def rows(sql, params):
+        threads.append(threading.get_ident())
+        return [{"N": 1}]
+    raw.add(r"^SELECT", rows)
+    session = get_profiled_session(raw, {})
+
+    session.sql("SELECT 1").collect()
+    session.sql("SELECT 2").to_pandas()
+    assert threads == [threading.get_ident()] * 2
+
+    job = session.sql("SELECT 3").collect(block=False)
+    assert len(job.result()) == 1
+    records = session.profiler.records()
+    assert all(r["query_id"] for r in records)
+    assert records[-1]["rows"] == 1
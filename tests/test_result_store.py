@@ -0,0 +1,33 @@
+import pytest
+
+from complete_engine import RESULT_COLUMNS, build_map_reduce_sql, build_single_call_sql
+from result_store import fetch_page, materialize, stable_order
+
+SOURCE = {"table": "PARSED", "where": "ID = 1"}
+
+
+def test_append_names_the_columns(make_session):
+    session = make_session()
+    session.add(r"^INSERT INTO", [{"number of rows inserted": 1}])
+    assert materialize(session, "SELECT 1 AS A, 2 AS B", "T", mode="append", columns=["A", "B"]) == 1
+    assert session.log[-1] == "INSERT INTO T (A, B) SELECT A, B FROM (SELECT 1 AS A, 2 AS B)"
+    with pytest.raises(ValueError):
+        materialize(session, "SELECT 1 AS A", "T", mode="append")
+
+
+def test_both_completion_modes_emit_the_result_columns():
+    for sql in (build_single_call_sql("m", SOURCE, "{}"), build_map_reduce_sql("m", SOURCE, "{}", 1000)):
+        tail = sql[sql.rindex("SELECT"):]
+        for column in RESULT_COLUMNS:
+            assert f"AS {column}" in tail
+
+
+def test_pages_use_a_total_order(make_session):
+    session = make_session()
+    fetch_page(session, "T", 2, 20, stable_order('"A"', '"B"'))
+    assert session.log[-1] == 'SELECT * FROM T ORDER BY "A", "B", HASH(*) LIMIT 20 OFFSET 40'
+
+
+def test_map_reduce_rejects_overlap_not_below_chunk_size():
+    with pytest.raises(ValueError, match="must be smaller"):
+        build_map_reduce_sql("m", SOURCE, "{}", 256, 1000)
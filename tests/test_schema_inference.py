@@ -0,0 +1,40 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from schema_inference import build_copy_select, build_create_table_sql, infer_column_type, infer_schema
+
+
+@pytest.mark.parametrize("values", [
+    ["10-20", "5-9", "1-3"],
+    ["3/4", "5/6"],
+    ["1-2", "3-4"],
+    ["12:30", "13:45"],
+    ["007", "012"],
+])
+def test_ambiguous_values_stay_varchar(values):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert infer_column_type(values)[0] == "VARCHAR"
+
+
+@pytest.mark.parametrize("values, expected", [
+    (["1", "2.50", "3.125"], ("NUMBER", 3)),
+    (["1", "-2"], ("NUMBER", 0)),
+    (["1e5", "2.5"], ("FLOAT", None)),
+    (["2024-01-05", "2024-12-31"], ("DATE", "YYYY-MM-DD")),
+    (["01/05/2024", "12/31/2024"], ("DATE", "MM/DD/YYYY")),
+    (["2024-01-05 10:00:00", "2024-01-06 11:30:00"], ("TIMESTAMP", "YYYY-MM-DD HH24:MI:SS")),
+])
+def test_inferred_type_and_detail(values, expected):
+    type_name, _, detail = infer_column_type(values)
+    assert (type_name, detail) == expected
+
+
+def test_number_scale_and_formats_reach_the_load_sql():
+    schema_df = infer_schema(pd.DataFrame({"A": ["1", "2.25"], "B": ["2024-01-01", "2024-02-02"]}))
+    assert '"A" NUMBER(38, 2)' in build_create_table_sql("T", schema_df)
+    assert build_copy_select(schema_df, "@S/p/") == (
+        "SELECT TRY_TO_NUMBER($1, 38, 2), TRY_TO_DATE($2, 'YYYY-MM-DD') FROM @S/p/"
+    )
@@ -0,0 +1,49 @@
+import io
+import tempfile
+import zipfile
+
+import pytest
+
+from stage_download import build_zip, download_data, download_to_spool, stage_archive
+
+
+def _stage(session, files):
+    session.file.files.update(files)
+    return session
+
+
+def test_single_file_download_data(make_session):
+    session = _stage(make_session(keep_files=True), {"@S/dir/a.csv": b"a,b\n1,2\n"})
+    # Small spool threshold so the file moves to disk
+    data = download_data(download_to_spool(session, "@S/dir/a.csv", chunk_bytes=3, spool_bytes=4))
+    assert data == b"a,b\n1,2\n"
+
+
+def test_zip_download_data(make_session):
+    files = {"@S/dir/a.csv": b"a,b\n1,2\n", "@S/dir/b.pdf": b"%PDF-1.4", "@S/c.txt": b"hello"}
+    session = _stage(make_session(keep_files=True), files)
+    data = download_data(build_zip(session, "@S", ["dir/a.csv", "dir/b.pdf", "c.txt"], max_workers=2))
+    assert isinstance(data, bytes)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert {name: archive.read(name) for name in archive.namelist()} == {
+            path[len("@S/"):]: content for path, content in files.items()
+        }
+        assert archive.getinfo("dir/b.pdf").compress_type == zipfile.ZIP_STORED
+
+
+def test_download_data_refuses_large_files():
+    spool = tempfile.SpooledTemporaryFile(max_size=4)
+    spool.write(b"0123456789")
+    with pytest.raises(ValueError):
+        download_data(spool, max_bytes=9)
+    assert spool.closed
+
+
+def test_large_archive_is_staged(make_session):
+    session = _stage(make_session(keep_files=True), {"@S/a.csv": b"a,b\n1,2\n"})
+    archive = build_zip(session, "@S", ["a.csv"])
+    path = stage_archive(session, archive, "@S", "S.zip")
+    assert path == "_exports/S.zip"
+    assert archive.closed
+    with zipfile.ZipFile(io.BytesIO(session.file.files["@S/_exports/S.zip"])) as staged:
+        assert staged.read("a.csv") == b"a,b\n1,2\n"
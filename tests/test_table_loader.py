@@ -0,0 +1,33 @@
+import pandas as pd
+
+from table_loader import load_table, merge_sql
+
+SCHEMA = pd.DataFrame({"COLUMN": ["ID", "NAME"], "TYPE": ["NUMBER", "VARCHAR"], "CONFIDENCE": [1.0, 1.0]})
+
+
+def _respond(session, staged_rows, copy_rows):
+    session.add(r"^LIST ", [{"name": "core/up/a.csv.gz"}])
+    session.add(r"^COPY INTO", copy_rows)
+    session.add(r"^SELECT COUNT\(\*\) FROM T_STAGE", [{"COUNT(*)": staged_rows}])
+    session.add(r"^MERGE INTO", [{"number of rows inserted": 2, "number of rows updated": 1}])
+    return session
+
+
+def test_merge_retries_rows_left_in_staging_table(make_session):
+    # COPY skips the already-loaded file, but the staging table still holds its rows
+    session = _respond(make_session(), staged_rows=3, copy_rows=[])
+    stats = load_table(session, "Merge (upsert on key)", "T", SCHEMA, "@core/up/", key_cols=["ID"])
+    statements = [s.strip().split()[0] for s in session.log]
+    assert statements[-4:] == ["BEGIN", "MERGE", "DELETE", "COMMIT"]
+    assert (stats["rows_staged"], stats["rows_inserted"], stats["rows_updated"]) == (3, 2, 1)
+
+
+def test_merge_skips_empty_staging_table_without_deleting(make_session):
+    session = _respond(make_session(), staged_rows=0, copy_rows=[])
+    load_table(session, "Merge (upsert on key)", "T", SCHEMA, "@core/up/", key_cols=["ID"])
+    assert not any(s.strip().startswith(("MERGE", "DELETE")) for s in session.log)
+
+
+def test_merge_keeps_last_duplicate_in_load_order():
+    sql = merge_sql("T", "T_STAGE", ["ID", "NAME"], ["ID"])
+    assert 'PARTITION BY "ID" ORDER BY "_FILE_NAME" DESC, "_FILE_ROW_NUMBER" DESC' in sql
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+
+# -------------------------------------
+# Small in-process cache with TTL + LRU eviction
+# -------------------------------------
+# Used by the apps to keep Snowflake lookups in st.session_state so that a
+# widget rerun does not repeat the same round-trip.
+
+
+class TTLCache:
+    """
+    Least-recently-used cache whose entries also expire after `ttl` seconds.
+    Keeps hit / miss / eviction counters for display in the apps.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > self._clock()
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (self._clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for `key`, calling `loader()` on a miss."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = loader()
+            self.put(key, value, ttl=ttl)
+        return value
+
+    def invalidate(self, predicate=None):
+        """Drop every entry, or only the keys for which `predicate(key)` is true."""
+        if predicate is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }